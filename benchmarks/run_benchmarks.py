@@ -0,0 +1,314 @@
+"""
+Load-testing benchmark for the MCP server.
+
+Drives `immich_mcp.main:app` in-process with many concurrent MCP clients while Immich is
+replaced by a simulated server behind `httpx.MockTransport`, then reports latency percentiles
+and throughput per resource and tool. See `benchmarks/README.md`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+# The server reads its configuration at import time.
+os.environ.setdefault("IMMICH_BASE_URL", "http://immich.benchmark")
+os.environ.setdefault("IMMICH_API_KEY", "benchmark-key")
+os.environ.setdefault("IMMICH_MCP_STATELESS_HTTP", "false")
+
+from immich_mcp.immich_api import ImmichAPI  # noqa: E402
+from immich_mcp.main import app  # noqa: E402
+from immich_mcp.server import shared_context  # noqa: E402
+
+MCP_HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+class SimulatedImmich:
+    """A stand-in for the Immich API with configurable latency, error rate and dataset size."""
+
+    def __init__(self, assets: int, users: int, latency: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.users = [
+            {
+                "id": str(uuid.UUID(int=self.random.getrandbits(128))),
+                "email": f"user{i}@example.com",
+                "name": f"User {i}",
+            }
+            for i in range(users)
+        ]
+        self.assets = {}
+        for i in range(assets):
+            asset_id = str(uuid.UUID(int=self.random.getrandbits(128)))
+            self.assets[asset_id] = {
+                "id": asset_id,
+                "originalFileName": f"IMG_{i:06d}.jpg",
+                "type": "IMAGE" if i % 10 else "VIDEO",
+                "fileCreatedAt": "2020-01-01T00:00:00.000Z",
+                "updatedAt": "2020-01-01T00:00:00.000Z",
+                "exifInfo": {"make": "Canon", "model": "EOS R5", "city": "Oslo"},
+            }
+        self.asset_ids = list(self.assets)
+        self.api_keys = [
+            {
+                "id": str(uuid.UUID(int=self.random.getrandbits(128))),
+                "name": f"Key {i}",
+                "createdAt": "2025-01-01T00:00:00.000Z",
+                "updatedAt": "2025-01-01T00:00:00.000Z",
+                "permissions": ["all"],
+            }
+            for i in range(5)
+        ]
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.random.expovariate(1 / self.latency))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return httpx.Response(503)
+
+        path = request.url.path.removeprefix("/api")
+        parts = path.strip("/").split("/")
+        if path == "/server/ping":
+            return httpx.Response(200, json={"res": "pong"})
+        if path == "/users/me":
+            return httpx.Response(200, json=self.users[0])
+        if path == "/users":
+            return httpx.Response(200, json=self.users)
+        if path == "/partners":
+            return httpx.Response(200, json=[{**user, "inTimeline": True} for user in self.users[1:3]])
+        if path == "/api-keys/me":
+            return httpx.Response(200, json=self.api_keys[0])
+        if path == "/api-keys":
+            return httpx.Response(200, json=self.api_keys)
+        if parts[0] == "api-keys" and len(parts) == 2:
+            return httpx.Response(200, json=self.api_keys[0] | {"id": parts[1]})
+        if parts[0] == "assets" and len(parts) == 2:
+            asset = self.assets.get(parts[1])
+            return httpx.Response(200, json=asset) if asset else httpx.Response(404)
+        if path == "/search/metadata":
+            body = json.loads(request.content)
+            page, size = body.get("page", 1), body.get("size", 250)
+            start = (page - 1) * size
+            items = [self.assets[asset_id] for asset_id in self.asset_ids[start : start + size]]
+            next_page = str(page + 1) if start + size < len(self.asset_ids) else None
+            return httpx.Response(
+                200,
+                json={
+                    "assets": {
+                        "items": items,
+                        "total": len(items),
+                        "count": len(items),
+                        "nextPage": next_page,
+                    }
+                },
+            )
+        return httpx.Response(404)
+
+
+def build_workload(immich: SimulatedImmich) -> dict:
+    """Returns the operations to benchmark: a name and a function building its JSON-RPC request."""
+
+    def resource(uri):
+        return lambda: ("resources/read", {"uri": uri})
+
+    def tool(name, arguments):
+        return lambda: ("tools/call", {"name": name, "arguments": arguments()})
+
+    return {
+        "resource user://me": resource("user://me"),
+        "resource users://list": resource("users://list"),
+        "resource partners://list": resource("partners://list"),
+        "resource apikeys://list": resource("apikeys://list"),
+        "resource asset://{asset_id}": lambda: (
+            "resources/read",
+            {"uri": f"asset://{immich.random.choice(immich.asset_ids)}"},
+        ),
+        "tool ping": tool("ping", dict),
+        "tool get_assets": tool("get_assets", lambda: {"ids": immich.random.sample(immich.asset_ids, 20)}),
+        "tool search_assets": tool("search_assets", lambda: {"limit": 50}),
+    }
+
+
+async def mcp_call(
+    client: httpx.AsyncClient, session_id: str, method: str, params: dict, request_id: int
+) -> dict:
+    headers = {**MCP_HEADERS, "mcp-session-id": session_id} if session_id else MCP_HEADERS
+    response = await client.post(
+        "/mcp", json={"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}, headers=headers
+    )
+    response.raise_for_status()
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        data = next(line for line in response.text.splitlines() if line.startswith("data: "))
+        return json.loads(data.removeprefix("data: "))
+    return response.json()
+
+
+async def initialize(client: httpx.AsyncClient) -> str | None:
+    params = {
+        "protocolVersion": "2025-06-18",
+        "clientInfo": {"name": "immich-mcp-benchmark", "version": "0.1.0"},
+        "capabilities": {},
+    }
+    response = await client.post(
+        "/mcp",
+        json={"jsonrpc": "2.0", "method": "initialize", "params": params, "id": 0},
+        headers=MCP_HEADERS,
+    )
+    response.raise_for_status()
+    session_id = response.headers.get("mcp-session-id")
+    headers = {**MCP_HEADERS, "mcp-session-id": session_id} if session_id else MCP_HEADERS
+    await client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+    return session_id
+
+
+async def run_client(
+    client: httpx.AsyncClient, workload: dict, requests: int, offset: int, samples: dict
+) -> None:
+    session_id = await initialize(client)
+    names = itertools.islice(itertools.cycle(workload), offset, offset + requests)
+    for request_id, name in enumerate(names, start=1):
+        method, params = workload[name]()
+        start = time.perf_counter()
+        try:
+            message = await mcp_call(client, session_id, method, params, request_id)
+            ok = "error" not in message and not message.get("result", {}).get("isError")
+        except httpx.HTTPError:
+            ok = False
+        samples[name].append((time.perf_counter() - start, ok))
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    results = {}
+    for name, values in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in values)
+        results[name] = {
+            "requests": len(values),
+            "errors": sum(1 for _, ok in values if not ok),
+            "requestsPerSecond": round(len(values) / elapsed, 1),
+            "p50Ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95Ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "meanMs": round(statistics.fmean(latencies) * 1000, 3),
+        }
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    immich = SimulatedImmich(args.assets, args.users, args.latency, args.error_rate, args.seed)
+    shared_context.client_factory = lambda: ImmichAPI(transport=httpx.MockTransport(immich))
+    workload = build_workload(immich)
+    samples = defaultdict(list)
+
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None)
+    async with app.router.lifespan_context(app):
+        # A local Host, as newer mcp versions reject others to guard against DNS rebinding.
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://localhost:8000", limits=limits
+        ) as client:
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(run_client(client, workload, args.requests, i, samples) for i in range(args.clients))
+            )
+            elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "clients": args.clients,
+            "requestsPerClient": args.requests,
+            "upstreamLatencyMs": args.latency * 1000,
+            "upstreamErrorRate": args.error_rate,
+            "assets": args.assets,
+            "users": args.users,
+        },
+        "elapsedSeconds": round(elapsed, 3),
+        "totalRequestsPerSecond": round(total / elapsed, 1),
+        "upstreamRequests": immich.requests,
+        "operations": summarize(samples, elapsed),
+    }
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    print(f"{'operation':32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, stats in report["operations"].items():
+        line = (
+            f"{name:32} {stats['requestsPerSecond']:>9} {stats['p50Ms']:>9} "
+            f"{stats['p95Ms']:>9} {stats['p99Ms']:>9} {stats['errors']:>7}"
+        )
+        previous = (baseline or {}).get("operations", {}).get(name)
+        if previous and previous["p95Ms"]:
+            line += f"   p95 {(stats['p95Ms'] / previous['p95Ms'] - 1) * 100:+.1f}% vs baseline"
+        print(line)
+    print(
+        f"total: {report['totalRequestsPerSecond']} req/s over {report['elapsedSeconds']} s, "
+        f"{report['upstreamRequests']} upstream requests"
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--clients", type=int, default=50, help="concurrent MCP clients")
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="mean simulated Immich latency in seconds"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Immich requests that fail")
+    parser.add_argument("--assets", type=int, default=10_000, help="number of simulated assets")
+    parser.add_argument("--users", type=int, default=50, help="number of simulated users")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="random seed for the simulated dataset and workload"
+    )
+    parser.add_argument("--output", type=Path, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", type=Path, help="compare p95 latencies against a previous results file")
+    args = parser.parse_args()
+
+    # Per-request logging and the server's lifecycle prints would dominate the measurements.
+    logging.disable(logging.INFO)
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = asyncio.run(run(args))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
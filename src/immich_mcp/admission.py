@@ -0,0 +1,250 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from immich_mcp.deadlines import remaining
+from immich_mcp.metrics import ADMISSION_QUEUE_TIME, ADMISSION_REJECTED, OnCloseStream
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request is turned away to protect Immich; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(f"{message}; retry in {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Tokens refill at `rate` per second up to `burst`. Reserving a token may take the balance
+    below zero, which queues the caller in arrival order until its token has been refilled.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait until it is available."""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - 1
+        self._updated = now
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def cancel(self) -> None:
+        """Returns a reserved token that will not be used."""
+        self._tokens = min(self.burst, self._tokens + 1)
+
+
+class RateLimiter:
+    """
+    Limits MCP requests with a token bucket per client and one shared by all clients. A request
+    waits for its turn for up to `max_wait` seconds, or the caller's deadline if sooner, and is
+    rejected with an `OverloadedError` straight away if its turn would come later than that.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: float = 1.0,
+        client_rate: float = 0.0,
+        client_burst: float = 1.0,
+        max_wait: float = 5.0,
+        max_clients: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self._global = TokenBucket(rate, max(burst, 1.0), clock) if rate > 0 else None
+        self.client_rate = client_rate
+        self.client_burst = max(client_burst, 1.0)
+        self.max_wait = max_wait
+        self.max_clients = max_clients
+        self._clock = clock
+        self._sleep = sleep
+        self._clients: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter | None":
+        """Creates the limiter configured by the environment, or None if no rate limit is set."""
+        rate = float(os.environ.get("IMMICH_MCP_RATE_LIMIT", 0))
+        client_rate = float(os.environ.get("IMMICH_MCP_CLIENT_RATE_LIMIT", 0))
+        if rate <= 0 and client_rate <= 0:
+            return None
+        return cls(
+            rate=rate,
+            burst=float(os.environ.get("IMMICH_MCP_RATE_BURST", max(rate, 1))),
+            client_rate=client_rate,
+            client_burst=float(os.environ.get("IMMICH_MCP_CLIENT_RATE_BURST", max(client_rate, 1))),
+            max_wait=float(os.environ.get("IMMICH_MCP_MAX_QUEUE_WAIT", 5)),
+        )
+
+    async def acquire(self, client: str) -> float:
+        """Waits for `client`'s turn and returns how long it queued."""
+        buckets = [bucket for bucket in (self._client_bucket(client), self._global) if bucket is not None]
+        wait = max((bucket.reserve() for bucket in buckets), default=0.0)
+        if wait > _max_wait(self.max_wait):
+            for bucket in buckets:
+                bucket.cancel()
+            ADMISSION_REJECTED.inc(stage="rate_limit")
+            raise OverloadedError("Too many requests", retry_after=wait)
+        ADMISSION_QUEUE_TIME.observe(wait, stage="rate_limit")
+        if wait > 0:
+            try:
+                await self._sleep(wait)
+            except BaseException:
+                for bucket in buckets:
+                    bucket.cancel()
+                raise
+        return wait
+
+    def _client_bucket(self, client: str) -> TokenBucket | None:
+        if self.client_rate <= 0:
+            return None
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst, self._clock)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+
+class ConcurrencyLimit:
+    """
+    Admits at most `limit` holders at a time. Others queue in arrival order for up to `max_wait`
+    seconds, or the caller's deadline if sooner, and are then rejected with an `OverloadedError`.
+    Unlike `asyncio.Semaphore`, it is not tied to an event loop, so it can be shared process-wide.
+    """
+
+    def __init__(self, limit: int, max_wait: float = 5.0):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Waits for a free slot and returns how long it queued."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            ADMISSION_QUEUE_TIME.observe(0.0, stage="upstream")
+            return 0.0
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(_max_wait(self.max_wait)):
+                await waiter
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(exc, TimeoutError):
+                ADMISSION_REJECTED.inc(stage="upstream")
+                raise OverloadedError("Immich is busy", retry_after=self.max_wait) from exc
+            raise
+        waited = time.perf_counter() - start
+        ADMISSION_QUEUE_TIME.observe(waited, stage="upstream")
+        return waited
+
+    def release(self) -> None:
+        """Frees a slot, handing it straight to the longest-waiting caller if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class ConcurrencyLimitTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport to hold a `ConcurrencyLimit` slot from sending a request until its body is
+    closed. Requests marked with the `DOWNLOAD_EXTENSION` hold a slot of `download_limit` instead,
+    as they stay open for as long as their reader takes. A limit of None admits every request.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limit: ConcurrencyLimit | None,
+        download_limit: ConcurrencyLimit | None = None,
+    ):
+        self._transport = transport
+        self._limit = limit
+        self._download_limit = download_limit
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limit = self._download_limit if request.extensions.get(DOWNLOAD_EXTENSION) else self._limit
+        if limit is None:
+            return await self._transport.handle_async_request(request)
+        await limit.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            limit.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=OnCloseStream(response.stream, limit.release),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# The request extension marking downloads of original files.
+DOWNLOAD_EXTENSION = "immich_download"
+
+_upstream_limit: ConcurrencyLimit | None = None
+_download_limit: ConcurrencyLimit | None = None
+
+
+def upstream_limit() -> ConcurrencyLimit | None:
+    """
+    Returns the process-wide limit on concurrent requests to Immich set by
+    IMMICH_UPSTREAM_CONCURRENCY, shared by every client, or None if it is disabled.
+    """
+    global _upstream_limit
+    limit = int(os.environ.get("IMMICH_UPSTREAM_CONCURRENCY", 32))
+    if limit <= 0:
+        return None
+    if _upstream_limit is None:
+        _upstream_limit = ConcurrencyLimit(limit, float(os.environ.get("IMMICH_MCP_MAX_QUEUE_WAIT", 5)))
+    return _upstream_limit
+
+
+def download_limit() -> ConcurrencyLimit | None:
+    """
+    Returns the process-wide limit on concurrent archive downloads from Immich set by
+    IMMICH_DOWNLOAD_CONCURRENCY, or None if it is disabled. Downloads do not count towards the
+    upstream limit, so that slow readers cannot hold every slot other requests need.
+    """
+    global _download_limit
+    limit = int(os.environ.get("IMMICH_DOWNLOAD_CONCURRENCY", 4))
+    if limit <= 0:
+        return None
+    if _download_limit is None:
+        _download_limit = ConcurrencyLimit(limit, float(os.environ.get("IMMICH_MCP_MAX_QUEUE_WAIT", 5)))
+    return _download_limit
+
+
+def _max_wait(max_wait: float) -> float:
+    left = remaining()
+    return max_wait if left is None else max(0.0, min(max_wait, left))
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+# Sentinel returned by `TTLCache.get` on a miss, so cached `None` values stay distinguishable.
+MISSING = object()
+
+# The encoding of persisted values: zlib-compressed compact JSON of the projected models (version
+# 1 held whole upstream bodies). Entries in any other format are ignored, so that a new format
+# can be introduced without migrating old files.
+FORMAT_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    endpoint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    format INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (endpoint, path, params)
+);
+CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+"""
+
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries expire after a per-entry time-to-live.
+
+    Expired entries are kept for another `stale_grace` seconds, during which `lookup` still
+    returns them marked as stale so that callers can serve them while refreshing.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        stale_grace: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.stale_grace = stale_grace
+        self._clock = clock
+        # Per key: expiry time, value and how often it has been read since it was stored.
+        self._entries: OrderedDict[Hashable, list] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Returns the cached value for `key`, or `default` if it is absent or expired."""
+        value, fresh = self.lookup(key)
+        return value if fresh else default
+
+    def lookup(self, key: Hashable) -> tuple[Any, bool]:
+        """
+        Returns the cached value for `key` and whether it is still fresh. Expired values within
+        the stale grace period are returned as not fresh; `MISSING` is returned after that.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING, False
+        expires_at, value, _ = entry
+        now = self._clock()
+        if expires_at + self.stale_grace <= now:
+            del self._entries[key]
+            self.misses += 1
+            return MISSING, False
+        self._entries.move_to_end(key)
+        entry[2] += 1
+        if expires_at <= now:
+            self.stale_hits += 1
+            return value, False
+        self.hits += 1
+        return value, True
+
+    def update(self, key: Hashable, value: Any, ttl: float) -> bool:
+        """Replaces the value of an entry that is still cached, returning whether there was one."""
+        if key not in self._entries:
+            return False
+        reads = self._entries[key][2]
+        self.set(key, value, ttl)
+        if key in self._entries:
+            self._entries[key][2] = reads
+        return True
+
+    def expiring(self, within: float) -> list[Hashable]:
+        """Returns the keys of entries read since they were stored that expire within `within` seconds."""
+        deadline = self._clock() + within
+        return [
+            key for key, (expires_at, _, reads) in self._entries.items() if reads and expires_at <= deadline
+        ]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Stores `value` for `ttl` seconds, evicting the least recently used entries if full."""
+        if ttl <= 0:
+            return
+        self._entries[key] = [self._clock() + ttl, value, 0]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        """Drops every entry whose key matches `predicate` (all entries if omitted)."""
+        if predicate is None:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the cache's size and hit/miss/eviction counters."""
+        return {
+            "size": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class PersistentCache:
+    """
+    A SQLite file (in WAL mode) holding a copy of an ImmichAPI client's cached responses, so
+    that a restarted server starts warm.
+
+    Keys are the client's `(endpoint, path, params)` cache keys. Expiry times are wall-clock
+    times, as monotonic clocks restart with the process. The file belongs to one Immich server
+    and API key; it is emptied when opened for another, so one user's responses are never served
+    to another. At most `max_entries` of the most recently stored entries are kept.
+    """
+
+    def __init__(self, path: str, scope: str, max_entries: int = 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'scope'").fetchone()
+            if row is None or row[0] != scope:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('scope', ?)", (scope,))
+
+    @staticmethod
+    def scope(base_url: str, api_key: str) -> str:
+        """Identifies the Immich server and API key whose responses a file holds."""
+        return hashlib.sha256(f"{base_url}\n{api_key}".encode()).hexdigest()
+
+    def close(self) -> None:
+        """Closes the SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+    def keys(self) -> set[tuple]:
+        """Returns the keys of the stored entries."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT endpoint, path, params FROM entries WHERE format = ?", (FORMAT_VERSION,)
+            ).fetchall()
+        return {(endpoint, path, _decode_params(params)) for endpoint, path, params in rows}
+
+    def load(self, key: tuple) -> tuple[Any, float] | None:
+        """Returns the stored value for `key` and its wall-clock expiry time, or None."""
+        endpoint, path, params = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries "
+                "WHERE endpoint = ? AND path = ? AND params = ? AND format = ?",
+                (endpoint, path, _encode_params(params), FORMAT_VERSION),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def apply(self, operations: Iterable[tuple]) -> None:
+        """
+        Applies, in order and in one transaction, operations queued by the client:
+        `("set", key, value, expires_at)`, `("delete", endpoint, paths or None)` and `("clear",)`.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            for operation in operations:
+                if operation[0] == "set":
+                    _, (endpoint, path, params), value, expires_at = operation
+                    blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (endpoint, path, _encode_params(params), FORMAT_VERSION, now, expires_at, blob),
+                    )
+                elif operation[0] == "delete":
+                    _, endpoint, paths = operation
+                    if paths is None:
+                        self._conn.execute("DELETE FROM entries WHERE endpoint = ?", (endpoint,))
+                    else:
+                        self._conn.executemany(
+                            "DELETE FROM entries WHERE endpoint = ? AND path = ?",
+                            [(endpoint, path) for path in paths],
+                        )
+                elif operation[0] == "clear":
+                    self._conn.execute("DELETE FROM entries")
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid NOT IN "
+                "(SELECT rowid FROM entries ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+
+def _encode_params(params: tuple) -> str:
+    return json.dumps(params, separators=(",", ":"))
+
+
+def _decode_params(params: str) -> tuple:
+    return tuple(tuple(item) for item in json.loads(params))
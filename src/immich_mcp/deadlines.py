@@ -0,0 +1,51 @@
+import contextvars
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+
+# The monotonic time by which the current MCP request must be answered, if it has a deadline.
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("immich_deadline", default=None)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Raised instead of sending a request to Immich once the caller's deadline has passed."""
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """Sets the deadline for Immich requests made in this context to `seconds` from now (None for none)."""
+    token = _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Returns the seconds left until the current deadline, or None if there is no deadline."""
+    when = _deadline.get()
+    return None if when is None else when - time.monotonic()
+
+
+class DeadlineTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport to cap each request's timeouts at the time left until the caller's deadline."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded("The caller's deadline has passed", request=request)
+            timeouts = request.extensions.get("timeout", {})
+            request.extensions["timeout"] = {
+                phase: left if timeouts.get(phase) is None else min(timeouts[phase], left)
+                for phase in ("connect", "read", "write", "pool")
+            }
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,371 @@
+import asyncio
+import functools
+import heapq
+import io
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations
+from math import comb
+
+import httpx
+
+from immich_mcp.immich_api import ImmichAPI
+
+try:
+    import numpy
+    from PIL import Image
+except ImportError:  # Installed with the "duplicates" extra.
+    numpy = None
+    Image = None
+
+ALGORITHMS = ("dhash", "phash")
+# The largest number of differing bits a search for similar images accepts. The wider the search,
+# the more values of each band of the index it looks up.
+MAX_DISTANCE = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    id TEXT PRIMARY KEY,
+    thumbhash TEXT NOT NULL,
+    dhash INTEGER NOT NULL,
+    phash INTEGER NOT NULL
+);
+"""
+_UPSERT = "INSERT OR REPLACE INTO hashes (id, thumbhash, dhash, phash) VALUES (?, ?, ?, ?)"
+
+# Assets hashed between writes to the index, so that an interrupted job keeps its progress.
+_BATCH_SIZE = 256
+
+
+def image_hashes(data: bytes) -> tuple[int, int]:
+    """
+    Returns the 64-bit difference hash and DCT perceptual hash of an encoded image.
+    Runs in the worker processes, so it must stay a module-level function.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Lets JPEG decoding scale down on the fly; other formats ignore it.
+        image.draft("L", (64, 64))
+        gray = image.convert("L")
+
+    # dHash: is each pixel brighter than its right-hand neighbour in a 9x8 image?
+    pixels = numpy.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=numpy.int16)
+    dhash = _pack(pixels[:, 1:] > pixels[:, :-1])
+
+    # pHash: is each of the 8x8 lowest frequencies of a 32x32 image above their median?
+    pixels = numpy.asarray(gray.resize((32, 32), Image.Resampling.LANCZOS), dtype=numpy.float64)
+    basis = _dct_basis(32)
+    low = (basis @ pixels @ basis.T)[:8, :8].ravel()
+    # The first coefficient is the average brightness, which says nothing about the picture.
+    phash = _pack(low > numpy.median(low[1:]))
+    return dhash, phash
+
+
+def _pack(bits) -> int:
+    return int.from_bytes(numpy.packbits(bits.ravel()).tobytes(), "big")
+
+
+@functools.cache
+def _dct_basis(n: int):
+    k = numpy.arange(n)[:, None]
+    basis = numpy.cos(numpy.pi * (2 * numpy.arange(n)[None, :] + 1) * k / (2 * n))
+    basis[0] /= numpy.sqrt(2)
+    return basis * numpy.sqrt(2 / n)
+
+
+class MultiIndex:
+    """
+    64-bit hashes indexed for finding those within `radius` bits of a query, by multi-index hashing.
+
+    The bits are split into bands, each with a table from its value to the hashes that have it.
+    Hashes that differ in at most `radius` bits over `m` bands differ in at most `radius // m`
+    bits in at least one band, so a search only looks up the values within that many bits of the
+    query's in each band, and compares the query with the hashes under them rather than with
+    every hash. The number of bands is chosen for the expected `size` of the index, trading the
+    values looked up against the hashes found under each.
+    """
+
+    def __init__(self, radius: int, size: int = 0):
+        self.radius = radius
+
+        def cost(count: int) -> float:
+            width = 64 // count
+            lookups = count * sum(comb(width, k) for k in range(radius // count + 1))
+            return lookups * (1 + size / 2**width)
+
+        self.bands = min(range(1, radius + 2), key=cost)
+        # The offset and width of each band.
+        self._layout: list[tuple[int, int]] = []
+        start = 0
+        for band in range(self.bands):
+            width = (64 - start) // (self.bands - band)
+            self._layout.append((start, width))
+            start += width
+        # For each band, the XOR masks that flip up to radius // bands of its bits, fewest first,
+        # and how many of them flip up to each number of bits.
+        self._flips: list[list[int]] = []
+        self._cutoffs: list[list[int]] = []
+        for _, width in self._layout:
+            flips = []
+            cutoffs = []
+            for k in range(radius // self.bands + 1):
+                flips.extend(sum(1 << bit for bit in bits) for bits in combinations(range(width), k))
+                cutoffs.append(len(flips))
+            self._flips.append(flips)
+            self._cutoffs.append(cutoffs)
+        self._tables: list[defaultdict[int, list[int]]] = [defaultdict(list) for _ in self._layout]
+        self._items: dict[int, list] = {}
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._items.values())
+
+    def add(self, value: int, item) -> None:
+        """Adds `item` under the hash `value`."""
+        items = self._items.get(value)
+        if items is None:
+            items = self._items[value] = []
+            for (start, width), table in zip(self._layout, self._tables):
+                table[(value >> start) & ((1 << width) - 1)].append(value)
+        items.append(item)
+
+    def search(self, value: int, radius: int | None = None) -> Iterator[tuple[int, int, list]]:
+        """
+        Yields the distance, hash and items of every hash within `radius` of `value`, each once.
+        `radius` defaults to, and may not exceed, the radius the index was built for.
+        """
+        radius = self.radius if radius is None else min(radius, self.radius)
+        seen = set()
+        for (start, width), flips, cutoffs, table in zip(
+            self._layout, self._flips, self._cutoffs, self._tables
+        ):
+            key = (value >> start) & ((1 << width) - 1)
+            for flip in flips[: cutoffs[radius // self.bands]]:
+                for other in table.get(key ^ flip, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    distance = (value ^ other).bit_count()
+                    if distance <= radius:
+                        yield distance, other, self._items[other]
+
+    def hashes(self) -> Iterator[tuple[int, list]]:
+        """Yields every hash in the index with its items."""
+        yield from self._items.items()
+
+
+class _Reversed(tuple):
+    """A tuple that sorts in reverse, so that heapq keeps the largest on top."""
+
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return tuple.__gt__(self, other)
+
+
+class DuplicateIndex:
+    """
+    A local SQLite index of perceptual hashes of asset thumbnails, used to find near-duplicate photos.
+
+    Each update lists the library's images and only downloads and hashes those that are new or
+    whose thumbnail has changed, as told by Immich's thumbhash; hashing is spread over a pool of
+    worker processes. Candidate pairs are found with a multi-index search rather than by comparing
+    every pair.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        page_size: int = 1000,
+        concurrency: int = 8,
+        executor: Executor | None = None,
+        hasher: Callable[[bytes], tuple[int, int]] = image_hashes,
+    ):
+        self.path = path
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._hasher = hasher
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        # Bumped on every write, so that cached indexes are rebuilt once the hashes change.
+        self._generation = 0
+        self._indexes: dict[str, tuple[int, MultiIndex]] = {}
+
+    @classmethod
+    def from_env(cls) -> "DuplicateIndex | None":
+        """Opens the index at IMMICH_HASH_INDEX_PATH, or returns None if it is not enabled."""
+        path = os.environ.get("IMMICH_HASH_INDEX_PATH")
+        if not path:
+            return None
+        if numpy is None or Image is None:
+            raise RuntimeError(
+                "IMMICH_HASH_INDEX_PATH needs Pillow and NumPy; install immich-mcp[duplicates]"
+            )
+        return cls(path, concurrency=int(os.environ.get("IMMICH_HASH_CONCURRENCY", 8)))
+
+    def close(self) -> None:
+        """Stops the worker processes and closes the SQLite connection."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._conn.close()
+
+    async def update(self, immich_client: ImmichAPI) -> int:
+        """Hashes images that are new or changed since the last update and returns how many were hashed."""
+        known = dict(await asyncio.to_thread(self._execute, "SELECT id, thumbhash FROM hashes", ()))
+        pending = []
+        seen = set()
+        async for page in immich_client.iter_search_metadata({"type": "IMAGE"}, page_size=self.page_size):
+            for item in page["items"]:
+                seen.add(item["id"])
+                # Images without a thumbhash have no thumbnail yet; they are hashed once they do.
+                if item.get("thumbhash") and known.get(item["id"]) != item["thumbhash"]:
+                    pending.append((item["id"], item["thumbhash"]))
+
+        # Only prune once the whole library has been listed, so that a failed listing forgets nothing.
+        gone = [(asset_id,) for asset_id in known.keys() - seen]
+        if gone:
+            await asyncio.to_thread(self._write, "DELETE FROM hashes WHERE id = ?", gone)
+
+        hashed = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for start in range(0, len(pending), _BATCH_SIZE):
+            batch = pending[start : start + _BATCH_SIZE]
+            results = await asyncio.gather(
+                *(self._hash(immich_client, semaphore, asset_id) for asset_id, _ in batch)
+            )
+            rows = [
+                (asset_id, thumbhash, _to_signed(hashes[0]), _to_signed(hashes[1]))
+                for (asset_id, thumbhash), hashes in zip(batch, results)
+                if hashes is not None
+            ]
+            await asyncio.to_thread(self._write, _UPSERT, rows)
+            hashed += len(rows)
+        return hashed
+
+    async def run_update_loop(self, immich_client: ImmichAPI, interval: float) -> None:
+        """Updates the index every `interval` seconds until cancelled."""
+        while True:
+            try:
+                hashed = await self.update(immich_client)
+                print(f"Duplicate index updated, {hashed} images hashed")
+            except BrokenProcessPool as exc:
+                # A worker died, e.g. killed for running out of memory; start a new pool next time.
+                print(f"Duplicate index update failed, restarting the hashing workers: {exc!r}")
+                self._reset_pool()
+            except Exception as exc:
+                print(f"Duplicate index update failed: {exc!r}")
+            await asyncio.sleep(interval)
+
+    async def find_pairs(self, max_distance: int, algorithm: str = "phash", limit: int = 100) -> list[dict]:
+        """
+        Returns up to `limit` pairs of assets whose hashes differ in at most `max_distance` bits,
+        closest first.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"algorithm must be one of {', '.join(ALGORITHMS)}")
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_DISTANCE}")
+        # The search runs in a thread, which cannot be cancelled; it stops at this flag instead.
+        stop = threading.Event()
+        try:
+            return await asyncio.to_thread(self._find_pairs, max_distance, algorithm, limit, stop)
+        finally:
+            stop.set()
+
+    async def count(self) -> int:
+        """Returns the number of hashed assets."""
+        rows = await asyncio.to_thread(self._execute, "SELECT COUNT(*) FROM hashes", ())
+        return rows[0][0]
+
+    async def _hash(
+        self, immich_client: ImmichAPI, semaphore: asyncio.Semaphore, asset_id: str
+    ) -> tuple[int, int] | None:
+        async with semaphore:
+            try:
+                async with immich_client.stream_thumbnail(asset_id) as response:
+                    data = await response.aread()
+                return await asyncio.get_running_loop().run_in_executor(self._pool(), self._hasher, data)
+            except (httpx.RequestError, httpx.HTTPStatusError, OSError, ValueError) as exc:
+                # Left out of the index, so that the next update tries again.
+                print(f"Could not hash asset {asset_id}: {exc!r}")
+                return None
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            # Spawned rather than forked, as forking a process that runs threads is unsafe.
+            workers = int(os.environ.get("IMMICH_HASH_WORKERS", 0)) or None
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _reset_pool(self) -> None:
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _find_pairs(self, max_distance: int, algorithm: str, limit: int, stop: threading.Event) -> list[dict]:
+        if limit <= 0:
+            return []
+        index = self._index(algorithm, max_distance)
+        # The closest `limit` pairs found so far, farthest on top.
+        closest: list[_Reversed] = []
+        for value, items in index.hashes():
+            if stop.is_set():
+                return []
+            # Once `limit` pairs are found, only closer ones are looked for.
+            radius = closest[0][0] if len(closest) == limit else max_distance
+            for distance, other, other_items in index.search(value, radius):
+                # Each pair of distinct hashes is found from both ends; keep one.
+                if other < value:
+                    continue
+                for i, asset_id in enumerate(items):
+                    for other_id in other_items[i + 1 :] if other == value else other_items:
+                        pair = _Reversed((distance, *sorted((asset_id, other_id))))
+                        if len(closest) < limit:
+                            heapq.heappush(closest, pair)
+                        elif tuple(pair) < tuple(closest[0]):
+                            heapq.heapreplace(closest, pair)
+        return [
+            {"assetIds": [first, second], "distance": distance}
+            for distance, first, second in sorted(tuple(pair) for pair in closest)
+        ]
+
+    def _index(self, algorithm: str, radius: int) -> MultiIndex:
+        generation = self._generation
+        cached = self._indexes.get(algorithm)
+        if cached is not None and cached[0] == generation and cached[1].radius == radius:
+            return cached[1]
+        rows = self._execute(f"SELECT id, {algorithm} FROM hashes", ())
+        index = MultiIndex(radius, size=len(rows))
+        for asset_id, value in rows:
+            index.add(_from_signed(value), asset_id)
+        self._indexes[algorithm] = (generation, index)
+        return index
+
+    def _execute(self, sql: str, params: tuple) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, sql: str, rows: list[tuple]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+            self._generation += 1
+
+
+# SQLite integers are signed 64-bit, so hashes with the top bit set are stored as negative numbers.
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _from_signed(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import random
+import re
+from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager
+from typing import Any
+
+try:
+    from websockets.asyncio.client import connect as websocket_connect
+    from websockets.exceptions import WebSocketException
+except ImportError:  # Installed with the "events" extra.
+    websocket_connect = None
+    WebSocketException = None
+
+# Immich serves Socket.IO under its API prefix, and only over websockets.
+SOCKET_PATH = "/socket.io/?EIO=4&transport=websocket"
+# How long to wait for the Engine.IO handshake once connected, in seconds.
+HANDSHAKE_TIMEOUT = 30.0
+
+# Engine.IO packet types.
+_OPEN, _CLOSE, _PING, _PONG, _MESSAGE = "0", "1", "2", "3", "4"
+# Socket.IO packet types, carried in Engine.IO messages.
+_CONNECT, _DISCONNECT, _EVENT, _CONNECT_ERROR = "0", "1", "2", "4"
+
+_STREAM_ERRORS: tuple[type[BaseException], ...] = (OSError, ValueError, KeyError)
+if WebSocketException is not None:
+    _STREAM_ERRORS += (WebSocketException,)
+
+
+class EventStreamError(Exception):
+    """Raised when the event stream is closed or sends something unexpected."""
+
+
+def _connect_websocket(url: str, headers: dict[str, str]) -> AbstractAsyncContextManager:
+    return websocket_connect(url, additional_headers=headers)
+
+
+class EventListener:
+    """
+    Listens to Immich's realtime events and passes each one to `on_event`.
+
+    Immich publishes events over Socket.IO, and its gateway only accepts the websocket
+    transport, so this needs the `websockets` package. `connect` opens the connection, given
+    its URL and headers, and returns an async context manager for an object with `send` and
+    `recv`. When the stream drops it reconnects with jittered exponential backoff;
+    `on_connect` and `on_disconnect` are called each time the stream comes up or goes down, so
+    that callers can stop trusting event-driven state while it is down.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        on_event: Callable[[str, Any], None],
+        on_connect: Callable[[], None] | None = None,
+        on_disconnect: Callable[[], None] | None = None,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        connect: Callable[[str, dict[str, str]], AbstractAsyncContextManager] | None = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.url = re.sub(r"^http", "ws", base_url.rstrip("/")) + "/api" + SOCKET_PATH
+        self._headers = {"x-api-key": api_key}
+        if connect is None and websocket_connect is not None:
+            connect = _connect_websocket
+        self._connect = connect
+        self._on_event = on_event
+        self._on_connect = on_connect
+        self._on_disconnect = on_disconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self.connected = False
+        self.reconnects = 0
+
+    async def run(self) -> None:
+        """Listens until cancelled, reconnecting whenever the stream drops."""
+        if self._connect is None:
+            print(
+                "Immich events need the websockets package; install immich-mcp[events]. "
+                "Cached assets expire by their TTL instead."
+            )
+            return
+        attempt = 0
+        try:
+            while True:
+                try:
+                    await self._listen()
+                except (EventStreamError, *_STREAM_ERRORS) as exc:
+                    print(f"Immich event stream disconnected, cached assets expire by their TTL: {exc!r}")
+                if self.connected:
+                    attempt = 0
+                    self._set_connected(False)
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+                attempt += 1
+                self.reconnects += 1
+                await self._sleep(delay)
+        finally:
+            if self.connected:
+                self._set_connected(False)
+
+    async def _listen(self) -> None:
+        async with self._connect(self.url, self._headers) as websocket:
+            async with asyncio.timeout(HANDSHAKE_TIMEOUT):
+                packet = await websocket.recv()
+            if not packet.startswith(_OPEN):
+                raise EventStreamError("Unexpected Engine.IO handshake")
+            handshake = json.loads(packet[1:])
+            # The server pings every pingInterval and gives up on us after pingTimeout more.
+            ping_timeout = (handshake["pingInterval"] + handshake["pingTimeout"]) / 1000
+
+            await websocket.send(_MESSAGE + _CONNECT)
+            while True:
+                async with asyncio.timeout(ping_timeout):
+                    packet = await websocket.recv()
+                await self._handle(packet, websocket)
+
+    async def _handle(self, packet: str, websocket) -> None:
+        kind, data = packet[:1], packet[1:]
+        if kind == _PING:
+            await websocket.send(_PONG)
+        elif kind == _CLOSE:
+            raise EventStreamError("Event stream closed by Immich")
+        elif kind == _MESSAGE:
+            kind, data = data[:1], data[1:]
+            if kind == _CONNECT:
+                self._set_connected(True)
+            elif kind == _EVENT:
+                # Skip the acknowledgement ID, if any, that precedes the event array.
+                name, *args = json.loads(data.lstrip("0123456789"))
+                self._on_event(name, args[0] if args else None)
+            elif kind in (_DISCONNECT, _CONNECT_ERROR):
+                raise EventStreamError(f"Immich refused the event stream: {data or 'disconnected'}")
+
+    def _set_connected(self, connected: bool) -> None:
+        self.connected = connected
+        callback = self._on_connect if connected else self._on_disconnect
+        if callback is not None:
+            callback()
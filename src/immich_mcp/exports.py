@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from immich_mcp.admission import OverloadedError
+from immich_mcp.deadlines import deadline
+from immich_mcp.immich_api import ImmichAPI
+
+# The size of the chunks archives are read from Immich and written in. An export holds at most
+# one chunk in memory, however large its archives are.
+CHUNK_SIZE = 1024 * 1024
+MANIFEST = "export.json"
+_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,99}")
+
+
+class _Export:
+    """An export's archives and how far it has got, as kept in its manifest."""
+
+    def __init__(self, directory: Path, asset_ids: list[str]):
+        self.directory = directory
+        self.asset_ids = asset_ids
+        self.total_bytes = 0
+        # Each archive is a dict of its file name, size, asset IDs and whether it is complete.
+        self.archives: list[dict] | None = None
+        self.bytes_written = 0
+        self.state = "running"
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @classmethod
+    def load(cls, directory: Path) -> "_Export | None":
+        try:
+            manifest = json.loads((directory / MANIFEST).read_bytes())
+        except FileNotFoundError:
+            return None
+        export = cls(directory, manifest["assetIds"])
+        export.total_bytes = manifest["totalBytes"]
+        export.archives = manifest["archives"]
+        export.bytes_written = sum(archive["size"] for archive in export.archives if archive["done"])
+        export.state = "done" if all(archive["done"] for archive in export.archives) else "stopped"
+        return export
+
+    def save(self) -> None:
+        """Writes the manifest atomically, so that a crash leaves either the old or the new one."""
+        manifest = {"assetIds": self.asset_ids, "totalBytes": self.total_bytes, "archives": self.archives}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(manifest, file)
+            os.replace(temp_path, self.directory / MANIFEST)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def status(self, name: str) -> dict:
+        archives = self.archives or []
+        return {
+            "name": name,
+            "state": self.state,
+            "archives": len(archives),
+            "archivesDone": sum(1 for archive in archives if archive["done"]),
+            "totalBytes": self.total_bytes,
+            "bytesWritten": self.bytes_written,
+            "files": [str(self.directory / archive["file"]) for archive in archives if archive["done"]],
+            "error": self.error,
+        }
+
+
+class ArchiveExporter:
+    """
+    Downloads the originals of a set of assets into a directory as the ZIP archives Immich splits
+    them into, in the background.
+
+    Each export has a directory of its own under `directory`, named by the caller, holding its
+    archives and a manifest of them. Archives are streamed from Immich in chunks of `chunk_size`
+    bytes, each written to disk off the event loop before the next is read, so memory stays flat
+    and a slow disk slows the download rather than filling a buffer. An archive is written to a
+    `.part` file and renamed once complete; Immich cannot resume an archive midway, so an
+    interrupted export picks up again from the first archive that was not complete.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = CHUNK_SIZE, archive_size: int | None = None):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.archive_size = archive_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._exports: dict[str, _Export] = {}
+
+    @classmethod
+    def from_env(cls) -> "ArchiveExporter | None":
+        """Exports to IMMICH_EXPORT_DIR, or returns None if it is not set."""
+        directory = os.environ.get("IMMICH_EXPORT_DIR")
+        if not directory:
+            return None
+        archive_size = os.environ.get("IMMICH_EXPORT_ARCHIVE_SIZE")
+        return cls(
+            directory,
+            chunk_size=int(os.environ.get("IMMICH_EXPORT_CHUNK_SIZE", CHUNK_SIZE)),
+            archive_size=int(archive_size) if archive_size else None,
+        )
+
+    def close(self) -> None:
+        """Cancels the exports under way; starting them again resumes them."""
+        for export in self._exports.values():
+            if export.task is not None:
+                export.task.cancel()
+
+    def start(self, immich_client: ImmichAPI, name: str, asset_ids: list[str]) -> dict:
+        """
+        Starts exporting `asset_ids` under `name`, or resumes the export of the same assets under
+        that name, and returns its status. Does nothing if it is running or done already.
+        """
+        if not asset_ids:
+            raise ValueError("No asset IDs given")
+        export = self._get(name)
+        if export is not None and sorted(export.asset_ids) != sorted(asset_ids):
+            raise ValueError(f"Export {name!r} already exists with other assets; choose another name")
+        if export is None:
+            export = _Export(self.directory / name, list(asset_ids))
+            export.directory.mkdir(exist_ok=True)
+            self._exports[name] = export
+        if export.state in ("stopped", "failed"):
+            export.state = "running"
+            export.error = None
+            export.task = None
+        if export.state == "running" and export.task is None:
+            export.task = asyncio.create_task(self._run(immich_client, name, export))
+        return export.status(name)
+
+    def status(self, name: str) -> dict:
+        """Returns the progress of the export called `name`, including one from before a restart."""
+        export = self._get(name)
+        if export is None:
+            raise ValueError(f"No export called {name!r}")
+        return export.status(name)
+
+    def _get(self, name: str) -> _Export | None:
+        if not _NAME.fullmatch(name):
+            raise ValueError("Export names may only contain letters, digits, '.', '_' and '-'")
+        export = self._exports.get(name)
+        if export is None:
+            export = _Export.load(self.directory / name)
+            if export is not None:
+                self._exports[name] = export
+        return export
+
+    async def _run(self, immich_client: ImmichAPI, name: str, export: _Export) -> None:
+        # Exports outlive the request that started them, so they have no deadline.
+        with deadline(None):
+            try:
+                if export.archives is None:
+                    info = await immich_client.get_download_info(export.asset_ids, self.archive_size)
+                    export.total_bytes = info["totalSize"]
+                    export.archives = [
+                        {
+                            "file": f"archive-{number:04d}.zip",
+                            "size": archive["size"],
+                            "assetIds": archive["assetIds"],
+                            "done": False,
+                        }
+                        for number, archive in enumerate(info["archives"], 1)
+                    ]
+                    await asyncio.to_thread(export.save)
+                for archive in export.archives:
+                    while not archive["done"]:
+                        try:
+                            await self._download(immich_client, export, archive)
+                        except OverloadedError as exc:
+                            # Every download slot is taken; wait for one rather than fail.
+                            await asyncio.sleep(exc.retry_after)
+                export.state = "done"
+            except asyncio.CancelledError:
+                export.state = "stopped"
+                raise
+            except Exception as exc:
+                print(f"Export {name!r} failed: {exc!r}")
+                export.state = "failed"
+                export.error = str(exc) or type(exc).__name__
+            finally:
+                export.task = None
+
+    async def _download(self, immich_client: ImmichAPI, export: _Export, archive: dict) -> None:
+        path = export.directory / archive["file"]
+        part_path = path.with_name(path.name + ".part")
+        written = 0
+        file = await asyncio.to_thread(open, part_path, "wb")
+        try:
+            async with immich_client.stream_archive(archive["assetIds"]) as response:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await asyncio.to_thread(file.write, chunk)
+                    written += len(chunk)
+                    export.bytes_written += len(chunk)
+        except BaseException:
+            export.bytes_written -= written
+            raise
+        finally:
+            await asyncio.to_thread(file.close)
+        await asyncio.to_thread(os.replace, part_path, path)
+        # Immich reports the size of the originals, not of the ZIP around them.
+        export.bytes_written += archive["size"] - written
+        archive["done"] = True
+        await asyncio.to_thread(export.save)
@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for running the server with several uvicorn worker processes:
+
+    gunicorn -c python:immich_mcp.gunicorn_conf immich_mcp.main:app
+
+Every worker process opens its own ImmichAPI client, cache and connection pool when it starts.
+"""
+
+import os
+
+from immich_mcp.server import stateless_http_enabled, worker_count
+
+bind = f"0.0.0.0:{os.environ.get('IMMICH_MCP_PORT', 8626)}"
+workers = worker_count()
+# The worker class uvicorn used to ship as `uvicorn.workers`, now maintained as uvicorn-worker.
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.environ.get("IMMICH_MCP_PRELOAD", "").lower() in ("1", "true", "yes")
+graceful_timeout = int(os.environ.get("IMMICH_MCP_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("IMMICH_MCP_TIMEOUT", 5))
+
+
+def on_starting(server):
+    if workers > 1 and not stateless_http_enabled():
+        server.log.warning(
+            "Running %d workers with stateful MCP sessions: clients must be routed to the worker "
+            "that created their session. Set IMMICH_MCP_STATELESS_HTTP=true or use sticky routing "
+            "on the mcp-session-id header.",
+            workers,
+        )
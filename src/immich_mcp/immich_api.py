@@ -1,13 +1,137 @@
+import asyncio
+import importlib.util
 import json
 import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 import httpx
 
+from immich_mcp.admission import DOWNLOAD_EXTENSION, ConcurrencyLimitTransport, download_limit, upstream_limit
+from immich_mcp.cache import MISSING, PersistentCache, TTLCache
+from immich_mcp.deadlines import DeadlineTransport, deadline
+from immich_mcp.events import EventListener
+from immich_mcp.metrics import UPSTREAM_DECODE, MetricsTransport
+from immich_mcp.models import (
+    Album,
+    AlbumAssets,
+    ApiKey,
+    Asset,
+    Decoder,
+    Partner,
+    TimeBucket,
+    TimelineDecoder,
+    User,
+    loads,
+)
+from immich_mcp.resilience import CircuitBreaker, RetryTransport, is_transient
+from immich_mcp.singleflight import SingleFlight
+from immich_mcp.tracing import TracingTransport, traced
+
+# Default time-to-live, in seconds, of cached responses per endpoint. Endpoints that are not
+# listed here are never cached.
+DEFAULT_CACHE_TTLS: dict[str, float] = {
+    "my_user": 60.0,
+    "users": 300.0,
+    "partners": 300.0,
+    "my_api_key": 60.0,
+    "api_keys": 60.0,
+    "api_key": 60.0,
+    # Also read by every cached thumbnail for its thumbhash, so a cache hit need not ask Immich.
+    "asset": 60.0,
+    "timeline_buckets": 300.0,
+    "timeline_bucket": 60.0,
+    "albums": 60.0,
+    "album": 30.0,
+}
+
+# How the responses of cached endpoints are decoded. Only the fields the server returns are
+# kept, so cached responses are small and handed out as they are, without being rebuilt.
+DECODERS: dict[str, Decoder] = {
+    "my_user": Decoder(User),
+    "users": Decoder(User, many=True),
+    "partners": Decoder(Partner, many=True),
+    "asset": Decoder(Asset),
+    "my_api_key": Decoder(ApiKey),
+    "api_keys": Decoder(ApiKey, many=True),
+    "api_key": Decoder(ApiKey),
+    "timeline_buckets": Decoder(TimeBucket, many=True),
+    "timeline_bucket": TimelineDecoder(),
+    "albums": Decoder(Album, many=True),
+    "album": Decoder(Album),
+}
+ALBUM_ASSETS = Decoder(AlbumAssets)
+
+# How long an album's asset IDs are kept. They are checked against the album's `updatedAt` and
+# `assetCount` on every read, so this only bounds how long an album nobody reads takes up memory.
+ALBUM_MEMBERS_TTL = 86400.0
+
+# How often, in seconds, changes to the cache are written to its on-disk copy.
+PERSIST_INTERVAL = 1.0
+
+# The timeline is bucketed by month. Immich before 1.133 requires the bucket size to be sent, and
+# later versions, which only bucket by month, ignore it.
+TIMELINE_PARAMS = {"size": "MONTH"}
+
+
+# Realtime events that carry updated assets, and events that carry the IDs of assets that are gone
+# or changed in ways the event does not describe.
+ASSET_UPDATE_EVENTS = frozenset({"on_asset_update"})
+ASSET_REMOVAL_EVENTS = frozenset({"on_asset_delete", "on_asset_trash", "on_asset_hidden", "on_asset_restore"})
+
+
+def _parse_cache_ttls(value: str) -> dict[str, float]:
+    """Parses an `endpoint=seconds,...` list such as the `IMMICH_CACHE_TTLS` variable."""
+    ttls = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, seconds = item.partition("=")
+        ttls[endpoint.strip()] = float(seconds)
+    return ttls
+
+
+def http_limits_from_env() -> httpx.Limits:
+    """Returns the connection pool limits set by the IMMICH_HTTP_* variables."""
+    return httpx.Limits(
+        max_connections=int(os.environ.get("IMMICH_HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.environ.get("IMMICH_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.environ.get("IMMICH_HTTP_KEEPALIVE_EXPIRY", 5)),
+    )
+
+
+def http_timeout_from_env() -> httpx.Timeout:
+    """
+    Returns the request timeouts set by the IMMICH_HTTP_*_TIMEOUT variables. Each phase defaults
+    to IMMICH_HTTP_TIMEOUT.
+    """
+    default = float(os.environ.get("IMMICH_HTTP_TIMEOUT", 30))
+    phases = {
+        phase: float(os.environ.get(f"IMMICH_HTTP_{phase.upper()}_TIMEOUT", default))
+        for phase in ("connect", "read", "write", "pool")
+    }
+    return httpx.Timeout(**phases)
+
 
 class ImmichAPI:
     """A client for interacting with the Immich API."""
 
-    def __init__(self, base_url: str | None = None, api_key: str | None = None):
+    def __init__(
+        self,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        cache_ttls: dict[str, float] | None = None,
+        cache_max_entries: int | None = None,
+        stale_grace: float | None = None,
+        bulk_concurrency: int | None = None,
+        max_retries: int | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        cache_path: str | None = None,
+        limits: httpx.Limits | None = None,
+        timeout: httpx.Timeout | None = None,
+        http2: bool | None = None,
+    ):
         self.base_url = base_url or os.environ.get("IMMICH_BASE_URL")
         self.api_key = api_key or os.environ.get("IMMICH_API_KEY")
 
@@ -20,6 +144,71 @@ class ImmichAPI:
                 "Immich API key must be provided via argument or IMMICH_API_KEY environment variable."
             )
 
+        self.cache_ttls = dict(DEFAULT_CACHE_TTLS)
+        self.cache_ttls.update(_parse_cache_ttls(os.environ.get("IMMICH_CACHE_TTLS", "")))
+        self.cache_ttls.update(cache_ttls or {})
+        if cache_max_entries is None:
+            cache_max_entries = int(os.environ.get("IMMICH_CACHE_MAX_ENTRIES", 1024))
+        if stale_grace is None:
+            stale_grace = float(os.environ.get("IMMICH_CACHE_STALE_GRACE", 60))
+        self.cache = TTLCache(max_entries=cache_max_entries, stale_grace=stale_grace)
+        # An optional on-disk copy of the cache, so that a restarted server starts warm. Only the
+        # keys are read up front; each entry is loaded the first time it is asked for.
+        self._store = None
+        self._persisted: set[tuple] = set()
+        self._persist_queue: list[tuple] = []
+        self._persist_task: asyncio.Task | None = None
+        self._persist_deletes = 0
+        self.persist_max_stale = float(os.environ.get("IMMICH_CACHE_PERSIST_MAX_STALE", 3600))
+        if cache_path:
+            scope = PersistentCache.scope(self.base_url, self.api_key)
+            self._store = PersistentCache(cache_path, scope, max_entries=cache_max_entries)
+            self._persisted = self._store.keys()
+        self.inflight = SingleFlight()
+        # Background refreshes of stale cache entries, by cache key.
+        self._revalidations: dict[tuple, asyncio.Task] = {}
+        # While Immich's event stream is connected, cached assets are kept up to date by events
+        # and can be cached for much longer than their TTL.
+        self.events_connected = False
+        self.event_asset_ttl = float(os.environ.get("IMMICH_EVENTS_ASSET_TTL", 3600))
+        self._asset_events = 0
+        if bulk_concurrency is None:
+            bulk_concurrency = int(os.environ.get("IMMICH_BULK_CONCURRENCY", 8))
+        self.bulk_concurrency = bulk_concurrency
+        # The asset IDs of albums, with the `updatedAt` and `assetCount` they were fetched at.
+        self.album_members = TTLCache(max_entries=int(os.environ.get("IMMICH_ALBUM_CACHE_ALBUMS", 256)))
+        self.album_chunk_size = int(os.environ.get("IMMICH_ALBUM_CHUNK_SIZE", 500))
+
+        if max_retries is None:
+            max_retries = int(os.environ.get("IMMICH_RETRY_ATTEMPTS", 2))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get("IMMICH_CIRCUIT_FAILURE_THRESHOLD", 5)),
+            reset_timeout=float(os.environ.get("IMMICH_CIRCUIT_RESET_TIMEOUT", 30)),
+        )
+        self.limits = limits or http_limits_from_env()
+        if http2 is None:
+            http2 = os.environ.get("IMMICH_HTTP2", "false").lower() in ("1", "true", "yes")
+        self.http2 = http2
+        if http2 and transport is None and importlib.util.find_spec("h2") is None:
+            # httpx would only fail on the first request.
+            raise RuntimeError('IMMICH_HTTP2 needs the http2 extra: pip install "immich-mcp[http2]"')
+        self._http_transport = transport or httpx.AsyncHTTPTransport(limits=self.limits, http2=http2)
+        retry_transport = RetryTransport(
+            DeadlineTransport(TracingTransport(self._http_transport)),
+            max_retries=max_retries,
+            backoff=float(os.environ.get("IMMICH_RETRY_BACKOFF", 0.2)),
+            breaker=self.breaker,
+        )
+        # The concurrency limits are shared by every client in the process, so they bound the total
+        # load on Immich; a request keeps its slot across its retries.
+        limit = upstream_limit()
+        downloads = download_limit()
+        self._transport = MetricsTransport(
+            ConcurrencyLimitTransport(retry_transport, limit, downloads)
+            if limit is not None or downloads is not None
+            else retry_transport
+        )
+
         # Ensure the base URL does not end with a slash, then append /api
         api_url = f"{self.base_url.rstrip('/')}/api"
 
@@ -29,7 +218,8 @@ class ImmichAPI:
                 "x-api-key": self.api_key,
                 "Accept": "application/json",
             },
-            timeout=30.0,
+            timeout=timeout or http_timeout_from_env(),
+            transport=self._transport,
         )
 
     async def __aenter__(self):
@@ -40,8 +230,251 @@ class ImmichAPI:
 
     async def close(self):
         """Closes the HTTP client."""
+        revalidations = list(self._revalidations.values())
+        for task in revalidations:
+            task.cancel()
+        await asyncio.gather(*revalidations, return_exceptions=True)
         await self._client.aclose()
+        if self._store is not None:
+            if self._persist_task is not None:
+                self._persist_task.cancel()
+                await asyncio.gather(self._persist_task, return_exceptions=True)
+            operations, self._persist_queue = self._persist_queue, []
+            await asyncio.to_thread(self._store.apply, operations)
+            self._store.close()
+
+    def pool_stats(self) -> dict[str, int | float | bool | None]:
+        """
+        Returns the number of active and idle pooled connections, of requests being sent over them
+        and of requests waiting for one, with the pool's limits. `saturation` is the share of
+        `maxConnections` in use; at 1 new requests queue, as they do once `queued` is above 0.
+        """
+        active, idle, in_flight, queued = self._pool_counts()
+        max_connections = self.limits.max_connections
+        return {
+            "active": active,
+            "idle": idle,
+            "inFlight": in_flight,
+            "queued": queued,
+            "maxConnections": max_connections,
+            "maxKeepaliveConnections": self.limits.max_keepalive_connections,
+            "http2": self.http2,
+            "saturation": active / max_connections if max_connections else 0.0,
+        }
+
+    def _pool_counts(self) -> tuple[int, int, int, int]:
+        # httpx does not expose its connection pool, so this reads httpcore's internals. Should a
+        # release change them, or a custom transport have no pool, the counts read as 0 rather
+        # than breaking the metrics endpoint.
+        pool = getattr(self._http_transport, "_pool", None)
+        try:
+            connections = list(getattr(pool, "connections", ()))
+            idle = sum(1 for connection in connections if connection.is_idle())
+            requests = list(getattr(pool, "_requests", ()))
+            queued = sum(1 for request in requests if request.is_queued())
+        except (AttributeError, TypeError):
+            return 0, 0, 0, 0
+        return len(connections) - idle, idle, len(requests) - queued, queued
+
+    def invalidate(self, *endpoints: str) -> int:
+        """Drops cached responses for the given endpoints (every endpoint if none are given)."""
+        if not endpoints:
+            self._persist(("clear",))
+            return self.cache.invalidate()
+        for endpoint in endpoints:
+            self._persist(("delete", endpoint, None))
+        return self.cache.invalidate(lambda key: key[0] in endpoints)
+
+    async def refresh_expiring(self, within: float) -> int:
+        """
+        Refetches the cached responses that have been read since they were stored and expire
+        within `within` seconds, and returns how many were refreshed.
+        """
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def refresh(key: tuple) -> None:
+            async with semaphore:
+                await self._fetch(key)
+
+        keys = self.cache.expiring(within)
+        results = await asyncio.gather(*(refresh(key) for key in keys), return_exceptions=True)
+        return sum(1 for result in results if not isinstance(result, BaseException))
+
+    async def run_cache_warmer(self, interval: float) -> None:
+        """Refreshes frequently read cached responses before they expire, every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_expiring(interval)
+
+    async def _get_json(self, endpoint: str, path: str, params: dict | None = None):
+        """
+        GETs `path` and decodes its JSON body, serving it from the cache while fresh.
+        A stale cached body is returned immediately while it is refetched in the background,
+        and concurrent identical requests share a single upstream round trip.
+        """
+        key = (endpoint, path, tuple(sorted((params or {}).items())))
+        if self._ttl(endpoint) > 0:
+            cached, fresh = self.cache.lookup(key)
+            if not fresh and cached is not MISSING:
+                self._revalidate(key)
+            if cached is MISSING and key in self._persisted:
+                cached = await self._restore(key)
+            if cached is not MISSING:
+                return cached
+        return await self._fetch(key)
+
+    async def _restore(self, key: tuple):
+        """
+        Loads a response cached before the server restarted. An expired one is still returned
+        within `persist_max_stale` seconds of its expiry, and refetched in the background.
+        """
+        self._persisted.discard(key)
+        asset_events, deletes = self._asset_events, self._persist_deletes
+        loaded = await asyncio.to_thread(self._store.load, key)
+        # The entry may have been invalidated during the load, or an asset event may have
+        # described a newer version.
+        if loaded is None or deletes != self._persist_deletes:
+            return MISSING
+        if key[0] == "asset" and asset_events != self._asset_events:
+            return MISSING
+        value, expires_at = loaded
+        ttl = expires_at - time.time()
+        if ttl > 0:
+            self.cache.set(key, value, min(ttl, self._ttl(key[0])))
+            return value
+        if -ttl > self.persist_max_stale:
+            return MISSING
+        self._revalidate(key)
+        return value
+
+    async def _fetch(self, key: tuple):
+        endpoint, path, params = key
+        params = dict(params) or None
+
+        async def fetch():
+            asset_events = self._asset_events
+            # Shared by every caller waiting for this response, so no single caller's deadline
+            # applies; the request is cancelled instead once all of them have given up.
+            with deadline(None):
+                response = await self._client.get(path, params=params)
+            response.raise_for_status()
+            start = time.perf_counter()
+            decoder = DECODERS.get(endpoint)
+            data = decoder.decode(response.content) if decoder else loads(response.content)
+            UPSTREAM_DECODE.observe(time.perf_counter() - start, endpoint=endpoint)
+            # An asset event that arrived during the request may describe a newer version.
+            if endpoint != "asset" or asset_events == self._asset_events:
+                self.cache.set(key, data, self._ttl(endpoint))
+                self._persist_value(key, data)
+            return data
+
+        return await self.inflight.do(("GET", str(httpx.URL(path, params=params))), fetch)
+
+    def _revalidate(self, key: tuple) -> None:
+        """Refetches a stale cache entry in the background, unless that is already under way."""
+        if key in self._revalidations:
+            return
+        task = asyncio.create_task(self._fetch(key))
+        self._revalidations[key] = task
+
+        def done(task: asyncio.Task) -> None:
+            del self._revalidations[key]
+            # A failed refresh leaves the stale entry in place until its grace period ends.
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+
+    def _persist_value(self, key: tuple, value) -> None:
+        # Stored with the endpoint's own TTL: a longer one granted while events are connected
+        # does not survive a restart, as events may be missed in between.
+        ttl = self.cache_ttls.get(key[0], 0.0)
+        if ttl > 0:
+            self._persist(("set", key, value, time.time() + ttl))
+
+    def _persist(self, operation: tuple) -> None:
+        """Queues a change to the on-disk cache, which is written out in the background."""
+        if self._store is None:
+            return
+        if operation[0] != "set":
+            self._persist_deletes += 1
+        if operation[0] == "clear":
+            self._persisted.clear()
+        elif operation[0] == "delete":
+            _, endpoint, paths = operation
+            self._persisted = {
+                key
+                for key in self._persisted
+                if key[0] != endpoint or (paths is not None and key[1] not in paths)
+            }
+        self._persist_queue.append(operation)
+        if self._persist_task is None:
+            self._persist_task = asyncio.create_task(self._write_persisted())
+
+    async def _write_persisted(self) -> None:
+        # Batches the changes of a second into one transaction, off the event loop.
+        try:
+            while self._persist_queue:
+                try:
+                    await asyncio.sleep(PERSIST_INTERVAL)
+                finally:
+                    operations, self._persist_queue = self._persist_queue, []
+                    await asyncio.to_thread(self._store.apply, operations)
+        except Exception as exc:
+            print(f"Writing the persistent cache failed: {exc!r}")
+        finally:
+            self._persist_task = None
+
+    def _ttl(self, endpoint: str) -> float:
+        if endpoint == "asset" and self.events_connected:
+            return self.event_asset_ttl
+        return self.cache_ttls.get(endpoint, 0.0)
+
+    def apply_event(self, event: str, payload) -> None:
+        """Updates or drops the cached assets affected by one of Immich's realtime events."""
+        items = payload if isinstance(payload, list) else [payload]
+        if event in ASSET_UPDATE_EVENTS:
+            self._asset_events += 1
+            for asset in items:
+                key = ("asset", f"/assets/{asset['id']}", ())
+                try:
+                    asset = DECODERS["asset"].project(asset)
+                except ValueError:
+                    self.cache.invalidate(lambda cached: cached == key)
+                    self._persist(("delete", "asset", {key[1]}))
+                    continue
+                if self.cache.update(key, asset, self._ttl("asset")):
+                    self._persist_value(key, asset)
+                elif key in self._persisted:
+                    self._persist(("delete", "asset", {key[1]}))
+        elif event in ASSET_REMOVAL_EVENTS:
+            self._asset_events += 1
+            paths = {f"/assets/{asset_id}" for asset_id in items}
+            self._persist(("delete", "asset", paths))
+            self.cache.invalidate(lambda key: key[0] == "asset" and key[1] in paths)
+
+    def _set_events_connected(self, connected: bool) -> None:
+        # Events may have been missed while disconnected, so cached assets can no longer be trusted.
+        self.events_connected = connected
+        self._asset_events += 1
+        self.invalidate("asset")
+
+    async def run_event_listener(self, **kwargs) -> None:
+        """
+        Keeps cached assets up to date from Immich's realtime event stream until cancelled.
+        Keyword arguments are passed on to `EventListener`.
+        """
+        listener = EventListener(
+            self.base_url,
+            self.api_key,
+            self.apply_event,
+            on_connect=lambda: self._set_events_connected(True),
+            on_disconnect=lambda: self._set_events_connected(False),
+            **kwargs,
+        )
+        await listener.run()
 
+    @traced
     async def ping_server(self) -> bool:
         """Pings the Immich server to check for a valid connection."""
         try:
@@ -54,65 +487,297 @@ class ImmichAPI:
         except Exception:
             return False
 
+    @traced
     async def get_my_user(self) -> dict:
         """Fetches the current user's details."""
         try:
-            response = await self._client.get("/users/me")
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("my_user", "/users/me")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return {}
 
+    @traced
     async def get_users_list(self) -> list[dict]:
         """Fetches the list of users."""
         try:
-            response = await self._client.get("/users")
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("users", "/users")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return []
 
+    @traced
     async def get_partners(self) -> list[dict]:
         """Fetches the list of partners."""
         try:
-            response = await self._client.get("/partners", params={"direction": "shared-by"})
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("partners", "/partners", params={"direction": "shared-by"})
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return []
 
+    @traced
     async def get_asset(self, asset_id: str) -> dict:
         """Fetches a single asset by its ID."""
         try:
-            response = await self._client.get(f"/assets/{asset_id}")
+            return await self._get_json("asset", f"/assets/{asset_id}")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
+            return {}
+
+    @traced
+    async def get_assets_bulk(
+        self, asset_ids: list[str], concurrency: int | None = None
+    ) -> list[dict | Exception]:
+        """
+        Fetches many assets concurrently, at most `concurrency` at a time, in the order given.
+        Each item is either the asset's details or the exception raised while fetching it.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.bulk_concurrency)
+
+        async def fetch(asset_id: str) -> dict:
+            async with semaphore:
+                return await self._get_json("asset", f"/assets/{asset_id}")
+
+        return await asyncio.gather(*(fetch(asset_id) for asset_id in asset_ids), return_exceptions=True)
+
+    @traced
+    async def iter_search_metadata(
+        self, filters: dict | None = None, page_size: int = 250, page: int = 1
+    ) -> AsyncIterator[dict]:
+        """
+        Yields pages of assets matching `filters` from `/search/metadata`, starting at `page`.
+        Each page is Immich's `assets` result with `items` and `nextPage`, and the next page is
+        only requested once the previous one has been consumed.
+        """
+        next_page: int | None = page
+        while next_page is not None:
+            response = await self._client.post(
+                "/search/metadata", json={**(filters or {}), "page": next_page, "size": page_size}
+            )
             response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            assets = loads(response.content)["assets"]
+            next_page = int(assets["nextPage"]) if assets.get("nextPage") else None
+            yield assets
+
+    @traced
+    async def get_albums(self) -> list[dict]:
+        """Fetches the albums the user owns or that are shared with them."""
+        try:
+            return await self._get_json("albums", "/albums")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
+            return []
+
+    @traced
+    async def get_album(self, album_id: str) -> dict:
+        """Fetches an album's details, without its assets."""
+        try:
+            return await self._get_album(album_id)
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return {}
 
+    async def _get_album(self, album_id: str) -> dict:
+        return await self._get_json("album", f"/albums/{album_id}", params={"withoutAssets": "true"})
+
+    @traced
+    async def get_album_asset_ids(self, album_id: str) -> list[str]:
+        """
+        Returns the IDs of an album's assets, in the album's order except that those added through
+        this client come last. The album's details are read first, and its assets are only
+        downloaded again when its `updatedAt` or `assetCount` has changed since they were last.
+        Raises if Immich returns an error.
+        """
+        album = await self._get_album(album_id)
+        stamp = (album["updatedAt"], album["assetCount"])
+        cached = self.album_members.get(album_id)
+        if cached is not MISSING and cached[0] == stamp:
+            return cached[1]
+
+        async def fetch() -> list[str]:
+            # Shared by every caller waiting for this album; see _fetch.
+            with deadline(None):
+                response = await self._client.get(f"/albums/{album_id}")
+            response.raise_for_status()
+            asset_ids = [asset["id"] for asset in ALBUM_ASSETS.decode(response.content)["assets"]]
+            self.album_members.set(album_id, (stamp, asset_ids), ALBUM_MEMBERS_TTL)
+            return asset_ids
+
+        return await self.inflight.do(("album_assets", album_id, stamp), fetch)
+
+    @traced
+    async def add_assets_to_album(
+        self, album_id: str, asset_ids: list[str], chunk_size: int | None = None
+    ) -> list[dict]:
+        """
+        Adds assets to an album, sending at most `chunk_size` IDs per request and none that are
+        already in it. Returns Immich's result for each ID, in the order given: `success`, and an
+        `error` such as "duplicate" or "no_permission" if it failed. Raises if a request fails.
+        """
+        return await self._update_album("PUT", album_id, asset_ids, chunk_size)
+
+    @traced
+    async def remove_assets_from_album(
+        self, album_id: str, asset_ids: list[str], chunk_size: int | None = None
+    ) -> list[dict]:
+        """
+        Removes assets from an album, sending at most `chunk_size` IDs per request and none that
+        are not in it. Returns Immich's result for each ID like `add_assets_to_album`.
+        """
+        return await self._update_album("DELETE", album_id, asset_ids, chunk_size)
+
+    async def _update_album(
+        self, method: str, album_id: str, asset_ids: list[str], chunk_size: int | None
+    ) -> list[dict]:
+        adding = method == "PUT"
+        members = await self.get_album_asset_ids(album_id)
+        present = set(members)
+        # Only the difference with the album's current membership is sent.
+        results = {
+            asset_id: {"id": asset_id, "success": False, "error": "duplicate" if adding else "not_found"}
+            for asset_id in asset_ids
+            if (asset_id in present) == adding
+        }
+        pending = [asset_id for asset_id in dict.fromkeys(asset_ids) if asset_id not in results]
+        chunk_size = chunk_size or self.album_chunk_size
+        try:
+            for start in range(0, len(pending), chunk_size):
+                response = await self._client.request(
+                    method, f"/albums/{album_id}/assets", json={"ids": pending[start : start + chunk_size]}
+                )
+                response.raise_for_status()
+                for result in loads(response.content):
+                    results[result["id"]] = result
+        finally:
+            changed = [asset_id for asset_id in pending if results.get(asset_id, {}).get("success")]
+            await self._apply_album_diff(album_id, members, changed, adding)
+        return [results[asset_id] for asset_id in asset_ids]
+
+    async def _apply_album_diff(
+        self, album_id: str, members: list[str], changed: list[str], adding: bool
+    ) -> None:
+        """
+        Applies a change made through this client to the album's cached asset IDs, so that they
+        need not be downloaded again. They are dropped instead if the album's new `assetCount`
+        shows that it was also changed by someone else.
+        """
+        self.invalidate("albums")
+        self.cache.invalidate(lambda key: key[:2] == ("album", f"/albums/{album_id}"))
+        self._persist(("delete", "album", {f"/albums/{album_id}"}))
+        if adding:
+            members = members + changed
+        else:
+            removed = set(changed)
+            members = [asset_id for asset_id in members if asset_id not in removed]
+        self.album_members.invalidate(lambda key: key == album_id)
+        try:
+            album = await self._get_album(album_id)
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return
+        if album["assetCount"] == len(members):
+            self.album_members.set(
+                album_id, ((album["updatedAt"], album["assetCount"]), members), ALBUM_MEMBERS_TTL
+            )
+
+    @traced
+    async def get_timeline_buckets(self, filters: dict | None = None) -> list[dict]:
+        """
+        Fetches the months of the timeline, newest first, with how many assets matching `filters`
+        (Immich's `albumId`, `personId`, `isFavorite`, ... query parameters) were taken in each.
+        Raises if Immich returns an error.
+        """
+        params = {**(filters or {}), **TIMELINE_PARAMS}
+        return await self._get_json("timeline_buckets", "/timeline/buckets", params=params)
+
+    @traced
+    async def get_timeline_bucket(self, time_bucket: str, filters: dict | None = None) -> list[dict]:
+        """
+        Fetches the assets matching `filters` in a month of the timeline, where `time_bucket` is
+        the month's `timeBucket` from `get_timeline_buckets`. Raises if Immich returns an error.
+        """
+        params = {**(filters or {}), **TIMELINE_PARAMS, "timeBucket": time_bucket}
+        return await self._get_json("timeline_bucket", "/timeline/bucket", params=params)
+
+    @asynccontextmanager
+    @traced
+    async def stream_thumbnail(self, asset_id: str, size: str = "thumbnail") -> AsyncIterator[httpx.Response]:
+        """
+        Streams an asset's thumbnail image, where `size` is "thumbnail" or "preview".
+        Yields the response with its body unread; raises if Immich returns an error.
+        """
+        async with self._client.stream(
+            "GET",
+            f"/assets/{asset_id}/thumbnail",
+            params={"size": size},
+            headers={"Accept": "application/octet-stream"},
+        ) as response:
+            response.raise_for_status()
+            yield response
+
+    @traced
+    async def get_download_info(self, asset_ids: list[str], archive_size: int | None = None) -> dict:
+        """
+        Asks Immich how it would split a download of `asset_ids` into ZIP archives of about
+        `archive_size` bytes: returns the `totalSize` and the `archives`, each with its `size` and
+        `assetIds`. Raises if Immich returns an error.
+        """
+        body: dict = {"assetIds": asset_ids}
+        if archive_size is not None:
+            body["archiveSize"] = archive_size
+        response = await self._client.post("/download/info", json=body)
+        response.raise_for_status()
+        return loads(response.content)
+
+    @asynccontextmanager
+    @traced
+    async def stream_archive(self, asset_ids: list[str]) -> AsyncIterator[httpx.Response]:
+        """
+        Streams a ZIP archive of the originals of `asset_ids`, which should be one of the archives
+        from `get_download_info`. Yields the response with its body unread; raises if Immich
+        returns an error. The download holds a slot of the download limit until it is closed,
+        rather than one of the upstream limit.
+        """
+        async with self._client.stream(
+            "POST",
+            "/download/archive",
+            json={"assetIds": asset_ids},
+            headers={"Accept": "application/octet-stream"},
+            extensions={DOWNLOAD_EXTENSION: True},
+        ) as response:
+            response.raise_for_status()
+            yield response
+
+    @traced
     async def get_my_api_key(self) -> dict:
         """Fetches the current API key's details."""
         try:
-            response = await self._client.get("/api-keys/me")
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("my_api_key", "/api-keys/me")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return {}
 
+    @traced
     async def get_api_key_list(self) -> list[dict]:
         """Fetches the list of API keys."""
         try:
-            response = await self._client.get("/api-keys")
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("api_keys", "/api-keys")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return []
 
+    @traced
     async def get_api_key(self, api_key_id: str) -> dict:
         """Fetches a single API key by its ID."""
         try:
-            response = await self._client.get(f"/api-keys/{api_key_id}")
-            response.raise_for_status()
-            return response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError):
+            return await self._get_json("api_key", f"/api-keys/{api_key_id}")
+        except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+            if is_transient(exc):
+                raise
             return {}
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import traceback
+
+import httpx
+
+from immich_mcp.immich_api import ImmichAPI
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    id TEXT PRIMARY KEY,
+    original_file_name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT NOT NULL,
+    taken_at TEXT,
+    make TEXT COLLATE NOCASE,
+    model TEXT COLLATE NOCASE,
+    city TEXT,
+    state TEXT,
+    country TEXT,
+    latitude REAL,
+    longitude REAL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_original_file_name ON assets (original_file_name);
+CREATE INDEX IF NOT EXISTS assets_taken_at ON assets (taken_at);
+CREATE INDEX IF NOT EXISTS assets_model ON assets (model, make);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_COLUMN_NAMES = (
+    "id",
+    "original_file_name",
+    "type",
+    "taken_at",
+    "make",
+    "model",
+    "city",
+    "state",
+    "country",
+    "latitude",
+    "longitude",
+    "updated_at",
+)
+_COLUMNS = ", ".join(_COLUMN_NAMES)
+_UPSERT = f"INSERT OR REPLACE INTO assets ({_COLUMNS}) VALUES ({', '.join('?' for _ in _COLUMN_NAMES)})"
+
+
+class AssetIndex:
+    """
+    A local SQLite index of asset metadata that is kept up to date incrementally.
+
+    Each sync only pulls assets updated since the previous one. Assets that are moved to the
+    trash are removed from the index; assets deleted permanently without passing through the
+    trash are not noticed until the index file is removed and rebuilt.
+    """
+
+    def __init__(self, path: str, page_size: int = 1000):
+        self.path = path
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "AssetIndex | None":
+        """Opens the index at IMMICH_INDEX_PATH, or returns None if the index is not enabled."""
+        path = os.environ.get("IMMICH_INDEX_PATH")
+        return cls(path) if path else None
+
+    def close(self) -> None:
+        """Closes the SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+    async def sync(self, immich_client: ImmichAPI) -> int:
+        """Pulls assets changed since the last sync into the index and returns how many changed."""
+        updated_after = await asyncio.to_thread(self._get_state, "updated_after")
+        filters = {"withExif": True, "withDeleted": True}
+        if updated_after:
+            filters["updatedAfter"] = updated_after
+
+        changed = 0
+        high_water_mark = updated_after
+        async for page in immich_client.iter_search_metadata(filters, page_size=self.page_size):
+            items = page["items"]
+            await asyncio.to_thread(self._apply, items)
+            changed += len(items)
+            for item in items:
+                if high_water_mark is None or item["updatedAt"] > high_water_mark:
+                    high_water_mark = item["updatedAt"]
+
+        # Only advance the high-water mark once every page has been applied, so that an
+        # interrupted sync is retried from where the previous complete sync left off.
+        if high_water_mark and high_water_mark != updated_after:
+            await asyncio.to_thread(self._set_state, "updated_after", high_water_mark)
+        return changed
+
+    async def run_sync_loop(self, immich_client: ImmichAPI, interval: float) -> None:
+        """Syncs the index every `interval` seconds until cancelled."""
+        while True:
+            try:
+                changed = await self.sync(immich_client)
+                print(f"Asset index synced, {changed} assets changed")
+            except (httpx.RequestError, httpx.HTTPStatusError, KeyError) as exc:
+                print(f"Asset index sync failed: {exc!r}")
+            except Exception:
+                # Anything else, such as an overloaded upstream limit or a database error, must not
+                # stop the index from syncing again; the traceback tells what went wrong.
+                print("Asset index sync failed unexpectedly:")
+                traceback.print_exc()
+            await asyncio.sleep(interval)
+
+    async def find_by_filename_prefix(self, prefix: str, limit: int = 100) -> list[dict]:
+        """Returns assets whose original file name starts with `prefix`, ignoring case."""
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return await self._query(
+            "original_file_name LIKE ? ESCAPE '\\' ORDER BY original_file_name", (f"{escaped}%",), limit
+        )
+
+    async def find_by_date_range(self, start: str, end: str, limit: int = 100) -> list[dict]:
+        """Returns assets taken at or after `start` and before `end` (ISO 8601 strings)."""
+        return await self._query("taken_at >= ? AND taken_at < ? ORDER BY taken_at", (start, end), limit)
+
+    async def find_by_camera(self, model: str, make: str | None = None, limit: int = 100) -> list[dict]:
+        """Returns assets taken with the given camera model (and make, if given), ignoring case."""
+        if make is None:
+            return await self._query("model = ? ORDER BY taken_at", (model,), limit)
+        return await self._query("model = ? AND make = ? ORDER BY taken_at", (model, make), limit)
+
+    async def count(self) -> int:
+        """Returns the number of indexed assets."""
+        rows = await asyncio.to_thread(self._execute, "SELECT COUNT(*) FROM assets", ())
+        return rows[0][0]
+
+    async def _query(self, where: str, params: tuple, limit: int) -> list[dict]:
+        rows = await asyncio.to_thread(
+            self._execute, f"SELECT {_COLUMNS} FROM assets WHERE {where} LIMIT ?", (*params, limit)
+        )
+        return [_row_to_asset(row) for row in rows]
+
+    def _execute(self, sql: str, params: tuple) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _apply(self, items: list[dict]) -> None:
+        live = [_asset_to_row(item) for item in items if not item.get("isTrashed")]
+        trashed = [(item["id"],) for item in items if item.get("isTrashed")]
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, live)
+            self._conn.executemany("DELETE FROM assets WHERE id = ?", trashed)
+
+    def _get_state(self, key: str) -> str | None:
+        rows = self._execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def _set_state(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def _asset_to_row(item: dict) -> tuple:
+    exif = item.get("exifInfo") or {}
+    return (
+        item["id"],
+        item["originalFileName"],
+        item["type"],
+        item.get("fileCreatedAt"),
+        exif.get("make"),
+        exif.get("model"),
+        exif.get("city"),
+        exif.get("state"),
+        exif.get("country"),
+        exif.get("latitude"),
+        exif.get("longitude"),
+        item["updatedAt"],
+    )
+
+
+def _row_to_asset(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "originalFileName": row["original_file_name"],
+        "type": row["type"],
+        "takenAt": row["taken_at"],
+        "make": row["make"],
+        "model": row["model"],
+        "city": row["city"],
+        "state": row["state"],
+        "country": row["country"],
+        "latitude": row["latitude"],
+        "longitude": row["longitude"],
+    }
@@ -1,3 +1,111 @@
-from immich_mcp.server import mcp
+import hashlib
+import math
+import os
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from immich_mcp.admission import OverloadedError
+from immich_mcp.exports import CHUNK_SIZE
+from immich_mcp.metrics import CONTENT_TYPE, REGISTRY
+from immich_mcp.server import CALLER_API_KEY_HEADER, archive_downloads_enabled, mcp, shared_context
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Serves the server's metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@mcp.custom_route("/download/archive", methods=["POST"])
+async def download_archive(request: Request) -> Response:
+    """
+    Streams a ZIP archive of the originals of the `assetIds` in the JSON body from Immich, with
+    the API key the caller sends. Each chunk is read from Immich only once the previous one has
+    been sent, so a slow client slows the download instead of filling memory. Only served when
+    IMMICH_MCP_ARCHIVE_DOWNLOADS and per-caller API keys are enabled.
+    """
+    context = shared_context.context
+    if not archive_downloads_enabled() or context is None or context["client_pool"] is None:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    api_key = request.headers.get(CALLER_API_KEY_HEADER)
+    if not api_key:
+        return JSONResponse({"error": f"Send an Immich API key in {CALLER_API_KEY_HEADER}"}, status_code=401)
+    try:
+        asset_ids = (await request.json())["assetIds"]
+    except (ValueError, KeyError, TypeError):
+        asset_ids = None
+    if not isinstance(asset_ids, list) or not asset_ids:
+        return JSONResponse({"error": "Expected a JSON body with assetIds"}, status_code=400)
+    stack = AsyncExitStack()
+    try:
+        if context["rate_limiter"] is not None:
+            scope = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+            await context["rate_limiter"].acquire(f"key:{scope}")
+        immich_client = await stack.enter_async_context(context["client_pool"].lease(api_key))
+        upstream = await stack.enter_async_context(immich_client.stream_archive(asset_ids))
+    except OverloadedError as exc:
+        await stack.aclose()
+        return JSONResponse(
+            {"error": str(exc)},
+            status_code=503,
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
+    except ValueError as exc:
+        await stack.aclose()
+        return JSONResponse({"error": str(exc)}, status_code=401)
+    except httpx.HTTPStatusError as exc:
+        await stack.aclose()
+        return JSONResponse({"error": "Immich refused the download"}, status_code=exc.response.status_code)
+    except httpx.RequestError:
+        await stack.aclose()
+        return JSONResponse({"error": "Failed to reach Immich"}, status_code=502)
+    chunks = upstream.aiter_bytes(int(os.environ.get("IMMICH_EXPORT_CHUNK_SIZE", CHUNK_SIZE)))
+    stack.push_async_callback(chunks.aclose)
+    return _ReleasingStreamingResponse(
+        chunks,
+        stack,
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="immich-download.zip"'},
+    )
+
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """
+    A streaming response that closes `stack` once it has been sent or has failed to be, including
+    when the client went away before the body was ever read from.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], stack: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self._stack = stack
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._stack.aclose()
+
 
 app = mcp.streamable_http_app()
+_session_manager_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    """
+    Holds the shared Immich client open for the lifetime of the worker process, so that it is
+    created once per worker and kept between sessions, including stateless requests that each
+    run the MCP lifespan.
+    """
+    async with shared_context.acquire():
+        async with _session_manager_lifespan(app):
+            yield
+
+
+app.router.lifespan_context = lifespan
@@ -0,0 +1,345 @@
+import functools
+import math
+import re
+import time
+from collections.abc import AsyncIterator, Callable, Sequence
+
+import httpx
+
+# Content type of the Prometheus text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Matches path segments that are IDs (UUIDs or numbers), which are collapsed so that every
+# asset or API key shares one upstream endpoint label.
+_ID_SEGMENT = re.compile(
+    r"/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)"
+)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple[str, ...], extra: dict[str, str] | None = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{self._format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value per label set that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{self._format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Observations per label set, counted into cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (the last one is +Inf), sum and count.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+        total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Adds a callback that updates gauges right before the metrics are rendered."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+MCP_REQUESTS = REGISTRY.register(
+    Counter("immich_mcp_requests_total", "MCP resource reads and tool calls.", ("kind", "name"))
+)
+MCP_ERRORS = REGISTRY.register(
+    Counter("immich_mcp_errors_total", "MCP resource reads and tool calls that raised.", ("kind", "name"))
+)
+MCP_LATENCY = REGISTRY.register(
+    Histogram(
+        "immich_mcp_request_duration_seconds",
+        "Time spent in MCP resource and tool handlers.",
+        ("kind", "name"),
+    )
+)
+UPSTREAM_REQUESTS = REGISTRY.register(
+    Counter(
+        "immich_upstream_requests_total",
+        "Requests sent to Immich, by endpoint and status.",
+        ("method", "endpoint", "status"),
+    )
+)
+UPSTREAM_ERRORS = REGISTRY.register(
+    Counter(
+        "immich_upstream_errors_total",
+        "Requests to Immich that failed or returned an error status.",
+        ("method", "endpoint"),
+    )
+)
+UPSTREAM_LATENCY = REGISTRY.register(
+    Histogram(
+        "immich_upstream_request_duration_seconds",
+        "Time from sending a request to Immich until its body has been read, including retries.",
+        ("method", "endpoint"),
+    )
+)
+UPSTREAM_DECODE = REGISTRY.register(
+    Histogram(
+        "immich_upstream_decode_duration_seconds",
+        "Time spent decoding JSON responses from Immich.",
+        ("endpoint",),
+        buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+    )
+)
+POOL_CONNECTIONS = REGISTRY.register(
+    Gauge("immich_pool_connections", "Connections to Immich in the HTTP connection pool.", ("state",))
+)
+POOL_QUEUED = REGISTRY.register(
+    Gauge("immich_pool_queued_requests", "Requests waiting for a connection to Immich.")
+)
+POOL_IN_FLIGHT = REGISTRY.register(
+    Gauge("immich_pool_in_flight_requests", "Requests to Immich being sent over a pooled connection.")
+)
+POOL_SATURATION = REGISTRY.register(
+    Gauge("immich_pool_saturation", "Share of the connection pool's maximum size in use, from 0 to 1.")
+)
+CACHE_EVENTS = REGISTRY.register(
+    Gauge(
+        "immich_cache_events",
+        "Response cache hits, stale hits, misses and evictions since startup.",
+        ("event",),
+    )
+)
+CACHE_SIZE = REGISTRY.register(Gauge("immich_cache_entries", "Entries in the response cache."))
+CLIENT_POOL_SIZE = REGISTRY.register(
+    Gauge("immich_client_pool_clients", "Immich clients pooled for callers' own API keys.")
+)
+ADMISSION_QUEUE_TIME = REGISTRY.register(
+    Histogram(
+        "immich_admission_queue_seconds",
+        "Time requests waited for the rate limiter or for a free upstream slot.",
+        ("stage",),
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    )
+)
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter(
+        "immich_admission_rejected_total",
+        "Requests rejected by the rate limiter or because all upstream slots stayed busy.",
+        ("stage",),
+    )
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.register(
+    Gauge("immich_upstream_in_flight_requests", "Requests to Immich holding an upstream concurrency slot.")
+)
+UPSTREAM_QUEUED = REGISTRY.register(
+    Gauge("immich_upstream_queued_requests", "Requests waiting for an upstream concurrency slot.")
+)
+CIRCUIT_OPEN = REGISTRY.register(
+    Gauge("immich_circuit_open", "Whether the circuit breaker to Immich is open (1) or closed (0).")
+)
+
+
+def instrument(kind: str, name: str) -> Callable:
+    """Decorates an async MCP handler to record its call count, errors and latency."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            MCP_REQUESTS.inc(kind=kind, name=name)
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                MCP_ERRORS.inc(kind=kind, name=name)
+                raise
+            finally:
+                MCP_LATENCY.observe(time.perf_counter() - start, kind=kind, name=name)
+
+        return wrapper
+
+    return decorator
+
+
+def endpoint_label(path: str) -> str:
+    """Collapses IDs in an upstream path, e.g. `/api/assets/<uuid>` becomes `/api/assets/{id}`."""
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport to record upstream request counts, errors and time to last byte."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        method = request.method
+        endpoint = endpoint_label(request.url.path)
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            UPSTREAM_REQUESTS.inc(method=method, endpoint=endpoint, status="error")
+            UPSTREAM_ERRORS.inc(method=method, endpoint=endpoint)
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+            raise
+
+        UPSTREAM_REQUESTS.inc(method=method, endpoint=endpoint, status=str(response.status_code))
+        if response.status_code >= 400:
+            UPSTREAM_ERRORS.inc(method=method, endpoint=endpoint)
+
+        def on_close() -> None:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=OnCloseStream(response.stream, on_close),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class OnCloseStream(httpx.AsyncByteStream):
+    """A response stream that calls `on_close` once, when the body has been read and closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,187 @@
+import json
+from itertools import repeat
+from typing import Any, List, NotRequired
+
+# Pydantic, which builds the schemas of tool results, rejects typing.TypedDict before Python 3.12.
+from typing_extensions import TypedDict
+
+try:
+    import msgspec
+except ImportError:  # Optional; bodies are decoded in full and then projected.
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library decoder is used instead.
+    orjson = None
+
+
+class User(TypedDict):
+    """Represents a user in Immich."""
+
+    id: str
+    email: str
+    name: str
+
+
+class Partner(User):
+    """Represents a partner in Immich."""
+
+    inTimeline: bool
+
+
+class Asset(TypedDict):
+    """Represents an asset in Immich."""
+
+    id: str
+    originalFileName: str
+    type: str
+    # Changes whenever the asset's thumbnail does; None until Immich has generated one.
+    thumbhash: NotRequired[str | None]
+
+
+class ApiKey(TypedDict):
+    """Represents an API key in Immich."""
+
+    id: str
+    name: str
+    createdAt: str
+    updatedAt: str
+    permissions: List[str]
+
+
+class Album(TypedDict):
+    """Represents an album in Immich."""
+
+    id: str
+    albumName: str
+    description: str
+    ownerId: str
+    shared: bool
+    assetCount: int
+    createdAt: str
+    updatedAt: str
+
+
+class AssetId(TypedDict):
+    """Represents only the ID of an asset."""
+
+    id: str
+
+
+class AlbumAssets(TypedDict):
+    """An album with only the IDs of its assets, which is all its membership needs."""
+
+    assets: List[AssetId]
+
+
+class TimeBucket(TypedDict):
+    """Represents a month of the timeline and how many assets were taken in it."""
+
+    timeBucket: str
+    count: int
+
+
+class TimelineAsset(TypedDict):
+    """Represents an asset in a month of the timeline."""
+
+    id: str
+    type: str
+    takenAt: str | None
+    isFavorite: bool
+
+
+def loads(content: bytes) -> Any:
+    """Decodes a JSON body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class Decoder:
+    """
+    Decodes JSON bodies into a model, or a list of them, keeping only the model's fields.
+
+    With msgspec installed, the body is decoded straight into the model and the fields it does
+    not declare are skipped without being built. Otherwise the body is decoded in full and then
+    projected. Either way, a body that is not valid JSON or lacks a field the model requires
+    raises `json.JSONDecodeError`, which the client already treats as a failed request.
+    """
+
+    __slots__ = ("model", "many", "fields", "optional", "_decoder")
+
+    def __init__(self, model: type, many: bool = False):
+        self.model = model
+        self.many = many
+        self.fields = tuple(model.__annotations__)
+        self.optional = getattr(model, "__optional_keys__", frozenset())
+        self._decoder = None
+        if msgspec is not None:
+            self._decoder = msgspec.json.Decoder(List[model] if many else model)
+
+    def decode(self, content: bytes) -> Any:
+        """Decodes and projects a JSON body."""
+        if self._decoder is None:
+            return self.project(loads(content))
+        try:
+            return self._decoder.decode(content)
+        except msgspec.DecodeError as exc:
+            raise json.JSONDecodeError(str(exc), "", 0) from exc
+
+    def project(self, data: Any) -> Any:
+        """Projects an already decoded value onto the model."""
+        try:
+            fields, optional = self.fields, self.optional
+            if self.many:
+                return [
+                    {field: item[field] for field in fields if field in item or field not in optional}
+                    for item in data
+                ]
+            return {field: data[field] for field in fields if field in data or field not in optional}
+        except (KeyError, TypeError) as exc:
+            raise json.JSONDecodeError(f"Missing field {exc}", "", 0) from exc
+
+
+class TimelineDecoder(Decoder):
+    """
+    Decodes the assets of a timeline bucket into `TimelineAsset`s. Immich 1.133 and later send
+    one array per field instead of a list of assets; both forms are accepted.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(TimelineAsset, many=True)
+
+    def decode(self, content: bytes) -> Any:
+        return self.project(loads(content))
+
+    def project(self, data: Any) -> Any:
+        try:
+            if isinstance(data, dict):
+                ids = data["id"]
+                return [
+                    {
+                        "id": asset_id,
+                        "type": "IMAGE" if is_image else "VIDEO",
+                        "takenAt": taken_at,
+                        "isFavorite": bool(is_favorite),
+                    }
+                    for asset_id, is_image, taken_at, is_favorite in zip(
+                        ids,
+                        data.get("isImage") or repeat(True),
+                        data.get("fileCreatedAt") or repeat(None),
+                        data.get("isFavorite") or repeat(False),
+                    )
+                ]
+            return [
+                {
+                    "id": asset["id"],
+                    "type": asset["type"],
+                    "takenAt": asset.get("localDateTime") or asset.get("fileCreatedAt"),
+                    "isFavorite": bool(asset.get("isFavorite")),
+                }
+                for asset in data
+            ]
+        except (KeyError, TypeError) as exc:
+            raise json.JSONDecodeError(f"Missing field {exc}", "", 0) from exc
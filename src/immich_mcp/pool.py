@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.singleflight import SingleFlight
+
+
+class _PooledClient:
+    """A pooled client, the number of requests currently using it and when it was last used."""
+
+    def __init__(self, client: ImmichAPI, now: float):
+        self.client = client
+        self.leases = 0
+        self.last_used = now
+        self.evicted = False
+
+
+class ClientPool:
+    """
+    A bounded LRU of ImmichAPI clients keyed by API key, so that each caller reuses its own
+    keep-alive connections and cache across requests.
+
+    A key is checked with Immich before its client joins the pool, so that requests with made-up
+    keys cannot evict the clients of real callers. When the pool is full the least recently used
+    client is evicted, and clients that have not been used for `idle_timeout` seconds are closed
+    by `close_idle`. A client that is evicted while a request is still using it is closed once
+    that request finishes.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], ImmichAPI],
+        max_clients: int = 32,
+        idle_timeout: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._entries: OrderedDict[str, _PooledClient] = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+        self.rejected = 0
+        # Concurrent first requests with the same key share one check of it.
+        self._checks = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def lease(self, api_key: str) -> AsyncIterator[ImmichAPI]:
+        """
+        Yields the pooled client for `api_key`, creating it if needed. Raises ValueError if Immich
+        does not accept a key that is not pooled yet.
+        """
+        entry = self._entries.get(api_key)
+        if entry is None:
+            entry = await self._checks.do(api_key, lambda: self._add(api_key))
+        else:
+            self._entries.move_to_end(api_key)
+        entry.leases += 1
+        try:
+            yield entry.client
+        finally:
+            entry.leases -= 1
+            entry.last_used = self._clock()
+            if entry.evicted and entry.leases == 0:
+                await entry.client.close()
+
+    async def close_idle(self) -> int:
+        """Closes and evicts the clients that have been idle for longer than `idle_timeout`."""
+        now = self._clock()
+        idle = [
+            api_key
+            for api_key, entry in self._entries.items()
+            if entry.leases == 0 and now - entry.last_used >= self.idle_timeout
+        ]
+        for api_key in idle:
+            await self._evict(api_key)
+        return len(idle)
+
+    async def run_reaper(self, interval: float) -> None:
+        """Closes idle clients every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.close_idle()
+
+    async def close(self) -> None:
+        """Closes every pooled client."""
+        for api_key in list(self._entries):
+            await self._evict(api_key)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of pooled clients and how many have been created, evicted and rejected."""
+        return {
+            "clients": len(self._entries),
+            "maxClients": self.max_clients,
+            "created": self.created,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
+
+    async def _add(self, api_key: str) -> _PooledClient:
+        client = self._factory(api_key)
+        try:
+            # Any valid key may read its own details, whatever its permissions.
+            accepted = bool(await client.get_my_api_key())
+        except BaseException:
+            await client.close()
+            raise
+        if not accepted:
+            await client.close()
+            self.rejected += 1
+            raise ValueError("Immich did not accept the API key")
+        entry = _PooledClient(client, self._clock())
+        self._entries[api_key] = entry
+        self.created += 1
+        await self._evict_overflow()
+        return entry
+
+    async def _evict_overflow(self) -> None:
+        while len(self._entries) > self.max_clients:
+            await self._evict(next(iter(self._entries)))
+
+    async def _evict(self, api_key: str) -> None:
+        entry = self._entries.pop(api_key)
+        entry.evicted = True
+        self.evicted += 1
+        if entry.leases == 0:
+            await entry.client.close()
@@ -0,0 +1,196 @@
+import asyncio
+import email.utils
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+import httpx
+
+from immich_mcp.deadlines import remaining
+
+# Methods that are safe to send again after a failure.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Statuses that indicate a transient upstream problem worth retrying.
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Statuses that honour the Retry-After header when present.
+RETRY_AFTER_STATUSES = frozenset({429, 503})
+# Statuses that count as upstream failures for the circuit breaker.
+FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast once the upstream is clearly down.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests are rejected
+    for `reset_timeout` seconds. After that a single trial request is let through (half-open):
+    if it succeeds the circuit closes again, otherwise it re-opens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_started_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        """Returns whether a request may be sent now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # Only one trial request at a time; a trial that never reported back (for example
+            # because its caller was cancelled) is given up on after another reset timeout.
+            now = self._clock()
+            if self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout:
+                self._probe_started_at = now
+                return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probe_started_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+        self._probe_started_at = None
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport with bounded retries and a circuit breaker.
+
+    Idempotent requests that fail with a transport error or a transient status are retried up
+    to `max_retries` times with jittered exponential backoff, honouring `Retry-After` on 429
+    and 503 responses, as long as the caller's deadline leaves time to wait. Non-idempotent
+    requests are sent once but still feed the breaker.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+        max_delay: float = 5.0,
+        breaker: CircuitBreaker | None = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self._transport = transport
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self.retries = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        retries_left = self.max_retries if request.method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError("Immich circuit breaker is open", request=request)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as exc:
+                # Running out of the caller's time budget says nothing about Immich's health.
+                if not _within_deadline(0):
+                    raise
+                self.breaker.record_failure()
+                # A read timeout has already used up the whole timeout; retrying would multiply it.
+                if attempt >= retries_left or isinstance(exc, httpx.ReadTimeout):
+                    raise
+                delay = self._backoff_delay(attempt)
+                if not _within_deadline(delay):
+                    raise
+            else:
+                if response.status_code in FAILURE_STATUSES:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRY_STATUSES or attempt >= retries_left:
+                    return response
+                delay = self._retry_delay(response, attempt)
+                if delay is None or not _within_deadline(delay):
+                    return response
+                await response.aclose()
+            attempt += 1
+            self.retries += 1
+            await self._sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full jitter": spreads retries from many callers over the whole backoff window.
+        return random.uniform(0, min(self.max_delay, self.backoff * 2**attempt))
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float | None:
+        """Returns how long to wait before retrying `response`, or None if it should not be retried."""
+        retry_after = response.headers.get("retry-after")
+        if response.status_code not in RETRY_AFTER_STATUSES or retry_after is None:
+            return self._backoff_delay(attempt)
+        delay = _parse_retry_after(retry_after)
+        if delay is None:
+            return self._backoff_delay(attempt)
+        # Waiting longer than our own budget would only tie up the caller; give up instead.
+        return delay if delay <= self.max_delay else None
+
+
+def is_transient(exc: BaseException | None) -> bool:
+    """
+    Returns whether `exc` means that Immich could not serve a request for now, once any retries
+    were used up: the circuit breaker is open, Immich could not be reached, or it answered with a
+    status that says it is overloaded or failing. Asking again later may succeed.
+    """
+    if isinstance(exc, httpx.TransportError):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and (
+        exc.response.status_code in RETRY_STATUSES or exc.response.status_code in FAILURE_STATUSES
+    )
+
+
+def _within_deadline(delay: float) -> bool:
+    """Returns whether waiting `delay` seconds still leaves time before the caller's deadline."""
+    left = remaining()
+    return left is None or delay < left
+
+
+def _parse_retry_after(value: str) -> float | None:
+    """Parses a Retry-After header given either in seconds or as an HTTP date."""
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
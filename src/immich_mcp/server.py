@@ -1,74 +1,584 @@
+import asyncio
+import base64
+import binascii
+import contextvars
+import functools
+import hashlib
+import json
 import os
-from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
-from typing import List, TypedDict
+import re
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing, asynccontextmanager
+from typing import List
 
+import httpx
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ImageContent
+from starlette.requests import Request
+from typing_extensions import TypedDict
 
 if os.environ.get("TESTING"):
     from tests.fake_immich_api import ImmichAPI
 else:
     from immich_mcp.immich_api import ImmichAPI
 
+from immich_mcp.admission import RateLimiter, upstream_limit
+from immich_mcp.deadlines import deadline
+from immich_mcp.duplicates import MAX_DISTANCE, DuplicateIndex
+from immich_mcp.exports import ArchiveExporter
+from immich_mcp.index import AssetIndex
+from immich_mcp.metrics import (
+    CACHE_EVENTS,
+    CACHE_SIZE,
+    CIRCUIT_OPEN,
+    CLIENT_POOL_SIZE,
+    POOL_CONNECTIONS,
+    POOL_IN_FLIGHT,
+    POOL_QUEUED,
+    POOL_SATURATION,
+    REGISTRY,
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_QUEUED,
+    instrument,
+)
+from immich_mcp.models import Album, ApiKey, Asset, Partner, TimelineAsset, User
+from immich_mcp.pool import ClientPool
+from immich_mcp.resilience import CircuitOpenError, is_transient
+from immich_mcp.stats import LibraryStats
+from immich_mcp.thumbnails import ThumbnailCache
+from immich_mcp.tracing import TRACEPARENT_HEADER, TRACER, SpanContext, SpanKind
 
-class User(TypedDict):
-    """Represents a user in Immich."""
+# The request header carrying a caller's own Immich API key.
+CALLER_API_KEY_HEADER = "x-immich-api-key"
+# The request header in which a client may ask for a shorter deadline, in seconds.
+REQUEST_TIMEOUT_HEADER = "x-request-timeout"
+# How often, in seconds, a running handler checks whether its HTTP client has gone away.
+DISCONNECT_POLL_INTERVAL = 0.5
 
-    id: str
-    email: str
-    name: str
+# The scope (a digest of the API key) and client of a caller who sent their own API key.
+_caller: contextvars.ContextVar[tuple[str, ImmichAPI] | None] = contextvars.ContextVar(
+    "immich_caller", default=None
+)
 
 
 UsersList = List[User]
 
 
-class Partner(User):
-    """Represents a partner in Immich."""
+PartnersList = List[Partner]
 
-    inTimeline: bool
 
+class AssetError(TypedDict):
+    """Represents an asset that could not be fetched from Immich."""
 
-PartnersList = List[Partner]
+    id: str
+    error: str
 
 
-class Asset(TypedDict):
-    """Represents an asset in Immich."""
+class AssetPage(TypedDict):
+    """Represents a page of assets and the cursor to fetch the next one."""
 
-    id: str
-    originalFileName: str
-    type: str
+    items: List[Asset]
+    nextCursor: str | None
 
 
-class ApiKey(TypedDict):
-    """Represents an API key in Immich."""
+class IndexedAsset(Asset):
+    """Represents an asset's metadata as stored in the local asset index."""
 
-    id: str
-    name: str
-    createdAt: str
-    updatedAt: str
-    permissions: List[str]
+    takenAt: str | None
+    make: str | None
+    model: str | None
+    city: str | None
+    state: str | None
+    country: str | None
+    latitude: float | None
+    longitude: float | None
+
+
+class DuplicatePair(TypedDict):
+    """Represents two assets whose thumbnails look alike, and how many hash bits tell them apart."""
+
+    assetIds: List[str]
+    distance: int
+
+
+class StatsGroup(TypedDict):
+    """Represents the assets sharing the values of the grouped-by fields, their count and total size."""
+
+    key: dict
+    count: int
+    bytes: int
+
+
+class LibraryStatsReport(TypedDict):
+    """Represents the groups of a library statistics query and the totals over all of them."""
+
+    groups: List[StatsGroup]
+    totalCount: int
+    totalBytes: int
+    truncated: bool
 
 
 ApiKeyList = List[ApiKey]
 
 
+AlbumList = List[Album]
+
+
+class AlbumAssetPage(TypedDict):
+    """Represents a page of the IDs of an album's assets, and the offset of the next page."""
+
+    albumId: str
+    assetIds: List[str]
+    total: int
+    nextOffset: int | None
+
+
+class AlbumUpdate(TypedDict):
+    """Represents the outcome of adding assets to or removing them from an album."""
+
+    albumId: str
+    updated: int
+    unchanged: int
+    errors: List[AssetError]
+
+
+class TimelineMonth(TypedDict):
+    """Represents a month of the timeline and how many assets were taken in it."""
+
+    month: str
+    count: int
+
+
+class Timeline(TypedDict):
+    """Represents the months of the timeline, or one page of the assets taken in a month."""
+
+    months: List[TimelineMonth]
+    assets: List[TimelineAsset]
+    nextOffset: int | None
+
+
+class ExportStatus(TypedDict):
+    """Represents the progress of an export of originals to ZIP archives on the server."""
+
+    name: str
+    state: str
+    archives: int
+    archivesDone: int
+    totalBytes: int
+    bytesWritten: int
+    files: List[str]
+    error: str | None
+
+
+class ListPage(TypedDict):
+    """Represents one page of a list resource, holding only the requested fields of each item."""
+
+    items: List[dict]
+    page: int
+    pageSize: int
+    total: int
+    nextPage: int | None
+
+
 class AppContext(TypedDict):
     """Application context holding shared resources."""
 
-    immich_client: ImmichAPI
+    immich_client: ImmichAPI | None
+    client_pool: ClientPool | None
+    rate_limiter: RateLimiter | None
+    asset_index: AssetIndex | None
+    duplicate_index: DuplicateIndex | None
+    library_stats: LibraryStats | None
+    thumbnail_cache: ThumbnailCache | None
+    exporter: ArchiveExporter | None
+
+
+class SharedContext:
+    """
+    Reference-counts the resources shared by every MCP session in the process, so that sessions
+    share one client, cache and in-flight request table. The resources and their background tasks
+    are created with the first session and closed with the last one.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], ImmichAPI] = lambda: ImmichAPI(
+            cache_path=os.environ.get("IMMICH_CACHE_PATH")
+        ),
+        caller_client_factory: Callable[[str], ImmichAPI] = lambda api_key: ImmichAPI(api_key=api_key),
+    ):
+        # Replaceable so that benchmarks can point the server at a simulated Immich. Only the
+        # default client persists its cache, as the file holds one API key's responses.
+        self.client_factory = client_factory
+        self.caller_client_factory = caller_client_factory
+        self.context: AppContext | None = None
+        self.sessions = 0
+        self._tasks: list[asyncio.Task] = []
+        self._tracing = False
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AppContext]:
+        if self.context is None:
+            self.context = self._open()
+        context = self.context
+        self.sessions += 1
+        try:
+            yield context
+        finally:
+            self.sessions -= 1
+            if self.sessions == 0 and self.context is context:
+                self.context = None
+                await self._close(context)
+
+    def _open(self) -> AppContext:
+        self._tracing = TRACER.configure_from_env()
+        immich_client = None
+        client_pool = None
+        if caller_api_keys_enabled():
+            client_pool = ClientPool(
+                self.caller_client_factory,
+                max_clients=int(os.environ.get("IMMICH_CLIENT_POOL_SIZE", 32)),
+                idle_timeout=float(os.environ.get("IMMICH_CLIENT_IDLE_TIMEOUT", 300)),
+            )
+            self._tasks.append(asyncio.create_task(client_pool.run_reaper(client_pool.idle_timeout / 2)))
+        # With per-caller keys the server's own key is optional; without it every caller must send one.
+        if client_pool is None or os.environ.get("IMMICH_API_KEY"):
+            immich_client = self.client_factory()
+            print("ImmichAPI client created")
+        warm_interval = float(os.environ.get("IMMICH_CACHE_WARM_INTERVAL", 15))
+        if immich_client is not None and warm_interval > 0:
+            self._tasks.append(asyncio.create_task(immich_client.run_cache_warmer(warm_interval)))
+        if immich_client is not None and events_enabled():
+            self._tasks.append(asyncio.create_task(immich_client.run_event_listener()))
+        asset_index = AssetIndex.from_env() if immich_client is not None else None
+        if asset_index is not None:
+            interval = float(os.environ.get("IMMICH_INDEX_SYNC_INTERVAL", 300))
+            self._tasks.append(asyncio.create_task(asset_index.run_sync_loop(immich_client, interval)))
+        duplicate_index = DuplicateIndex.from_env() if immich_client is not None else None
+        if duplicate_index is not None:
+            interval = float(os.environ.get("IMMICH_HASH_INDEX_INTERVAL", 3600))
+            self._tasks.append(asyncio.create_task(duplicate_index.run_update_loop(immich_client, interval)))
+        return AppContext(
+            immich_client=immich_client,
+            client_pool=client_pool,
+            rate_limiter=RateLimiter.from_env(),
+            asset_index=asset_index,
+            duplicate_index=duplicate_index,
+            library_stats=(
+                LibraryStats(max_age=float(os.environ.get("IMMICH_STATS_MAX_AGE", 60)))
+                if immich_client is not None
+                else None
+            ),
+            thumbnail_cache=ThumbnailCache.from_env(),
+            exporter=ArchiveExporter.from_env() if immich_client is not None else None,
+        )
+
+    async def _close(self, context: AppContext) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if context["asset_index"] is not None:
+            context["asset_index"].close()
+        if context["duplicate_index"] is not None:
+            context["duplicate_index"].close()
+        if context["library_stats"] is not None:
+            context["library_stats"].close()
+        if context["exporter"] is not None:
+            context["exporter"].close()
+        if context["client_pool"] is not None:
+            await context["client_pool"].close()
+        if context["immich_client"] is not None:
+            await context["immich_client"].close()
+        if self._tracing:
+            # Exports the spans still waiting, which may block on the collector.
+            await asyncio.to_thread(TRACER.shutdown)
+
+
+shared_context = SharedContext()
 
 
 @asynccontextmanager
 async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
     """Manage the application's lifespan, creating and cleaning up resources."""
     print("Initializing app lifespan")
-    async with ImmichAPI() as immich_client:
-        print("ImmichAPI client created")
-        yield AppContext(immich_client=immich_client)
+    async with shared_context.acquire() as context:
+        yield context
     print("App lifespan finished")
 
 
-mcp = FastMCP(name="ImmichMCP", lifespan=app_lifespan)
+def worker_count() -> int:
+    """Returns the number of server worker processes configured by IMMICH_MCP_WORKERS."""
+    return max(1, int(os.environ.get("IMMICH_MCP_WORKERS", 1)))
+
+
+def stateless_http_enabled() -> bool:
+    """
+    Returns whether MCP requests are served without server-side sessions.
+    Streamable HTTP sessions live in the memory of the worker that created them, so stateless
+    mode is the default when more than one worker process is configured.
+    """
+    value = os.environ.get("IMMICH_MCP_STATELESS_HTTP")
+    if value is None:
+        return worker_count() > 1
+    return value.lower() in ("1", "true", "yes")
+
+
+def caller_api_keys_enabled() -> bool:
+    """Returns whether callers may send their own Immich API key, as set by IMMICH_MCP_CALLER_API_KEYS."""
+    return os.environ.get("IMMICH_MCP_CALLER_API_KEYS", "false").lower() in ("1", "true", "yes")
+
+
+def archive_downloads_enabled() -> bool:
+    """
+    Returns whether callers may stream archives of originals from /download/archive with their
+    own API key, as set by IMMICH_MCP_ARCHIVE_DOWNLOADS.
+    """
+    return os.environ.get("IMMICH_MCP_ARCHIVE_DOWNLOADS", "false").lower() in ("1", "true", "yes")
+
+
+def events_enabled() -> bool:
+    """Returns whether cached assets follow Immich's realtime events, as set by IMMICH_EVENTS_ENABLED."""
+    return os.environ.get("IMMICH_EVENTS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def request_timeout(headers) -> float | None:
+    """
+    Returns the time budget of an MCP request: IMMICH_MCP_REQUEST_TIMEOUT, or less if the client
+    asked for less in the REQUEST_TIMEOUT_HEADER. None means no deadline.
+    """
+    timeout = float(os.environ.get("IMMICH_MCP_REQUEST_TIMEOUT", 30)) or None
+    requested = headers.get(REQUEST_TIMEOUT_HEADER) if headers else None
+    if requested:
+        try:
+            requested = max(0.0, float(requested))
+        except ValueError:
+            return timeout
+        timeout = requested if timeout is None else min(timeout, requested)
+    return timeout
+
+
+def with_deadline(fn: Callable) -> Callable:
+    """
+    Decorates an async MCP handler to run within the request's deadline, which also caps the
+    timeouts of its Immich requests, and to be cancelled if its HTTP client disconnects.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        request = mcp.get_context().request_context.request
+        timeout = request_timeout(getattr(request, "headers", None))
+        finished = asyncio.Event()
+        disconnected = asyncio.Event()
+        watcher = None
+        try:
+            async with asyncio.timeout(timeout) as scope:
+                if isinstance(request, Request):
+                    watcher = asyncio.create_task(
+                        _cancel_on_disconnect(request, scope, finished, disconnected)
+                    )
+                try:
+                    with deadline(timeout):
+                        return await fn(*args, **kwargs)
+                finally:
+                    finished.set()
+                    if watcher is not None:
+                        watcher.cancel()
+        except TimeoutError as exc:
+            if disconnected.is_set():
+                raise ValueError("Request cancelled because the client disconnected") from exc
+            raise ValueError(f"Request timed out after {timeout:g} seconds") from exc
+
+    return wrapper
+
+
+async def _cancel_on_disconnect(
+    request: Request, scope: asyncio.Timeout, finished: asyncio.Event, disconnected: asyncio.Event
+) -> None:
+    # Starlette's disconnect check can swallow this task's cancellation, so it also stops by
+    # itself once the handler has finished.
+    while not finished.is_set():
+        if await request.is_disconnected():
+            if not finished.is_set():
+                disconnected.set()
+                scope.reschedule(asyncio.get_running_loop().time())
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+def with_trace(kind: str, name: str, fn: Callable) -> Callable:
+    """
+    Decorates an async MCP handler to run in a server span, continuing the trace in the request's
+    `traceparent` header if there is one.
+    """
+    method = "tools/call" if kind == "tool" else "resources/read"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not TRACER.enabled:
+            return await fn(*args, **kwargs)
+        headers = getattr(mcp.get_context().request_context.request, "headers", None)
+        parent = SpanContext.from_traceparent(headers.get(TRACEPARENT_HEADER)) if headers else None
+        attributes = {"mcp.method.name": method, "mcp.handler.name": name}
+        with TRACER.start_as_current_span(f"{method} {name}", SpanKind.SERVER, attributes, parent):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def with_rate_limit(fn: Callable) -> Callable:
+    """Decorates an async MCP handler to wait for its client's turn when rate limiting is enabled."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        ctx = mcp.get_context()
+        rate_limiter = ctx.request_context.lifespan_context.get("rate_limiter")
+        if rate_limiter is not None:
+            await rate_limiter.acquire(_client_id(ctx))
+        return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def with_upstream_errors(fn: Callable) -> Callable:
+    """
+    Decorates an async MCP handler to report Immich being unavailable, after any retries, as an
+    error that tells the client to try again later, rather than as a failure of the request itself.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as exc:
+            cause = exc if isinstance(exc, httpx.HTTPError) else exc.__cause__
+            if not is_transient(cause):
+                raise
+            if isinstance(cause, CircuitOpenError):
+                reason = "the circuit breaker is open"
+            elif isinstance(cause, httpx.HTTPStatusError):
+                reason = f"Immich returned HTTP {cause.response.status_code}"
+            else:
+                reason = f"Immich could not be reached: {type(cause).__name__}"
+            raise ValueError(f"Immich is temporarily unavailable ({reason}); try again later") from cause
+
+    return wrapper
+
+
+def _client_id(ctx) -> str:
+    """Identifies the client of a request for per-client rate limits."""
+    request = ctx.request_context.request
+    headers = getattr(request, "headers", None)
+    if headers:
+        if headers.get("mcp-session-id"):
+            return f"session:{headers['mcp-session-id']}"
+        # Stateless requests have no session, so fall back to the caller's key or address.
+        if headers.get(CALLER_API_KEY_HEADER):
+            return f"key:{hashlib.sha256(headers[CALLER_API_KEY_HEADER].encode()).hexdigest()[:16]}"
+    client = getattr(request, "client", None)
+    if client is not None:
+        return f"address:{client.host}"
+    return f"connection:{id(ctx.request_context.session)}"
+
+
+def with_caller_client(fn: Callable) -> Callable:
+    """
+    Decorates an async MCP handler to run with the pooled client for the API key in the
+    request's CALLER_API_KEY_HEADER, when per-caller keys are enabled and one was sent.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        ctx = mcp.get_context()
+        client_pool = ctx.request_context.lifespan_context.get("client_pool")
+        headers = getattr(ctx.request_context.request, "headers", None)
+        api_key = headers.get(CALLER_API_KEY_HEADER) if client_pool is not None and headers else None
+        if not api_key:
+            return await fn(*args, **kwargs)
+        scope = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        async with client_pool.lease(api_key) as immich_client:
+            token = _caller.set((scope, immich_client))
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _caller.reset(token)
+
+    return wrapper
+
+
+class InstrumentedFastMCP(FastMCP):
+    """
+    A FastMCP server that records call counts, errors, latency and a trace span for every resource
+    and tool, and runs each of them within the request's deadline and rate limits, with the
+    caller's own Immich client when they sent an API key.
+    """
+
+    def tool(self, name: str | None = None, **kwargs):
+        register = super().tool(name, **kwargs)
+
+        def decorator(fn):
+            register(_wrap_handler("tool", name or fn.__name__, fn))
+            return fn
+
+        return decorator
+
+    def resource(self, uri: str, **kwargs):
+        register = super().resource(uri, **kwargs)
+
+        def decorator(fn):
+            register(_wrap_handler("resource", uri, fn))
+            return fn
+
+        return decorator
+
+
+def _wrap_handler(kind: str, name: str, fn: Callable) -> Callable:
+    return with_trace(
+        kind,
+        name,
+        instrument(kind, name)(with_deadline(with_rate_limit(with_upstream_errors(with_caller_client(fn))))),
+    )
+
+
+def _collect_client_metrics() -> None:
+    """Updates the connection pool, cache and circuit breaker gauges from the shared client."""
+    limit = upstream_limit()
+    if limit is not None:
+        UPSTREAM_IN_FLIGHT.set(limit.active)
+        UPSTREAM_QUEUED.set(limit.queued)
+    context = shared_context.context
+    if context is None:
+        return
+    if context["client_pool"] is not None:
+        CLIENT_POOL_SIZE.set(len(context["client_pool"]))
+    immich_client = context["immich_client"]
+    if immich_client is None:
+        return
+    pool = immich_client.pool_stats()
+    POOL_CONNECTIONS.set(pool["active"], state="active")
+    POOL_CONNECTIONS.set(pool["idle"], state="idle")
+    POOL_QUEUED.set(pool["queued"])
+    POOL_IN_FLIGHT.set(pool["inFlight"])
+    POOL_SATURATION.set(pool["saturation"])
+    cache = immich_client.cache.stats()
+    for event, stat in (
+        ("hits", "hits"),
+        ("stale_hits", "staleHits"),
+        ("misses", "misses"),
+        ("evictions", "evictions"),
+    ):
+        CACHE_EVENTS.set(cache[stat], event=event)
+    CACHE_SIZE.set(cache["size"])
+    CIRCUIT_OPEN.set(0 if immich_client.breaker.state == "closed" else 1)
+
+
+REGISTRY.add_collector(_collect_client_metrics)
+
+mcp = InstrumentedFastMCP(name="ImmichMCP", lifespan=app_lifespan, stateless_http=stateless_http_enabled())
+
+THUMBNAIL_CHUNK_SIZE = 64 * 1024
+# The most assets `get_assets` fetches in one call; each is a request to Immich unless cached.
+MAX_BULK_ASSETS = 500
 
 
 @mcp.tool()
@@ -77,8 +587,7 @@ async def ping() -> str:
     Pings the real Immich server to check for a valid connection.
     Returns 'pong' if successful, otherwise returns an error message.
     """
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
+    immich_client = _immich_client()
     if await immich_client.ping_server():
         return "pong"
     return "error: could not connect to Immich server"
@@ -87,48 +596,349 @@ async def ping() -> str:
 @mcp.resource("user://me")
 async def get_user() -> User | None:
     """Returns the current user's details."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
+    immich_client = _immich_client()
     user_data = await immich_client.get_my_user()
     if not user_data:
         raise ValueError("Failed to fetch user from Immich API")
-    return User(id=user_data["id"], email=user_data["email"], name=user_data["name"])
+    return user_data
 
 
 @mcp.resource("users://list")
 async def get_users_list() -> UsersList:
     """Returns a list of all users."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    users_data = await immich_client.get_users_list()
-    return [User(id=user["id"], email=user["email"], name=user["name"]) for user in users_data]
+    immich_client = _immich_client()
+    return await immich_client.get_users_list()
+
+
+@mcp.resource("users://list/{page}")
+async def get_users_page(page: int) -> ListPage:
+    """Returns one page of users, numbered from 1."""
+    return _list_page(await _immich_client().get_users_list(), page, None, User)
+
+
+@mcp.resource("users://list/{page}/{fields}")
+async def get_users_page_fields(page: int, fields: str) -> ListPage:
+    """Returns one page of users with only the given comma-separated fields, e.g. `id,name`."""
+    return _list_page(await _immich_client().get_users_list(), page, fields, User)
 
 
 @mcp.resource("partners://list")
 async def get_partners() -> PartnersList:
     """Returns a list of all partners."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    partners_data = await immich_client.get_partners()
-    return [
-        Partner(
-            id=partner["id"],
-            email=partner["email"],
-            name=partner["name"],
-            inTimeline=partner["inTimeline"],
-        )
-        for partner in partners_data
-    ]
+    immich_client = _immich_client()
+    return await immich_client.get_partners()
+
+
+@mcp.resource("partners://list/{page}")
+async def get_partners_page(page: int) -> ListPage:
+    """Returns one page of partners, numbered from 1."""
+    return _list_page(await _immich_client().get_partners(), page, None, Partner)
+
+
+@mcp.resource("partners://list/{page}/{fields}")
+async def get_partners_page_fields(page: int, fields: str) -> ListPage:
+    """Returns one page of partners with only the given comma-separated fields, e.g. `id,name`."""
+    return _list_page(await _immich_client().get_partners(), page, fields, Partner)
 
 
 @mcp.resource("asset://{asset_id}")
 async def get_asset(asset_id: str) -> Asset | None:
     """Returns an asset by its ID."""
+    immich_client = _immich_client()
+    return await immich_client.get_asset(asset_id) or None
+
+
+@mcp.tool()
+async def get_assets(ids: list[str]) -> list[Asset | AssetError]:
+    """
+    Returns the details of many assets in a single call, in the same order as `ids`.
+    Assets that could not be fetched are returned with an error message instead.
+    At most 500 assets can be fetched at once.
+    """
+    if len(ids) > MAX_BULK_ASSETS:
+        raise ValueError(f"At most {MAX_BULK_ASSETS} assets can be fetched at once; got {len(ids)}")
+    immich_client = _immich_client()
+    results = await immich_client.get_assets_bulk(ids)
+    return [
+        _asset_error(asset_id, result) if isinstance(result, BaseException) else result
+        for asset_id, result in zip(ids, results)
+    ]
+
+
+@mcp.tool()
+async def search_assets(
+    original_file_name: str | None = None,
+    type: str | None = None,
+    taken_after: str | None = None,
+    taken_before: str | None = None,
+    is_favorite: bool | None = None,
+    city: str | None = None,
+    country: str | None = None,
+    make: str | None = None,
+    model: str | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+) -> AssetPage:
+    """
+    Searches the library by asset metadata and returns one page of matching assets.
+    Dates are ISO 8601 strings and `type` is one of IMAGE, VIDEO, AUDIO or OTHER.
+    Pass the returned `nextCursor` back as `cursor` to fetch the next page; the other
+    arguments are then taken from the cursor and ignored.
+    """
+    if cursor:
+        state = _decode_cursor(cursor)
+    else:
+        filters = {
+            "originalFileName": original_file_name,
+            "type": type,
+            "takenAfter": taken_after,
+            "takenBefore": taken_before,
+            "isFavorite": is_favorite,
+            "city": city,
+            "country": country,
+            "make": make,
+            "model": model,
+        }
+        state = {
+            "filters": {key: value for key, value in filters.items() if value is not None},
+            "page": 1,
+            "size": min(max(limit, 1), 1000),
+        }
+
+    immich_client = _immich_client()
+    pages = immich_client.iter_search_metadata(state["filters"], page_size=state["size"], page=state["page"])
+    try:
+        async with aclosing(pages):
+            page = await anext(pages)
+    except (httpx.RequestError, httpx.HTTPStatusError, StopAsyncIteration) as exc:
+        raise ValueError("Failed to search assets in Immich API") from exc
+
+    next_cursor = None
+    if page.get("nextPage"):
+        next_cursor = _encode_cursor({**state, "page": int(page["nextPage"])})
+    return AssetPage(items=[_to_asset(item) for item in page["items"]], nextCursor=next_cursor)
+
+
+@mcp.tool(structured_output=False)
+async def get_thumbnail(asset_id: str, size: str = "thumbnail") -> ImageContent:
+    """
+    Returns an asset's thumbnail image.
+    `size` is "thumbnail" for a small WebP image or "preview" for a larger JPEG.
+    """
+    if size not in ("thumbnail", "preview"):
+        raise ValueError("size must be 'thumbnail' or 'preview'")
+    immich_client = _immich_client()
+    thumbnail_cache = mcp.get_context().request_context.lifespan_context.get("thumbnail_cache")
+    thumbhash = None
+    if thumbnail_cache is not None:
+        # The thumbhash changes with the thumbnail, so an edited asset is cached afresh rather than
+        # served from the stale entry. Without one Immich has no thumbnail yet, so none is cached.
+        thumbhash = (await immich_client.get_asset(asset_id)).get("thumbhash")
+    try:
+        if thumbhash is None:
+            async with immich_client.stream_thumbnail(asset_id, size) as response:
+                data = bytearray()
+                async for chunk in response.aiter_bytes(THUMBNAIL_CHUNK_SIZE):
+                    data += chunk
+                return _image_content(data, _mime_type(response))
+
+        # Scoped to the caller, so that one user's cached thumbnails are never served to another.
+        key = f"{_caller_scope()}{asset_id}/{size}/{thumbhash}"
+        cached = thumbnail_cache.open(key)
+        if cached is None:
+
+            async def download():
+                async with immich_client.stream_thumbnail(asset_id, size) as response:
+                    await thumbnail_cache.store(
+                        key, response.aiter_bytes(THUMBNAIL_CHUNK_SIZE), _mime_type(response)
+                    )
+
+            await thumbnail_cache.inflight.do(key, download)
+            cached = thumbnail_cache.open(key)
+            if cached is None:
+                raise ValueError(f"Thumbnail for asset {asset_id} could not be cached")
+    except (httpx.RequestError, httpx.HTTPStatusError) as exc:
+        raise ValueError(f"Failed to fetch thumbnail for asset {asset_id} from Immich API") from exc
+
+    mapped, mime_type = cached
+    with mapped:
+        return _image_content(mapped, mime_type)
+
+
+def _image_content(data, mime_type: str) -> ImageContent:
+    # Encoding straight from the buffer (or memory map) avoids copying the image into bytes first.
+    return ImageContent(type="image", data=base64.b64encode(data).decode(), mimeType=mime_type)
+
+
+def _mime_type(response: httpx.Response) -> str:
+    return response.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+
+
+@mcp.tool()
+async def find_assets_by_filename(prefix: str, limit: int = 100) -> list[IndexedAsset]:
+    """
+    Returns assets whose original file name starts with `prefix`, ignoring case.
+    Answered from the local asset index.
+    """
+    return await _asset_index().find_by_filename_prefix(prefix, limit)
+
+
+@mcp.tool()
+async def find_assets_by_date(start: str, end: str, limit: int = 100) -> list[IndexedAsset]:
+    """
+    Returns assets taken at or after `start` and before `end`, given as ISO 8601 dates or times.
+    Answered from the local asset index.
+    """
+    return await _asset_index().find_by_date_range(start, end, limit)
+
+
+@mcp.tool()
+async def find_assets_by_camera(model: str, make: str | None = None, limit: int = 100) -> list[IndexedAsset]:
+    """
+    Returns assets taken with the given camera model, and make if given, ignoring case.
+    Answered from the local asset index.
+    """
+    return await _asset_index().find_by_camera(model, make, limit)
+
+
+@mcp.tool()
+async def find_near_duplicates(
+    max_distance: int = 4, algorithm: str = "phash", limit: int = 100
+) -> list[DuplicatePair]:
+    """
+    Returns pairs of images that look alike, closest first, from the local duplicate index.
+    `max_distance` is how many of the 64 hash bits may differ, from 0 for visually identical
+    images up to 8, and `algorithm` is "phash" (robust to edits and re-encoding) or "dhash"
+    (stricter). At most `limit` pairs, up to 1000, are returned.
+    """
+    if not 0 <= max_distance <= MAX_DISTANCE:
+        raise ValueError(f"max_distance must be between 0 and {MAX_DISTANCE}")
     ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    asset_data = await immich_client.get_asset(asset_id)
-    if not asset_data:
-        return None
+    duplicate_index = ctx.request_context.lifespan_context.get("duplicate_index")
+    if duplicate_index is None:
+        raise ValueError("The duplicate index is not enabled. Set IMMICH_HASH_INDEX_PATH to enable it.")
+    if _caller.get() is not None:
+        raise ValueError("The duplicate index only covers the server's own Immich account.")
+    return await duplicate_index.find_pairs(max_distance, algorithm, min(max(limit, 1), 1000))
+
+
+@mcp.tool()
+async def library_stats(
+    group_by: list[str],
+    type: str | None = None,
+    taken_after: str | None = None,
+    taken_before: str | None = None,
+    limit: int = 1000,
+) -> LibraryStatsReport:
+    """
+    Counts the assets in the whole library, and adds up their size in bytes, grouped by any of
+    year, month, type, make, model, country and city, e.g. ["year", "model"] for photos per year
+    per camera. `type` is one of IMAGE, VIDEO, AUDIO or OTHER, and dates are ISO 8601 strings.
+    At most `limit` groups are returned. Answered from columns of asset metadata kept in memory,
+    so the first call may take a while on a large library.
+    """
+    ctx = mcp.get_context()
+    stats = ctx.request_context.lifespan_context.get("library_stats")
+    if stats is None or _caller.get() is not None:
+        raise ValueError("Library statistics only cover the server's own Immich account.")
+    try:
+        await stats.refresh(_immich_client())
+    except (httpx.RequestError, httpx.HTTPStatusError) as exc:
+        raise ValueError("Failed to load asset metadata from Immich API") from exc
+    groups = stats.aggregate(group_by, type, taken_after, taken_before)
+    return LibraryStatsReport(
+        groups=[
+            StatsGroup(key=dict(zip(group_by, key)), count=count, bytes=size)
+            for key, count, size in groups[: max(limit, 0)]
+        ],
+        totalCount=sum(count for _, count, _ in groups),
+        totalBytes=sum(size for _, _, size in groups),
+        truncated=len(groups) > limit,
+    )
+
+
+@mcp.tool()
+async def timeline(
+    month: str | None = None,
+    person_id: str | None = None,
+    album_id: str | None = None,
+    is_favorite: bool | None = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> Timeline:
+    """
+    Without `month`, returns every month of the timeline, newest first, with how many assets
+    were taken in it. With `month` (YYYY-MM), returns that month's count and up to `limit` of
+    its assets from `offset` on; pass `nextOffset` back as `offset` for the next page. Either
+    way only the assets of the given person or album, or only favorites, can be counted.
+    """
+    if month is not None and not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", month):
+        raise ValueError("month must be given as YYYY-MM")
+    filters = {"personId": person_id, "albumId": album_id, "isFavorite": is_favorite}
+    filters = {key: value for key, value in filters.items() if value is not None}
+    immich_client = _immich_client()
+    try:
+        buckets = await immich_client.get_timeline_buckets(filters)
+        months = [TimelineMonth(month=bucket["timeBucket"][:7], count=bucket["count"]) for bucket in buckets]
+        if month is None:
+            return Timeline(months=months, assets=[], nextOffset=None)
+        # Only a month that has assets is fetched, under the key Immich gave it.
+        bucket = next((bucket for bucket in buckets if bucket["timeBucket"][:7] == month), None)
+        if bucket is None:
+            return Timeline(months=[TimelineMonth(month=month, count=0)], assets=[], nextOffset=None)
+        assets = await immich_client.get_timeline_bucket(bucket["timeBucket"], filters)
+    except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+        raise ValueError("Failed to fetch the timeline from Immich API") from exc
+    offset = max(offset, 0)
+    end = offset + min(max(limit, 1), 1000)
+    return Timeline(
+        months=[TimelineMonth(month=month, count=bucket["count"])],
+        assets=assets[offset:end],
+        nextOffset=end if end < len(assets) else None,
+    )
+
+
+def _asset_index() -> AssetIndex:
+    ctx = mcp.get_context()
+    asset_index = ctx.request_context.lifespan_context.get("asset_index")
+    if asset_index is None:
+        raise ValueError("The local asset index is not enabled. Set IMMICH_INDEX_PATH to enable it.")
+    if _caller.get() is not None:
+        raise ValueError("The local asset index only covers the server's own Immich account.")
+    return asset_index
+
+
+def _immich_client() -> ImmichAPI:
+    """Returns the client for the caller's own API key if they sent one, otherwise the shared client."""
+    caller = _caller.get()
+    if caller is not None:
+        return caller[1]
+    immich_client = mcp.get_context().request_context.lifespan_context["immich_client"]
+    if immich_client is None:
+        raise ValueError(f"An Immich API key is required. Send it in the {CALLER_API_KEY_HEADER} header.")
+    return immich_client
+
+
+def _caller_scope() -> str:
+    caller = _caller.get()
+    return f"{caller[0]}/" if caller is not None else ""
+
+
+def _encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(state, dict) or not {"filters", "page", "size"} <= state.keys():
+            raise ValueError
+        return state
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _to_asset(asset_data: dict) -> Asset:
     return Asset(
         id=asset_data["id"],
         originalFileName=asset_data["originalFileName"],
@@ -136,56 +946,194 @@ async def get_asset(asset_id: str) -> Asset | None:
     )
 
 
+def _asset_error(asset_id: str, exc: BaseException) -> AssetError:
+    if isinstance(exc, httpx.HTTPStatusError):
+        if exc.response.status_code in (400, 404):
+            return AssetError(id=asset_id, error="Asset not found")
+        return AssetError(id=asset_id, error=f"Immich returned HTTP {exc.response.status_code}")
+    return AssetError(id=asset_id, error=f"Failed to fetch asset: {type(exc).__name__}")
+
+
+# Messages for the errors Immich reports for single assets of a bulk album update.
+ALBUM_ERRORS = {
+    "duplicate": "Asset is already in the album",
+    "not_found": "Asset not found",
+    "no_permission": "No permission to change this asset's albums",
+}
+
+
+@mcp.resource("albums://list")
+async def get_albums() -> AlbumList:
+    """Returns the albums the user owns or that are shared with them."""
+    return await _immich_client().get_albums()
+
+
+@mcp.resource("albums://list/{page}")
+async def get_albums_page(page: int) -> ListPage:
+    """Returns one page of albums, numbered from 1."""
+    return _list_page(await _immich_client().get_albums(), page, None, Album)
+
+
+@mcp.resource("albums://list/{page}/{fields}")
+async def get_albums_page_fields(page: int, fields: str) -> ListPage:
+    """Returns one page of albums with only the given comma-separated fields, e.g. `id,albumName`."""
+    return _list_page(await _immich_client().get_albums(), page, fields, Album)
+
+
+@mcp.resource("album://{album_id}")
+async def get_album(album_id: str) -> Album | None:
+    """Returns an album's details by its ID, without its assets."""
+    return await _immich_client().get_album(album_id) or None
+
+
+@mcp.tool()
+async def album_assets(album_id: str, limit: int = 100, offset: int = 0) -> AlbumAssetPage:
+    """
+    Returns the IDs of up to `limit` of an album's assets from `offset` on; pass `nextOffset`
+    back as `offset` for the next page. Use `get_assets` for their details.
+    """
+    try:
+        asset_ids = await _immich_client().get_album_asset_ids(album_id)
+    except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+        raise ValueError(f"Failed to fetch album {album_id} from Immich API") from exc
+    offset = max(offset, 0)
+    end = offset + min(max(limit, 1), 1000)
+    return AlbumAssetPage(
+        albumId=album_id,
+        assetIds=asset_ids[offset:end],
+        total=len(asset_ids),
+        nextOffset=end if end < len(asset_ids) else None,
+    )
+
+
+@mcp.tool()
+async def add_assets_to_album(album_id: str, asset_ids: list[str]) -> AlbumUpdate:
+    """
+    Adds assets to an album. Assets already in it are counted as unchanged; the others that
+    could not be added are returned with an error message.
+    """
+    immich_client = _immich_client()
+    return await _update_album(album_id, asset_ids, immich_client.add_assets_to_album, "duplicate")
+
+
+@mcp.tool()
+async def remove_assets_from_album(album_id: str, asset_ids: list[str]) -> AlbumUpdate:
+    """
+    Removes assets from an album. Assets not in it are counted as unchanged; the others that
+    could not be removed are returned with an error message.
+    """
+    immich_client = _immich_client()
+    return await _update_album(album_id, asset_ids, immich_client.remove_assets_from_album, "not_found")
+
+
+async def _update_album(album_id: str, asset_ids: list[str], update: Callable, unchanged: str) -> AlbumUpdate:
+    try:
+        results = await update(album_id, asset_ids)
+    except (httpx.RequestError, httpx.HTTPStatusError, json.JSONDecodeError) as exc:
+        raise ValueError(f"Failed to update album {album_id} in Immich API") from exc
+    return AlbumUpdate(
+        albumId=album_id,
+        updated=sum(1 for result in results if result["success"]),
+        unchanged=sum(1 for result in results if result.get("error") == unchanged),
+        errors=[
+            AssetError(id=result["id"], error=ALBUM_ERRORS.get(result.get("error"), "Unknown error"))
+            for result in results
+            if not result["success"] and result.get("error") != unchanged
+        ],
+    )
+
+
+@mcp.tool()
+async def export_assets(asset_ids: list[str], name: str) -> ExportStatus:
+    """
+    Starts downloading the originals of assets as ZIP archives into a directory called `name`
+    on the server, and returns its progress. The export runs in the background; follow it with
+    `export_status`. Calling this again with the same name and assets resumes an export that
+    stopped or failed, from its first incomplete archive.
+    """
+    return ExportStatus(**_exporter().start(_immich_client(), name, asset_ids))
+
+
+@mcp.tool()
+async def export_status(name: str) -> ExportStatus:
+    """Returns the progress of the export called `name`, and the archives it has written so far."""
+    return ExportStatus(**_exporter().status(name))
+
+
+def _exporter() -> ArchiveExporter:
+    exporter = mcp.get_context().request_context.lifespan_context.get("exporter")
+    if exporter is None:
+        raise ValueError("Exports are not enabled. Set IMMICH_EXPORT_DIR to enable them.")
+    if _caller.get() is not None:
+        raise ValueError("Exports only cover the server's own Immich account.")
+    return exporter
+
+
 @mcp.resource("apikey://me")
 async def get_my_api_key() -> ApiKey | None:
     """Returns the current API key's details."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    api_key_data = await immich_client.get_my_api_key()
-    if not api_key_data:
-        return None
-    return ApiKey(
-        id=api_key_data["id"],
-        name=api_key_data["name"],
-        createdAt=api_key_data["createdAt"],
-        updatedAt=api_key_data["updatedAt"],
-        permissions=api_key_data["permissions"],
-    )
+    immich_client = _immich_client()
+    return await immich_client.get_my_api_key() or None
 
 
 @mcp.resource("apikeys://list")
 async def get_api_key_list() -> ApiKeyList:
     """Returns a list of all API keys."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    api_keys_data = await immich_client.get_api_key_list()
-    return [
-        ApiKey(
-            id=key["id"],
-            name=key["name"],
-            createdAt=key["createdAt"],
-            updatedAt=key["updatedAt"],
-            permissions=key["permissions"],
-        )
-        for key in api_keys_data
-    ]
+    immich_client = _immich_client()
+    return await immich_client.get_api_key_list()
+
+
+@mcp.resource("apikeys://list/{page}")
+async def get_api_keys_page(page: int) -> ListPage:
+    """Returns one page of API keys, numbered from 1."""
+    return _list_page(await _immich_client().get_api_key_list(), page, None, ApiKey)
+
+
+@mcp.resource("apikeys://list/{page}/{fields}")
+async def get_api_keys_page_fields(page: int, fields: str) -> ListPage:
+    """Returns one page of API keys with only the given comma-separated fields, e.g. `id,name`."""
+    return _list_page(await _immich_client().get_api_key_list(), page, fields, ApiKey)
+
+
+def list_page_size() -> int:
+    """Returns the number of items per page of the paged list resources, set by IMMICH_MCP_PAGE_SIZE."""
+    return max(1, int(os.environ.get("IMMICH_MCP_PAGE_SIZE", 100)))
+
+
+def _list_page(items: list[dict], page: int, fields: str | None, item_type: type) -> ListPage:
+    """
+    Slices one page out of an upstream list. The list is the client's cached copy, so the pages
+    read while it is cached all come from the same snapshot.
+    """
+    if page < 1:
+        raise ValueError("page must be 1 or greater")
+    allowed = list(item_type.__annotations__)
+    selected = allowed
+    if fields is not None:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in allowed]
+        if unknown or not selected:
+            raise ValueError(f"Unknown fields {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    size = list_page_size()
+    start = (page - 1) * size
+    # The client's items hold exactly the model's fields, so they are only copied when projected.
+    page_items = items[start : start + size]
+    if selected != allowed:
+        page_items = [{field: item[field] for field in selected} for item in page_items]
+    return ListPage(
+        items=page_items,
+        page=page,
+        pageSize=size,
+        total=len(items),
+        nextPage=page + 1 if start + size < len(items) else None,
+    )
 
 
 @mcp.resource("apikey://{api_key_id}")
 async def get_api_key(api_key_id: str) -> ApiKey | None:
     """Returns an API key by its ID."""
-    ctx = mcp.get_context()
-    immich_client = ctx.request_context.lifespan_context["immich_client"]
-    api_key_data = await immich_client.get_api_key(api_key_id)
-    if not api_key_data:
-        return None
-    return ApiKey(
-        id=api_key_data["id"],
-        name=api_key_data["name"],
-        createdAt=api_key_data["createdAt"],
-        updatedAt=api_key_data["updatedAt"],
-        permissions=api_key_data["permissions"],
-    )
+    immich_client = _immich_client()
+    return await immich_client.get_api_key(api_key_id) or None
 
 
 def run():
@@ -0,0 +1,313 @@
+import asyncio
+import time
+from array import array
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime, timezone
+from itertools import compress, repeat
+
+from immich_mcp.deadlines import remaining
+from immich_mcp.immich_api import ImmichAPI
+
+try:
+    import numpy
+except ImportError:  # Optional; aggregations fall back to plain Python.
+    numpy = None
+
+# Fields assets can be grouped by. Years and months come from the local date the asset was taken.
+DIMENSIONS = ("year", "month", "type", "make", "model", "country", "city")
+_CATEGORIES = ("type", "make", "model", "country", "city")
+# Stored in the month column of assets without a date.
+_NO_MONTH = -1
+# How long before its deadline a caller stops waiting for the first load, to answer in time.
+_LOAD_MARGIN = 0.5
+
+
+class _Dictionary:
+    """Encodes the values of a categorical column as small integers; 0 stands for None."""
+
+    def __init__(self):
+        self.values: list[str | None] = [None]
+        self._codes: dict[str | None, int] = {None: 0}
+
+    def code(self, value: str | None) -> int | None:
+        """Returns the code of `value`, or None if no row has had it."""
+        return self._codes.get(value)
+
+    def encode(self, value: str | None) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class LibraryStats:
+    """
+    Asset metadata held in compact columns for aggregate queries over the whole library.
+
+    Each asset is a row across typed arrays: the time it was taken as int64 seconds, its month,
+    its size and dictionary-encoded categories. Rows are kept up to date incrementally from the
+    assets updated since the previous sync; assets moved to the trash become tombstones that are
+    compacted away once they make up half of the rows. Aggregations run vectorized with NumPy
+    when it is installed, and in plain Python otherwise.
+    """
+
+    def __init__(
+        self, page_size: int = 1000, max_age: float = 60.0, clock: Callable[[], float] = time.monotonic
+    ):
+        self.page_size = page_size
+        self.max_age = max_age
+        self._clock = clock
+        self._rows: dict[str, int] = {}
+        self._ids: list[str | None] = []
+        self.taken_at = array("q")
+        self.month = array("i")
+        self.size = array("q")
+        self.live = array("b")
+        self.dictionaries = {name: _Dictionary() for name in _CATEGORIES}
+        self.codes = {name: array("I") for name in _CATEGORIES}
+        self._updated_after: str | None = None
+        self.synced_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def close(self) -> None:
+        """Cancels a sync that is under way."""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def sync(self, immich_client: ImmichAPI) -> int:
+        """Pulls assets changed since the last sync into the columns and returns how many changed."""
+        filters = {"withExif": True, "withDeleted": True}
+        if self._updated_after:
+            filters["updatedAfter"] = self._updated_after
+        changed = 0
+        high_water_mark = self._updated_after
+        async for page in immich_client.iter_search_metadata(filters, page_size=self.page_size):
+            self._apply(page["items"])
+            changed += len(page["items"])
+            for item in page["items"]:
+                updated_at = item.get("updatedAt")
+                if updated_at and (high_water_mark is None or updated_at > high_water_mark):
+                    high_water_mark = updated_at
+        # Only advanced once every page has been applied; reapplying a page is harmless.
+        self._updated_after = high_water_mark
+        self.synced_at = self._clock()
+        return changed
+
+    async def refresh(self, immich_client: ImmichAPI) -> None:
+        """
+        Makes sure the columns are loaded. Once they are, they are answered from straight away and
+        synced in the background when older than `max_age`. The first load is waited for until
+        shortly before the caller's deadline, then left running in the background.
+        """
+        if self.synced_at is not None:
+            if self._clock() - self.synced_at >= self.max_age and (self._task is None or self._task.done()):
+                self._start_sync(immich_client)
+            return
+        if self._task is None or self._task.done():
+            self._start_sync(immich_client)
+        left = remaining()
+        try:
+            async with asyncio.timeout(None if left is None else max(0.0, left - _LOAD_MARGIN)):
+                await asyncio.shield(self._task)
+        except TimeoutError as exc:
+            raise ValueError(
+                f"Library statistics are still loading ({len(self)} assets so far); try again shortly"
+            ) from exc
+
+    def aggregate(
+        self,
+        group_by: list[str],
+        type: str | None = None,
+        taken_after: str | None = None,
+        taken_before: str | None = None,
+    ) -> list[tuple[tuple, int, int]]:
+        """
+        Returns the values of the `group_by` fields of each group of assets, with their count and
+        total size in bytes, sorted by the values. Only assets of the given type, taken at or after
+        `taken_after` and before `taken_before` (ISO 8601 dates or times), are counted.
+        """
+        start = _timestamp(taken_after)
+        end = _timestamp(taken_before)
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown fields {', '.join(unknown)}; choose from {', '.join(DIMENSIONS)}")
+        type_code = None
+        if type is not None:
+            # A type that no asset has matches nothing, as no row has code -1.
+            type_code = self.dictionaries["type"].code(type)
+            type_code = -1 if type_code is None else type_code
+        columns = [self.month if name in ("year", "month") else self.codes[name] for name in group_by]
+        if not self._rows:
+            return []
+        if numpy is not None:
+            groups = self._aggregate_numpy(group_by, columns, type_code, start, end)
+        else:
+            groups = self._aggregate_python(group_by, columns, type_code, start, end)
+        decoded = [(self._decode(group_by, key), count, size) for key, count, size in groups]
+        return sorted(decoded, key=lambda group: [(value is None, value) for value in group[0]])
+
+    def _aggregate_python(self, group_by, columns, type_code, start, end) -> list[tuple[tuple, int, int]]:
+        # Whole-column passes with zip and compress, which keep the per-row work in C where possible.
+        mask = list(self.live)
+        if type_code is not None:
+            mask = [keep and code == type_code for keep, code in zip(mask, self.codes["type"])]
+        if start is not None or end is not None:
+            # Undated rows are left out by their month alone, so an open range reaches back before 1970.
+            low = -(2**63) if start is None else start
+            high = 2**63 if end is None else end
+            mask = [
+                keep and month != _NO_MONTH and low <= taken_at < high
+                for keep, month, taken_at in zip(mask, self.month, self.taken_at)
+            ]
+        keys = zip(
+            *(
+                [month // 12 for month in column] if name == "year" else column
+                for name, column in zip(group_by, columns)
+            )
+        )
+        if not group_by:
+            keys = repeat((), len(mask))
+        counts: Counter[tuple] = Counter()
+        sizes: Counter[tuple] = Counter()
+        for key, size in compress(zip(keys, self.size), mask):
+            counts[key] += 1
+            sizes[key] += size
+        return [(key, count, sizes[key]) for key, count in counts.items()]
+
+    def _aggregate_numpy(self, group_by, columns, type_code, start, end) -> list[tuple[tuple, int, int]]:
+        mask = numpy.frombuffer(self.live, dtype=numpy.int8).astype(bool)
+        if type_code is not None:
+            mask &= numpy.frombuffer(self.codes["type"], dtype=numpy.uint32) == type_code
+        if start is not None or end is not None:
+            taken_at = numpy.frombuffer(self.taken_at, dtype=numpy.int64)
+            mask &= numpy.frombuffer(self.month, dtype=numpy.int32) != _NO_MONTH
+            if start is not None:
+                mask &= taken_at >= start
+            if end is not None:
+                mask &= taken_at < end
+        sizes = numpy.frombuffer(self.size, dtype=numpy.int64)[mask]
+        if not group_by:
+            return [((), int(mask.sum()), int(sizes.sum()))] if mask.any() else []
+
+        # Folds the grouped columns into one int64 key per row, each column offset to start at 0.
+        keys = numpy.zeros(int(mask.sum()), dtype=numpy.int64)
+        offsets, radixes = [], []
+        keys_range = 1
+        for name, column in zip(group_by, columns):
+            values = numpy.frombuffer(
+                column, dtype=numpy.int32 if name in ("year", "month") else numpy.uint32
+            )
+            values = values[mask].astype(numpy.int64)
+            if name == "year":
+                # Floor division keeps _NO_MONTH as -1.
+                values //= 12
+            offset = int(values.min()) if len(values) else 0
+            radix = int(values.max()) - offset + 1 if len(values) else 1
+            if keys_range * radix > 2**62:
+                # Too many combinations to fold into one int64.
+                return self._aggregate_python(group_by, columns, type_code, start, end)
+            keys = keys * radix + (values - offset)
+            keys_range *= radix
+            offsets.append(offset)
+            radixes.append(radix)
+        unique, inverse = numpy.unique(keys, return_inverse=True)
+        counts = numpy.bincount(inverse)
+        totals = numpy.bincount(inverse, weights=sizes)
+
+        groups = []
+        for key, count, total in zip(unique.tolist(), counts.tolist(), totals.tolist()):
+            values = []
+            for offset, radix in zip(reversed(offsets), reversed(radixes)):
+                key, value = divmod(key, radix)
+                values.append(value + offset)
+            groups.append((tuple(reversed(values)), count, int(total)))
+        return groups
+
+    def _decode(self, group_by: list[str], key: tuple) -> tuple:
+        """Turns codes back into values: years, `YYYY-MM` months and category names."""
+        decoded = []
+        for name, value in zip(group_by, key):
+            if name == "year":
+                decoded.append(None if value == _NO_MONTH else value)
+            elif name == "month":
+                decoded.append(None if value == _NO_MONTH else f"{value // 12:04d}-{value % 12 + 1:02d}")
+            else:
+                decoded.append(self.dictionaries[name].values[value])
+        return tuple(decoded)
+
+    def _start_sync(self, immich_client: ImmichAPI) -> None:
+        self._task = asyncio.create_task(self.sync(immich_client))
+
+        def done(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Library statistics sync failed: {task.exception()!r}")
+
+        self._task.add_done_callback(done)
+
+    def _apply(self, items: list[dict]) -> None:
+        for item in items:
+            row = self._rows.get(item["id"])
+            if item.get("isTrashed"):
+                if row is not None:
+                    del self._rows[item["id"]]
+                    self._ids[row] = None
+                    self.live[row] = 0
+                continue
+            exif = item.get("exifInfo") or {}
+            taken = _parse_date(item.get("localDateTime") or item.get("fileCreatedAt"))
+            values = {
+                "type": item.get("type"),
+                "make": exif.get("make"),
+                "model": exif.get("model"),
+                "country": exif.get("country"),
+                "city": exif.get("city"),
+            }
+            if row is None:
+                self._rows[item["id"]] = len(self._ids)
+                self._ids.append(item["id"])
+                self.taken_at.append(int(taken.timestamp()) if taken else 0)
+                self.month.append(taken.year * 12 + taken.month - 1 if taken else _NO_MONTH)
+                self.size.append(exif.get("fileSizeInByte") or 0)
+                self.live.append(1)
+                for name, value in values.items():
+                    self.codes[name].append(self.dictionaries[name].encode(value))
+            else:
+                self.taken_at[row] = int(taken.timestamp()) if taken else 0
+                self.month[row] = taken.year * 12 + taken.month - 1 if taken else _NO_MONTH
+                self.size[row] = exif.get("fileSizeInByte") or 0
+                for name, value in values.items():
+                    self.codes[name][row] = self.dictionaries[name].encode(value)
+        if len(self._ids) > 2 * len(self._rows):
+            self._compact()
+
+    def _compact(self) -> None:
+        keep = [row for row, live in enumerate(self.live) if live]
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {asset_id: row for row, asset_id in enumerate(self._ids)}
+        for column in (self.taken_at, self.month, self.size, self.live, *self.codes.values()):
+            column[:] = array(column.typecode, (column[row] for row in keep))
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # Local dates are stored as if they were UTC, so they keep their wall-clock year and month.
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+def _timestamp(value: str | None) -> int | None:
+    if value is None:
+        return None
+    parsed = _parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date {value!r}; use an ISO 8601 date or time")
+    return int(parsed.timestamp())
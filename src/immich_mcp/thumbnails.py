@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from immich_mcp.singleflight import SingleFlight
+
+
+class ThumbnailCache:
+    """
+    A size-bounded, content-addressed on-disk cache of thumbnail images.
+
+    Image bytes are stored once per SHA-256 digest under `objects/`, and each cache key
+    (an asset ID and thumbnail size) points at a digest through a small file under `refs/`.
+    Keys are evicted least recently used first once the stored images exceed `max_bytes`,
+    and an image is deleted when no key points at it any more.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._objects = self.directory / "objects"
+        self._refs = self.directory / "refs"
+        self._objects.mkdir(parents=True, exist_ok=True)
+        self._refs.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        self._ref_counts: Counter[str] = Counter()
+        self._sizes: dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Concurrent misses for the same key share one download.
+        self.inflight = SingleFlight()
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "ThumbnailCache | None":
+        """Opens the cache in IMMICH_THUMBNAIL_CACHE_DIR, or returns None if it is not enabled."""
+        directory = os.environ.get("IMMICH_THUMBNAIL_CACHE_DIR")
+        if not directory:
+            return None
+        max_bytes = int(os.environ.get("IMMICH_THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+        return cls(directory, max_bytes)
+
+    def open(self, key: str) -> tuple[mmap.mmap, str] | None:
+        """
+        Returns a read-only memory map of the image cached for `key` and its MIME type, or None.
+        The caller is responsible for closing the map.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        digest, mime_type = entry
+        try:
+            with open(self._object_path(digest), "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # The object was removed behind our back; forget the key and treat this as a miss.
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return mapped, mime_type
+
+    async def store(self, key: str, chunks: AsyncIterator[bytes], mime_type: str) -> str:
+        """
+        Writes the image streamed from `chunks` to the cache under `key` and returns its digest.
+        The files are written off the event loop.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.directory, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await asyncio.to_thread(file.write, chunk)
+                    size += len(chunk)
+            hexdigest = digest.hexdigest()
+            await asyncio.to_thread(self._commit, temp_path, hexdigest)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        if key in self._entries:
+            if self._entries[key][0] == hexdigest:
+                self._entries.move_to_end(key)
+                return hexdigest
+            self._drop(key)
+        await asyncio.to_thread((self._refs / quote(key, safe="")).write_text, f"{hexdigest} {mime_type}")
+        self._add(key, hexdigest, mime_type, size)
+        self._evict()
+        return hexdigest
+
+    def stats(self) -> dict[str, int]:
+        """Returns the cache's size and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "objects": len(self._sizes),
+            "bytes": self.total_bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _object_path(self, digest: str) -> Path:
+        return self._objects / digest[:2] / digest
+
+    def _commit(self, temp_path: str, digest: str) -> None:
+        """Moves a fully written image into place, unless an identical one is stored already."""
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            os.unlink(temp_path)
+        else:
+            object_path.parent.mkdir(exist_ok=True)
+            os.replace(temp_path, object_path)
+
+    def _load(self) -> None:
+        refs = sorted(self._refs.iterdir(), key=lambda path: path.stat().st_mtime)
+        for ref in refs:
+            digest, _, mime_type = ref.read_text().partition(" ")
+            try:
+                size = self._object_path(digest).stat().st_size
+            except OSError:
+                ref.unlink()
+                continue
+            self._add(unquote(ref.name), digest, mime_type, size)
+        self._evict()
+
+    def _add(self, key: str, digest: str, mime_type: str, size: int) -> None:
+        self._entries[key] = (digest, mime_type)
+        self._ref_counts[digest] += 1
+        if digest not in self._sizes:
+            self._sizes[digest] = size
+            self.total_bytes += size
+
+    def _drop(self, key: str) -> None:
+        digest, _ = self._entries.pop(key)
+        (self._refs / quote(key, safe="")).unlink(missing_ok=True)
+        self._ref_counts[digest] -= 1
+        if self._ref_counts[digest] <= 0:
+            del self._ref_counts[digest]
+            self.total_bytes -= self._sizes.pop(digest)
+            self._object_path(digest).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        # Always keep the most recently used key, even if it alone exceeds the budget.
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
@@ -0,0 +1,578 @@
+import abc
+import contextvars
+import enum
+import functools
+import inspect
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import httpx
+
+from immich_mcp.metrics import OnCloseStream, endpoint_label
+
+# The W3C Trace Context header, which carries a trace across processes.
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanKind(enum.IntEnum):
+    """What a span represents, numbered as in OTLP."""
+
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class StatusCode(enum.IntEnum):
+    """Whether the work a span represents succeeded, numbered as in OTLP."""
+
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identifies a span within its trace, and whether the trace is being recorded."""
+
+    trace_id: int
+    span_id: int
+    sampled: bool
+
+    @property
+    def is_valid(self) -> bool:
+        return self.trace_id != 0 and self.span_id != 0
+
+    def traceparent(self) -> str:
+        """Formats the context as a W3C `traceparent` header value."""
+        return f"00-{self.trace_id:032x}-{self.span_id:016x}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: str | None) -> "SpanContext | None":
+        """Parses a W3C `traceparent` header value, returning None if it is missing or invalid."""
+        match = _TRACEPARENT.match(value.strip().lower()) if value else None
+        if match is None:
+            return None
+        context = cls(int(match[1], 16), int(match[2], 16), bool(int(match[3], 16) & 1))
+        return context if context.is_valid else None
+
+
+class NonRecordingSpan:
+    """A span that records nothing, used when tracing is off or a trace is not sampled."""
+
+    def __init__(self, context: SpanContext):
+        self.context = context
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: dict | None = None, timestamp: int | None = None) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def set_status(self, code: StatusCode, description: str | None = None) -> None:
+        pass
+
+    def end(self, end_time: int | None = None) -> None:
+        pass
+
+
+INVALID_SPAN = NonRecordingSpan(SpanContext(0, 0, False))
+
+
+class Span(NonRecordingSpan):
+    """A timed operation in a trace. Times are nanoseconds since the epoch."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        context: SpanContext,
+        parent_id: int | None,
+        kind: SpanKind,
+        attributes: dict | None,
+        start_time: int,
+    ):
+        super().__init__(context)
+        self._tracer = tracer
+        self.name = name
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events: list[tuple[str, int, dict]] = []
+        self.status = StatusCode.UNSET
+        self.status_description: str | None = None
+        self.start_time = start_time
+        self.end_time: int | None = None
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def set_attribute(self, key: str, value) -> None:
+        if self.end_time is None:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: dict | None = None, timestamp: int | None = None) -> None:
+        if self.end_time is None:
+            self.events.append((name, timestamp or time.time_ns(), dict(attributes or {})))
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.add_event("exception", {"exception.type": type(exc).__qualname__, "exception.message": str(exc)})
+
+    def set_status(self, code: StatusCode, description: str | None = None) -> None:
+        if self.end_time is None:
+            self.status = code
+            self.status_description = description if code == StatusCode.ERROR else None
+
+    def end(self, end_time: int | None = None) -> None:
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time_ns()
+        self._tracer._on_end(self)
+
+
+# The span that new spans in this context are children of.
+_current_span: contextvars.ContextVar[NonRecordingSpan] = contextvars.ContextVar(
+    "immich_current_span", default=INVALID_SPAN
+)
+
+
+def get_current_span() -> NonRecordingSpan:
+    """Returns the span of the current context, or INVALID_SPAN outside of any trace."""
+    return _current_span.get()
+
+
+@contextmanager
+def use_span(span: NonRecordingSpan) -> Iterator[NonRecordingSpan]:
+    """Makes `span` the current span within the block, without ending it."""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+class SpanExporter(abc.ABC):
+    """Sends finished spans somewhere. Subclasses implement `export`."""
+
+    @abc.abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        """Sends a batch of finished spans."""
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps finished spans in a list, for tests."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class OTLPSpanExporter(SpanExporter):
+    """
+    Posts spans to an OpenTelemetry collector with OTLP over HTTP, encoded as JSON. Failures are
+    logged and the spans dropped, so an unreachable collector never affects requests.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        headers: dict[str, str] | None = None,
+        service_name: str = "immich-mcp",
+        timeout: float = 10.0,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(headers=headers, timeout=timeout, transport=transport)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        try:
+            response = self._client.post(self.endpoint, json=self.encode(spans))
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            print(f"Could not export {len(spans)} spans: {exc!r}")
+
+    def encode(self, spans: Sequence[Span]) -> dict:
+        """Encodes spans as an OTLP `ExportTraceServiceRequest`."""
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _encode_attributes({"service.name": self.service_name})},
+                    "scopeSpans": [
+                        {"scope": {"name": "immich_mcp"}, "spans": [_encode_span(s) for s in spans]}
+                    ],
+                }
+            ]
+        }
+
+    def shutdown(self) -> None:
+        self._client.close()
+
+
+class BatchSpanProcessor:
+    """
+    Hands finished spans to an exporter in batches from a background thread, so that exporting
+    never blocks the event loop. Spans are dropped once `max_queue_size` are waiting.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_queue_size: int = 2048,
+        max_batch_size: int = 512,
+        interval: float = 5.0,
+    ):
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: list[Span] = []
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._thread: threading.Thread | None = None
+
+    def on_end(self, span: Span) -> None:
+        with self._condition:
+            if self._shutdown:
+                return
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            # Started on first use, so that it runs in the worker process rather than a parent forked from.
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.max_batch_size:
+                self._condition.notify()
+
+    def shutdown(self) -> None:
+        """Exports the spans still waiting and stops the thread."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.exporter.shutdown()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._shutdown and len(self._queue) < self.max_batch_size:
+                    self._condition.wait(self.interval)
+                batch, self._queue = self._queue, []
+                done = self._shutdown
+            for start in range(0, len(batch), self.max_batch_size):
+                self.exporter.export(batch[start : start + self.max_batch_size])
+            if done:
+                return
+
+
+class SimpleSpanProcessor:
+    """Hands each span to the exporter as soon as it ends, for tests."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span) -> None:
+        self.exporter.export([span])
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+class Tracer:
+    """
+    Creates spans and passes the finished ones to a processor. Tracing is off until a processor is
+    configured. A new trace is sampled with probability `sample_rate`; spans within a trace follow
+    the decision of their parent, including a parent in another process.
+    """
+
+    def __init__(self, processor=None, sample_rate: float = 1.0):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def configure(self, processor, sample_rate: float = 1.0) -> None:
+        """Replaces the processor, after shutting down the previous one."""
+        if self.processor is not None:
+            self.processor.shutdown()
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    def configure_from_env(self) -> bool:
+        """
+        Sends spans to the OTLP/HTTP endpoint in IMMICH_MCP_TRACES_ENDPOINT, if it is set, sampling
+        the fraction of traces in IMMICH_MCP_TRACE_SAMPLE_RATE. Returns whether tracing was configured.
+        """
+        endpoint = os.environ.get("IMMICH_MCP_TRACES_ENDPOINT")
+        if not endpoint:
+            return False
+        headers = {}
+        for item in os.environ.get("IMMICH_MCP_TRACES_HEADERS", "").split(","):
+            name, _, value = item.partition("=")
+            if name.strip():
+                headers[name.strip()] = value.strip()
+        exporter = OTLPSpanExporter(
+            endpoint, headers, service_name=os.environ.get("IMMICH_MCP_SERVICE_NAME", "immich-mcp")
+        )
+        self.configure(
+            BatchSpanProcessor(exporter), float(os.environ.get("IMMICH_MCP_TRACE_SAMPLE_RATE", 0.1))
+        )
+        return True
+
+    def shutdown(self) -> None:
+        """Exports the spans still waiting and turns tracing off."""
+        if self.processor is not None:
+            self.processor.shutdown()
+            self.processor = None
+
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: dict | None = None,
+        parent: SpanContext | None = None,
+        start_time: int | None = None,
+    ) -> NonRecordingSpan:
+        """Starts a span, a child of `parent` or else of the current span. The caller must end it."""
+        if self.processor is None:
+            return INVALID_SPAN
+        if parent is None:
+            parent = _current_span.get().context
+        if parent.is_valid:
+            if not parent.sampled:
+                return NonRecordingSpan(SpanContext(parent.trace_id, _random_id(64), False))
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = _random_id(128), None
+            # The lower 64 bits of a trace ID are random, so they decide the sampling fairly.
+            if (trace_id & (2**64 - 1)) >= self.sample_rate * 2**64:
+                return NonRecordingSpan(SpanContext(trace_id, _random_id(64), False))
+        context = SpanContext(trace_id, _random_id(64), True)
+        return Span(self, name, context, parent_id, kind, attributes, start_time or time.time_ns())
+
+    @contextmanager
+    def start_as_current_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: dict | None = None,
+        parent: SpanContext | None = None,
+    ) -> Iterator[NonRecordingSpan]:
+        """Starts a span, makes it current within the block and ends it afterwards, recording any error."""
+        span = self.start_span(name, kind, attributes, parent)
+        with use_span(span):
+            try:
+                yield span
+            except BaseException as exc:
+                span.record_exception(exc)
+                span.set_status(StatusCode.ERROR, str(exc))
+                raise
+            finally:
+                span.end()
+
+    def _on_end(self, span: Span) -> None:
+        processor = self.processor
+        if processor is not None:
+            processor.on_end(span)
+
+
+TRACER = Tracer()
+
+
+def traced(fn: Callable) -> Callable:
+    """Decorates an async function or async generator to run in a span named after it."""
+    name = fn.__qualname__
+    if inspect.isasyncgenfunction(fn):
+
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            generator = fn(*args, **kwargs)
+            return generator if not TRACER.enabled else _traced_generator(name, generator)
+
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not TRACER.enabled:
+            return await fn(*args, **kwargs)
+        with TRACER.start_as_current_span(name):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+async def _traced_generator(name: str, generator: AsyncIterator) -> AsyncIterator:
+    # The span is only current while the generator runs, as the consumer's context may change
+    # between items. An error raised at a yield closes the generator rather than being thrown into it.
+    span = TRACER.start_span(name)
+    try:
+        while True:
+            with use_span(span):
+                try:
+                    item = await anext(generator)
+                except StopAsyncIteration:
+                    break
+            yield item
+    except BaseException as exc:
+        span.record_exception(exc)
+        span.set_status(StatusCode.ERROR, str(exc))
+        raise
+    finally:
+        await generator.aclose()
+        span.end()
+
+
+# httpcore trace events that start and end each phase of a request.
+_PHASES = {
+    "connect_tcp.started": ("connect", True),
+    "connect_tcp.complete": ("connect", False),
+    "start_tls.started": ("tls", True),
+    "start_tls.complete": ("tls", False),
+    "send_request_headers.started": ("send", True),
+    "send_request_body.complete": ("send", False),
+    "receive_response_headers.started": ("wait", True),
+    "receive_response_headers.complete": ("wait", False),
+    "receive_response_body.started": ("read", True),
+    "receive_response_body.complete": ("read", False),
+}
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport to record each request to Immich as a client span, from sending it until its
+    body is closed, with child spans for the connection pool wait and the connect, TLS, send, wait
+    (time to first byte) and read phases. It also passes the trace on to Immich in `traceparent`.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not TRACER.enabled:
+            return await self._transport.handle_async_request(request)
+        span = TRACER.start_span(
+            f"{request.method} {endpoint_label(request.url.path)}",
+            SpanKind.CLIENT,
+            {"http.request.method": request.method, "url.path": request.url.path},
+        )
+        if span.context.is_valid:
+            request.headers[TRACEPARENT_HEADER] = span.context.traceparent()
+        if span.is_recording():
+            request.extensions["trace"] = _PhaseRecorder(span).on_event
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as exc:
+            span.record_exception(exc)
+            span.set_status(StatusCode.ERROR, str(exc))
+            span.end()
+            raise
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(StatusCode.ERROR)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=OnCloseStream(response.stream, span.end),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _PhaseRecorder:
+    """Turns httpcore trace events into child spans of a request's span."""
+
+    def __init__(self, span: Span):
+        self._span = span
+        self._started: dict[str, int] = {}
+        self._pool_waited = False
+
+    async def on_event(self, event: str, info: dict) -> None:
+        now = time.time_ns()
+        if not self._pool_waited:
+            # The first event comes once the pool has handed the request a connection.
+            self._pool_waited = True
+            self._child("pool", self._span.start_time, now)
+        phase = _PHASES.get(event.partition(".")[2])
+        if phase is None:
+            return
+        name, started = phase
+        if started:
+            self._started[name] = now
+        elif name in self._started:
+            self._child(name, self._started.pop(name), now)
+
+    def _child(self, name: str, start_time: int, end_time: int) -> None:
+        child = TRACER.start_span(name, parent=self._span.context, start_time=start_time)
+        child.end(end_time)
+
+
+def _random_id(bits: int) -> int:
+    # Zero is the invalid ID.
+    return random.getrandbits(bits) or 1
+
+
+def _encode_span(span: Span) -> dict:
+    encoded = {
+        "traceId": f"{span.context.trace_id:032x}",
+        "spanId": f"{span.context.span_id:016x}",
+        "name": span.name,
+        "kind": int(span.kind),
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": _encode_attributes(span.attributes),
+        "events": [
+            {"timeUnixNano": str(timestamp), "name": name, "attributes": _encode_attributes(attributes)}
+            for name, timestamp, attributes in span.events
+        ],
+        "status": {"code": int(span.status)},
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = f"{span.parent_id:016x}"
+    if span.status_description:
+        encoded["status"]["message"] = span.status_description
+    return encoded
+
+
+def _encode_attributes(attributes: dict) -> list[dict]:
+    return [{"key": key, "value": _encode_value(value)} for key, value in attributes.items()]
+
+
+def _encode_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON carries 64-bit integers as strings.
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
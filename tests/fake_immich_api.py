@@ -1,8 +1,29 @@
+from contextlib import asynccontextmanager
+
+import httpx
+
+from immich_mcp.cache import TTLCache
+from immich_mcp.resilience import CircuitBreaker
+
+
 class ImmichAPI:
     """A fake client for interacting with the Immich API."""
 
-    def __init__(self, api_url: str | None = None, api_key: str | None = None):
-        pass
+    def __init__(self, api_url: str | None = None, api_key: str | None = None, cache_path: str | None = None):
+        self.cache = TTLCache()
+        self.breaker = CircuitBreaker()
+
+    def pool_stats(self) -> dict[str, int]:
+        return {
+            "active": 0,
+            "idle": 0,
+            "inFlight": 0,
+            "queued": 0,
+            "maxConnections": 100,
+            "maxKeepaliveConnections": 20,
+            "http2": False,
+            "saturation": 0.0,
+        }
 
     async def __aenter__(self):
         return self
@@ -13,6 +34,12 @@ class ImmichAPI:
     async def close(self):
         pass
 
+    async def run_cache_warmer(self, interval: float) -> None:
+        pass
+
+    async def run_event_listener(self, **kwargs) -> None:
+        pass
+
     async def ping_server(self) -> bool:
         return True
 
@@ -52,6 +79,67 @@ class ImmichAPI:
             "type": "IMAGE",
         }
 
+    async def get_assets_bulk(self, asset_ids: list[str], concurrency: int | None = None) -> list[dict]:
+        return [await self.get_asset(asset_id) for asset_id in asset_ids]
+
+    async def iter_search_metadata(self, filters: dict | None = None, page_size: int = 250, page: int = 1):
+        yield {
+            "total": 1,
+            "count": 1,
+            "items": [await self.get_asset("asset1")],
+            "nextPage": None,
+        }
+
+    async def get_albums(self) -> list[dict]:
+        return [await self.get_album("album1")]
+
+    async def get_album(self, album_id: str) -> dict:
+        return {
+            "id": album_id,
+            "albumName": "Holidays",
+            "description": "",
+            "ownerId": "test-user-id",
+            "shared": False,
+            "assetCount": 1,
+            "createdAt": "2024-01-01T00:00:00.000Z",
+            "updatedAt": "2024-01-01T00:00:00.000Z",
+        }
+
+    async def get_album_asset_ids(self, album_id: str) -> list[str]:
+        return ["asset1"]
+
+    async def add_assets_to_album(
+        self, album_id: str, asset_ids: list[str], chunk_size: int | None = None
+    ) -> list[dict]:
+        return [{"id": asset_id, "success": True} for asset_id in asset_ids]
+
+    async def remove_assets_from_album(
+        self, album_id: str, asset_ids: list[str], chunk_size: int | None = None
+    ) -> list[dict]:
+        return [{"id": asset_id, "success": True} for asset_id in asset_ids]
+
+    async def get_timeline_buckets(self, filters: dict | None = None) -> list[dict]:
+        return [{"timeBucket": "2024-03-01T00:00:00.000Z", "count": 1}]
+
+    async def get_timeline_bucket(self, time_bucket: str, filters: dict | None = None) -> list[dict]:
+        return [{"id": "asset1", "type": "IMAGE", "takenAt": "2024-03-02T10:00:00.000Z", "isFavorite": False}]
+
+    @asynccontextmanager
+    async def stream_thumbnail(self, asset_id: str, size: str = "thumbnail"):
+        yield httpx.Response(200, content=b"fake-image", headers={"content-type": "image/jpeg"})
+
+    async def get_download_info(self, asset_ids: list[str], archive_size: int | None = None) -> dict:
+        return {
+            "totalSize": 10 * len(asset_ids),
+            "archives": [{"size": 10 * len(asset_ids), "assetIds": asset_ids}],
+        }
+
+    @asynccontextmanager
+    async def stream_archive(self, asset_ids: list[str]):
+        yield httpx.Response(
+            200, content=b"fake-archive", headers={"content-type": "application/octet-stream"}
+        )
+
     async def get_my_api_key(self) -> dict:
         return {
             "id": "api-key-1",
@@ -0,0 +1,142 @@
+import asyncio
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from immich_mcp.admission import (
+    DOWNLOAD_EXTENSION,
+    ConcurrencyLimit,
+    ConcurrencyLimitTransport,
+    OverloadedError,
+    RateLimiter,
+    TokenBucket,
+)
+from immich_mcp.server import with_rate_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_queues_reservations_in_order():
+    """Tests that reservations beyond the burst wait for successive refills."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now = 1.0
+    assert bucket.reserve() == 0.5
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_limits_each_client_separately():
+    """Tests that one busy client is throttled and then rejected without affecting others."""
+    clock = FakeClock()
+    sleeps = []
+
+    async def sleep(delay: float):
+        sleeps.append(delay)
+
+    limiter = RateLimiter(client_rate=1, client_burst=1, max_wait=1.5, clock=clock, sleep=sleep)
+
+    assert await limiter.acquire("agent") == 0.0
+    assert await limiter.acquire("agent") == 1.0
+    with pytest.raises(OverloadedError, match="retry in 2.0 seconds") as excinfo:
+        await limiter.acquire("agent")
+    assert excinfo.value.retry_after == 2.0
+    assert await limiter.acquire("photo-app") == 0.0
+    assert sleeps == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_applies_global_limit_across_clients():
+    """Tests that the shared bucket throttles all clients together."""
+    limiter = RateLimiter(rate=1, burst=1, max_wait=0, clock=FakeClock())
+
+    await limiter.acquire("a")
+    with pytest.raises(OverloadedError):
+        await limiter.acquire("b")
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_hands_slots_over_in_arrival_order():
+    """Tests that queued callers get freed slots first come, first served."""
+    limit = ConcurrencyLimit(1)
+    order = []
+    await limit.acquire()
+
+    async def worker(name: str):
+        await limit.acquire()
+        order.append(name)
+        limit.release()
+
+    tasks = [asyncio.create_task(worker(name)) for name in ("first", "second", "third")]
+    await asyncio.sleep(0)
+    assert limit.queued == 3
+    limit.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["first", "second", "third"]
+    assert limit.active == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_rejects_after_max_wait():
+    """Tests that a caller who cannot get a slot in time is rejected with a retryable error."""
+    limit = ConcurrencyLimit(1, max_wait=0.01)
+    await limit.acquire()
+
+    with pytest.raises(OverloadedError, match="Immich is busy"):
+        await limit.acquire()
+    assert limit.queued == 0
+    assert limit.active == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_transport_holds_slot_until_body_is_closed():
+    """Tests that a streamed response keeps its slot until it has been read."""
+    limit = ConcurrencyLimit(1)
+    transport = ConcurrencyLimitTransport(httpx.MockTransport(lambda request: httpx.Response(200)), limit)
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test") as client:
+        async with client.stream("GET", "/") as response:
+            assert limit.active == 1
+            await response.aread()
+        assert limit.active == 0
+
+
+@pytest.mark.asyncio
+async def test_downloads_hold_a_slot_of_their_own_limit():
+    """Tests that a download being read does not take a slot other requests need."""
+    limit = ConcurrencyLimit(1)
+    downloads = ConcurrencyLimit(1)
+    transport = ConcurrencyLimitTransport(
+        httpx.MockTransport(lambda request: httpx.Response(200)), limit, downloads
+    )
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test") as client:
+        async with client.stream("POST", "/download/archive", extensions={DOWNLOAD_EXTENSION: True}):
+            assert (limit.active, downloads.active) == (0, 1)
+            assert (await client.get("/assets/1")).status_code == 200
+        assert downloads.active == 0
+
+
+@pytest.mark.asyncio
+async def test_with_rate_limit_rejects_before_running_handler(mocker: MockerFixture):
+    """Tests that a rejected request never reaches its handler."""
+    mock_context = mocker.patch("immich_mcp.server.mcp.get_context")
+    limiter = RateLimiter(client_rate=1, client_burst=1, max_wait=0)
+    mock_context.return_value.request_context.lifespan_context = {"rate_limiter": limiter}
+    mock_context.return_value.request_context.request.headers = {"mcp-session-id": "session-1"}
+    calls = []
+
+    async def handler():
+        calls.append(1)
+
+    await with_rate_limit(handler)()
+    with pytest.raises(OverloadedError):
+        await with_rate_limit(handler)()
+    assert calls == [1]
@@ -0,0 +1,113 @@
+import json
+
+import httpx
+import pytest
+
+from immich_mcp.immich_api import ImmichAPI
+
+
+class FakeAlbum:
+    """Serves one album's details, its assets and bulk membership changes, recording each request."""
+
+    def __init__(self, asset_ids: list[str]):
+        self.asset_ids = list(asset_ids)
+        self.version = 0
+        self.requests = []
+
+    def touch(self) -> None:
+        self.version += 1
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.method, request.url.path, request.url.params.get("withoutAssets")))
+        details = {
+            "id": "album1",
+            "albumName": "Holidays",
+            "description": "",
+            "ownerId": "user1",
+            "shared": False,
+            "assetCount": len(self.asset_ids),
+            "createdAt": "2024-01-01T00:00:00.000Z",
+            "updatedAt": f"2024-01-01T00:00:{self.version:02d}.000Z",
+        }
+        if request.method == "GET":
+            if request.url.params.get("withoutAssets") == "true":
+                return httpx.Response(200, json=details)
+            assets = [{"id": asset_id, "exifInfo": {"make": "Canon"}} for asset_id in self.asset_ids]
+            return httpx.Response(200, json={**details, "assets": assets})
+        ids = json.loads(request.content)["ids"]
+        results = []
+        for asset_id in ids:
+            if asset_id == "forbidden":
+                results.append({"id": asset_id, "success": False, "error": "no_permission"})
+            elif request.method == "PUT":
+                self.asset_ids.append(asset_id)
+                results.append({"id": asset_id, "success": True})
+            else:
+                self.asset_ids.remove(asset_id)
+                results.append({"id": asset_id, "success": True})
+        self.touch()
+        return httpx.Response(200, json=results)
+
+
+def downloads(album: FakeAlbum) -> int:
+    return sum(1 for method, _, without_assets in album.requests if method == "GET" and not without_assets)
+
+
+@pytest.mark.asyncio
+async def test_album_assets_are_downloaded_again_only_when_the_album_changes():
+    """Tests that an album's asset IDs are reused while its updatedAt and assetCount are unchanged."""
+    album = FakeAlbum(["a", "b"])
+    async with ImmichAPI(
+        "http://immich.test", "key", cache_ttls={"album": 0}, transport=httpx.MockTransport(album)
+    ) as api:
+        assert await api.get_album_asset_ids("album1") == ["a", "b"]
+        assert await api.get_album_asset_ids("album1") == ["a", "b"]
+        assert downloads(album) == 1
+
+        album.asset_ids.append("c")
+        album.touch()
+        assert await api.get_album_asset_ids("album1") == ["a", "b", "c"]
+        assert downloads(album) == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_album_updates_send_chunks_of_the_difference():
+    """Tests that bulk changes skip assets that need no change, are chunked and keep the IDs cached."""
+    album = FakeAlbum(["a", "b"])
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(album)) as api:
+        results = await api.add_assets_to_album("album1", ["a", "c", "d", "e", "forbidden"], chunk_size=2)
+        assert results == [
+            {"id": "a", "success": False, "error": "duplicate"},
+            {"id": "c", "success": True},
+            {"id": "d", "success": True},
+            {"id": "e", "success": True},
+            {"id": "forbidden", "success": False, "error": "no_permission"},
+        ]
+        assert [method for method, _, _ in album.requests].count("PUT") == 2
+        assert await api.get_album_asset_ids("album1") == ["a", "b", "c", "d", "e"]
+
+        results = await api.remove_assets_from_album("album1", ["b", "x"])
+        assert [result["success"] for result in results] == [True, False]
+        assert results[1]["error"] == "not_found"
+        assert await api.get_album_asset_ids("album1") == ["a", "c", "d", "e"]
+
+    # The album was downloaded once; changes made through the client were applied to the cached IDs.
+    assert downloads(album) == 1
+    assert ("DELETE", "/api/albums/album1/assets", None) in album.requests
+
+
+@pytest.mark.asyncio
+async def test_cached_album_assets_are_dropped_after_concurrent_changes():
+    """Tests that the album is downloaded again if someone else changed it while we did."""
+    album = FakeAlbum(["a"])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "PUT":
+            album.asset_ids.append("from-elsewhere")
+        return album(request)
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        await api.add_assets_to_album("album1", ["b"])
+        assert await api.get_album_asset_ids("album1") == ["a", "from-elsewhere", "b"]
+
+    assert downloads(album) == 2
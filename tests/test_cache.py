@@ -0,0 +1,237 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from immich_mcp.cache import MISSING, PersistentCache, TTLCache
+from immich_mcp.immich_api import ImmichAPI
+
+
+class FakeClock:
+    """A manually advanced clock for expiring cache entries."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    """Tests that entries are served until their TTL elapses."""
+    clock = FakeClock()
+    cache = TTLCache(clock=clock)
+    cache.set("key", {"id": "1"}, ttl=10)
+
+    assert cache.get("key") == {"id": "1"}
+    clock.now = 10
+    assert cache.get("key") is MISSING
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Tests that the cache stays bounded by evicting the least recently used entry."""
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.evictions == 1
+
+
+def test_ttl_cache_invalidate_by_predicate():
+    """Tests that invalidation drops only the matching entries."""
+    cache = TTLCache()
+    cache.set(("users", "/users"), [], ttl=60)
+    cache.set(("partners", "/partners"), [], ttl=60)
+
+    assert cache.invalidate(lambda key: key[0] == "users") == 1
+    assert ("users", "/users") not in cache
+    assert ("partners", "/partners") in cache
+
+
+@pytest.mark.asyncio
+async def test_immich_api_serves_repeated_reads_from_cache():
+    """Tests that cached endpoints only hit Immich once until invalidated."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json=[{"id": "user1", "email": "a@example.com", "name": "A"}])
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        assert await api.get_users_list() == await api.get_users_list()
+        assert calls == ["/api/users"]
+
+        api.invalidate("users")
+        await api.get_users_list()
+        assert calls == ["/api/users", "/api/users"]
+
+
+@pytest.mark.asyncio
+async def test_immich_api_does_not_cache_failures():
+    """Tests that an upstream error is not cached as an empty result."""
+    responses = iter([httpx.Response(502), httpx.Response(200, json=[])])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return next(responses)
+
+    async with ImmichAPI(
+        "http://immich.test",
+        "key",
+        cache_ttls={"partners": 60},
+        max_retries=0,
+        transport=httpx.MockTransport(handler),
+    ) as api:
+        with pytest.raises(httpx.HTTPStatusError):
+            await api.get_partners()
+        assert await api.get_partners() == []
+        assert api.cache.stats()["size"] == 1
+
+
+def test_ttl_cache_returns_stale_entries_within_grace():
+    """Tests that expired entries are returned as stale until the grace period ends."""
+    clock = FakeClock()
+    cache = TTLCache(stale_grace=5, clock=clock)
+    cache.set("key", "value", ttl=10)
+
+    assert cache.lookup("key") == ("value", True)
+    clock.now = 12
+    assert cache.lookup("key") == ("value", False)
+    assert cache.get("key") is MISSING
+    clock.now = 15
+    assert cache.lookup("key") == (MISSING, False)
+    assert cache.stats()["staleHits"] == 2
+
+
+def test_ttl_cache_lists_expiring_entries_that_were_read():
+    """Tests that only entries read since they were stored are offered for refreshing."""
+    clock = FakeClock()
+    cache = TTLCache(clock=clock)
+    cache.set("read", 1, ttl=10)
+    cache.set("unread", 2, ttl=10)
+    cache.set("later", 3, ttl=60)
+    cache.get("read")
+    cache.get("later")
+
+    assert cache.expiring(within=15) == ["read"]
+
+
+@pytest.mark.asyncio
+async def test_immich_api_serves_stale_response_while_revalidating():
+    """Tests that a stale read returns immediately and refreshes the entry in the background."""
+    clock = FakeClock()
+    versions = iter(["old", "new"])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[{"id": next(versions), "email": "a@example.com", "name": "A"}])
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        api.cache = TTLCache(stale_grace=60, clock=clock)
+        assert (await api.get_users_list())[0]["id"] == "old"
+
+        clock.now = 301
+        assert (await api.get_users_list())[0]["id"] == "old"
+        await asyncio.gather(*api._revalidations.values())
+        assert (await api.get_users_list())[0]["id"] == "new"
+
+
+@pytest.mark.asyncio
+async def test_immich_api_refreshes_hot_entries_before_expiry():
+    """Tests that the cache warmer refetches entries that are read and about to expire."""
+    clock = FakeClock()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json=[])
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        api.cache = TTLCache(clock=clock)
+        await api.get_users_list()
+        await api.get_partners()
+        await api.get_users_list()
+
+        clock.now = 290
+        assert await api.refresh_expiring(within=15) == 1
+        assert calls == ["/api/users", "/api/partners", "/api/users"]
+        clock.now = 310
+        await api.get_users_list()
+        assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_restarted_client_starts_warm_from_disk(tmp_path):
+    """Tests that a new client serves responses persisted by the previous one without refetching them."""
+    path = str(tmp_path / "cache.db")
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        user = {"id": "user1", "email": "a@example.com", "name": "A", "inTimeline": True}
+        return httpx.Response(200, json=[user])
+
+    async with ImmichAPI(
+        "http://immich.test", "key", cache_path=path, transport=httpx.MockTransport(handler)
+    ) as api:
+        users = await api.get_users_list()
+        await api.get_partners()
+        api.invalidate("partners")
+
+    async with ImmichAPI(
+        "http://immich.test", "key", cache_path=path, transport=httpx.MockTransport(handler)
+    ) as api:
+        assert api._persisted == {("users", "/users", ())}
+        assert await api.get_users_list() == users
+        assert await api.get_users_list() == users
+        await api.get_partners()
+    assert calls == ["/api/users", "/api/partners", "/api/partners"]
+
+    # Another API key gets none of the persisted responses.
+    async with ImmichAPI(
+        "http://immich.test", "other", cache_path=path, transport=httpx.MockTransport(handler)
+    ) as api:
+        assert api._persisted == set()
+
+
+@pytest.mark.asyncio
+async def test_expired_persisted_response_is_served_while_revalidating(tmp_path):
+    """Tests that a response that expired while the server was down is served stale and refetched."""
+    path = str(tmp_path / "cache.db")
+    store = PersistentCache(path, PersistentCache.scope("http://immich.test", "key"))
+    key = ("users", "/users", ())
+    store.apply([("set", key, [{"id": "old"}], time.time() - 10)])
+    store.apply([("set", ("partners", "/partners", ()), [{"id": "gone"}], time.time() - 7200)])
+    store.close()
+    versions = iter(["new", "partner"])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        user = {"id": next(versions), "email": "a@example.com", "name": "A", "inTimeline": True}
+        return httpx.Response(200, json=[user])
+
+    async with ImmichAPI(
+        "http://immich.test", "key", cache_path=path, transport=httpx.MockTransport(handler)
+    ) as api:
+        assert (await api.get_users_list())[0]["id"] == "old"
+        await asyncio.gather(*api._revalidations.values())
+        assert (await api.get_users_list())[0]["id"] == "new"
+        # Past IMMICH_CACHE_PERSIST_MAX_STALE, a persisted response is refetched instead.
+        assert (await api.get_partners())[0]["id"] == "partner"
+
+
+def test_persistent_cache_ignores_other_formats(tmp_path):
+    """Tests that entries written in another format version are not loaded."""
+    path = str(tmp_path / "cache.db")
+    store = PersistentCache(path, "scope")
+    store.apply([("set", ("users", "/users", (("size", 10),)), [], time.time() + 60)])
+    assert store.keys() == {("users", "/users", (("size", 10),))}
+    store._conn.execute("UPDATE entries SET format = 0")
+    assert store.keys() == set()
+    assert store.load(("users", "/users", (("size", 10),))) is None
+    store.close()
@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+from starlette.requests import Request
+
+from immich_mcp.deadlines import DeadlineExceeded, DeadlineTransport, deadline, remaining
+from immich_mcp.resilience import CircuitBreaker, RetryTransport
+from immich_mcp.server import with_deadline
+
+
+@pytest.mark.asyncio
+async def test_deadline_transport_caps_request_timeouts():
+    """Tests that upstream timeouts are capped at the time left until the deadline."""
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"])
+        return httpx.Response(200)
+
+    transport = DeadlineTransport(httpx.MockTransport(handler))
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test", timeout=30) as client:
+        await client.get("/")
+        with deadline(2):
+            await client.get("/")
+
+    assert timeouts[0]["read"] == 30
+    assert 1.5 < timeouts[1]["read"] <= 2
+    assert set(timeouts[1]) == {"connect", "read", "write", "pool"}
+
+
+@pytest.mark.asyncio
+async def test_deadline_transport_rejects_requests_after_deadline():
+    """Tests that no request is sent once the deadline has passed, and the breaker is not told."""
+    calls = []
+    breaker = CircuitBreaker(failure_threshold=1)
+    upstream = httpx.MockTransport(lambda request: calls.append(request) or httpx.Response(200))
+    transport = RetryTransport(DeadlineTransport(upstream), breaker=breaker)
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test") as client:
+        with deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                await client.get("/")
+
+    assert calls == []
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_retry_transport_gives_up_when_backoff_exceeds_deadline():
+    """Tests that a retry is not attempted if waiting for it would overrun the deadline."""
+    sleeps = []
+
+    async def sleep(delay: float):
+        sleeps.append(delay)
+
+    upstream = httpx.MockTransport(lambda request: httpx.Response(503, headers={"retry-after": "3"}))
+    transport = RetryTransport(upstream, sleep=sleep)
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test") as client:
+        with deadline(1):
+            response = await client.get("/")
+            assert remaining() > 0
+
+    assert response.status_code == 503
+    assert sleeps == []
+
+
+def make_request(receive) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/mcp", "headers": []}, receive)
+
+
+@pytest.mark.asyncio
+async def test_with_deadline_times_out_slow_handlers(mocker: MockerFixture):
+    """Tests that a handler running past the client's requested deadline is cancelled."""
+    mock_context = mocker.patch("immich_mcp.server.mcp.get_context")
+    mock_context.return_value.request_context.request = None
+    mocker.patch.dict("os.environ", {"IMMICH_MCP_REQUEST_TIMEOUT": "0.01"})
+
+    async def handler():
+        assert remaining() <= 0.01
+        await asyncio.sleep(1)
+
+    with pytest.raises(ValueError, match="timed out"):
+        await with_deadline(handler)()
+
+
+@pytest.mark.asyncio
+async def test_with_deadline_cancels_when_client_disconnects(mocker: MockerFixture):
+    """Tests that a handler is cancelled once its HTTP client has gone away."""
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if disconnected.is_set():
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(3600)
+
+    mock_context = mocker.patch("immich_mcp.server.mcp.get_context")
+    mock_context.return_value.request_context.request = make_request(receive)
+    mocker.patch("immich_mcp.server.DISCONNECT_POLL_INTERVAL", 0.001)
+    cancelled = asyncio.Event()
+
+    async def handler():
+        disconnected.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ValueError, match="client disconnected"):
+        await with_deadline(handler)()
+    assert cancelled.is_set()
@@ -0,0 +1,145 @@
+import asyncio
+import io
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import httpx
+import pytest
+
+from immich_mcp.duplicates import DuplicateIndex, MultiIndex, image_hashes
+from immich_mcp.immich_api import ImmichAPI
+
+
+def fake_hashes(data: bytes) -> tuple[int, int]:
+    """Reads the fake thumbnail as the hashes to use, so that tests need no image library."""
+    value = int(data)
+    return value, value
+
+
+class FakeLibrary:
+    """Serves /search/metadata and thumbnails whose bytes are the hash they should have."""
+
+    def __init__(self, hashes: dict[str, int]):
+        self.hashes = hashes
+        self.thumbnail_requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/search/metadata":
+            assert json.loads(request.content)["type"] == "IMAGE"
+            items = [{"id": asset_id, "thumbhash": str(value)} for asset_id, value in self.hashes.items()]
+            return httpx.Response(200, json={"assets": {"items": items, "nextPage": None}})
+        asset_id = request.url.path.split("/")[3]
+        self.thumbnail_requests.append(asset_id)
+        return httpx.Response(200, content=str(self.hashes[asset_id]).encode())
+
+
+def test_multi_index_search_matches_brute_force():
+    """Tests that a multi-index search finds exactly the hashes a linear scan would, each once."""
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Near copies of some values, so that small radii have something to find.
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:50]]
+    # Sized for exact band matches and, as for a large library, for bands searched within 2 bits.
+    for size in (len(values), 10**6):
+        index = MultiIndex(8, size=size)
+        for i, value in enumerate(values):
+            index.add(value, i)
+
+        for query in values[:20]:
+            for radius in (0, 1, 3, 8):
+                found = sorted(item for _, _, items in index.search(query, radius) for item in items)
+                expected = [i for i, value in enumerate(values) if (value ^ query).bit_count() <= radius]
+                assert found == expected
+        assert len(index) == len(values)
+    assert MultiIndex(8, size=len(values)).bands == 9 and MultiIndex(8, size=10**6).bands < 9
+
+
+@pytest.mark.asyncio
+async def test_update_only_hashes_new_and_changed_images(tmp_path):
+    """Tests that a second update skips images whose thumbnails are unchanged and forgets removed ones."""
+    library = FakeLibrary({"a": 0b1111, "b": 0b1110, "c": 1 << 63})
+    index = DuplicateIndex(str(tmp_path / "hashes.db"), executor=ThreadPoolExecutor(2), hasher=fake_hashes)
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(library)) as api:
+        assert await index.update(api) == 3
+        library.thumbnail_requests.clear()
+        library.hashes["c"] = 0b0111
+        library.hashes["d"] = 0xFFFF << 48
+        del library.hashes["b"]
+        assert await index.update(api) == 2
+
+    assert sorted(library.thumbnail_requests) == ["c", "d"]
+    assert await index.count() == 3
+    assert await index.find_pairs(1) == [{"assetIds": ["a", "c"], "distance": 1}]
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_find_pairs_orders_by_distance(tmp_path):
+    """Tests that pairs come closest first, identical hashes included, up to the limit."""
+    library = FakeLibrary({"a": 0, "b": 0, "c": 0b1, "d": 0b111, "e": 0xFF << 56})
+    index = DuplicateIndex(str(tmp_path / "hashes.db"), executor=ThreadPoolExecutor(2), hasher=fake_hashes)
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(library)) as api:
+        await index.update(api)
+
+    pairs = await index.find_pairs(2, algorithm="dhash")
+    assert pairs == [
+        {"assetIds": ["a", "b"], "distance": 0},
+        {"assetIds": ["a", "c"], "distance": 1},
+        {"assetIds": ["b", "c"], "distance": 1},
+        {"assetIds": ["c", "d"], "distance": 2},
+    ]
+    assert await index.find_pairs(2, limit=1) == pairs[:1]
+    with pytest.raises(ValueError):
+        await index.find_pairs(2, algorithm="ahash")
+    with pytest.raises(ValueError, match="max_distance"):
+        await index.find_pairs(64)
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_update_loop_survives_a_broken_worker_pool(tmp_path):
+    """Tests that the update loop replaces a broken pool of hashing workers and keeps going."""
+
+    class BrokenExecutor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("A worker process terminated abruptly")
+
+    library = FakeLibrary({"a": 0b1111})
+    index = DuplicateIndex(str(tmp_path / "hashes.db"), hasher=fake_hashes)
+    index._executor = BrokenExecutor(1)
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(library)) as api:
+        task = asyncio.create_task(index.run_update_loop(api, interval=0.01))
+        while index._executor is not None:
+            await asyncio.sleep(0.01)
+        # Stands in for the new pool of worker processes.
+        index._executor = ThreadPoolExecutor(1)
+        while await index.count() == 0:
+            await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+    index.close()
+
+
+def test_image_hashes_tolerate_resizing_and_recompression():
+    """Tests that a smaller JPEG copy of an image hashes close to the original, and another image does not."""
+    pytest.importorskip("numpy")
+    image_module = pytest.importorskip("PIL.Image")
+
+    def encode(image, image_format: str) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    # An asymmetric view, as symmetric images leave half of the DCT coefficients at zero.
+    original = image_module.effect_mandelbrot((400, 300), (-1.8, -0.4, 0.6, 1.4), 100)
+    other = image_module.effect_mandelbrot((400, 300), (-0.8, -0.2, 0.4, 1.0), 100)
+    hashes = image_hashes(encode(original, "PNG"))
+    copy_hashes = image_hashes(encode(original.resize((200, 150)), "JPEG"))
+    other_hashes = image_hashes(encode(other, "PNG"))
+
+    for value, copy_value, other_value in zip(hashes, copy_hashes, other_hashes):
+        assert (value ^ copy_value).bit_count() <= 4
+        assert (value ^ other_value).bit_count() > 16
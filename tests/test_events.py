@@ -0,0 +1,191 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from immich_mcp.events import EventListener
+from immich_mcp.immich_api import ImmichAPI
+
+
+class FakeWebSocket:
+    """The client's end of a fake websocket to `FakeEventServer`."""
+
+    def __init__(self, server: "FakeEventServer"):
+        self.server = server
+
+    async def send(self, packet: str) -> None:
+        self.server.received.append(packet)
+        if packet == "40":
+            self.server.send('40{"sid":"socket"}')
+
+    async def recv(self) -> str:
+        return await self.server.outbox.get()
+
+
+class FakeEventServer:
+    """A stand-in for Immich's Socket.IO endpoint, speaking Engine.IO over a websocket."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.urls: list[str] = []
+        self.received: list[str] = []
+        self.assets: dict[str, dict] = {}
+        self.asset_requests = 0
+        self.outbox: asyncio.Queue[str] = asyncio.Queue()
+
+    def emit(self, event: str, payload) -> None:
+        self.send("42" + json.dumps([event, payload]))
+
+    def send(self, packet: str) -> None:
+        self.outbox.put_nowait(packet)
+
+    @asynccontextmanager
+    async def connect(self, url: str, headers: dict[str, str]):
+        assert headers["x-api-key"] == "key"
+        self.urls.append(url)
+        self.sessions += 1
+        self.outbox = asyncio.Queue()
+        self.send("0" + json.dumps({"sid": f"s{self.sessions}", "pingInterval": 25000, "pingTimeout": 20000}))
+        yield FakeWebSocket(self)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.asset_requests += 1
+        return httpx.Response(200, json=self.assets[request.url.path.rsplit("/", 1)[1]])
+
+
+async def wait_for(condition) -> None:
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("condition not met")
+
+
+async def no_sleep(delay: float) -> None:
+    await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_event_listener_delivers_events_and_answers_pings():
+    """Tests that events are passed on and server pings are answered with pongs."""
+    server = FakeEventServer()
+    events = []
+    listener = EventListener(
+        "http://immich.test",
+        "key",
+        lambda name, payload: events.append((name, payload)),
+        connect=server.connect,
+    )
+    task = asyncio.create_task(listener.run())
+    try:
+        await wait_for(lambda: listener.connected)
+        server.send("2")
+        server.emit("on_asset_delete", "asset1")
+        await wait_for(lambda: events)
+
+        assert events == [("on_asset_delete", "asset1")]
+        assert server.received == ["40", "3"]
+        assert server.urls == ["ws://immich.test/api/socket.io/?EIO=4&transport=websocket"]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_event_listener_reconnects_after_close():
+    """Tests that the listener reports the disconnect and opens a new session."""
+    server = FakeEventServer()
+    changes = []
+    listener = EventListener(
+        "http://immich.test",
+        "key",
+        lambda name, payload: None,
+        on_connect=lambda: changes.append("up"),
+        on_disconnect=lambda: changes.append("down"),
+        connect=server.connect,
+        sleep=no_sleep,
+    )
+    task = asyncio.create_task(listener.run())
+    try:
+        await wait_for(lambda: listener.connected)
+        server.send("1")
+        await wait_for(lambda: server.sessions == 2 and listener.connected)
+
+        assert changes == ["up", "down", "up"]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_immich_api_keeps_cached_assets_in_sync_with_events():
+    """Tests that events update or drop exactly the affected cached assets."""
+    server = FakeEventServer()
+    server.assets = {
+        "asset1": {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"},
+        "asset2": {"id": "asset2", "originalFileName": "b.jpg", "type": "IMAGE"},
+    }
+    transport = httpx.MockTransport(server)
+    async with ImmichAPI("http://immich.test", "key", transport=transport) as api:
+        task = asyncio.create_task(api.run_event_listener(connect=server.connect, sleep=no_sleep))
+        try:
+            # Assets have no TTL by default, but are cached while the event stream keeps them current.
+            await wait_for(lambda: api.events_connected)
+            await api.get_asset("asset1")
+            await api.get_asset("asset2")
+            await api.get_asset("asset1")
+            assert server.asset_requests == 2
+
+            server.emit("on_asset_update", [{"id": "asset1", "originalFileName": "c.jpg", "type": "IMAGE"}])
+            server.emit("on_asset_trash", ["asset2"])
+            await wait_for(lambda: ("asset", "/assets/asset2", ()) not in api.cache)
+
+            assert (await api.get_asset("asset1"))["originalFileName"] == "c.jpg"
+            assert server.asset_requests == 2
+            await api.get_asset("asset2")
+            assert server.asset_requests == 3
+
+            # Events may be missed while disconnected, so the cached assets are dropped.
+            server.send("1")
+            await wait_for(lambda: server.sessions == 2)
+            assert ("asset", "/assets/asset1", ()) not in api.cache
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_event_listener_connects_over_websockets():
+    """Tests that the default connection asks a real websocket server for the websocket transport."""
+    server_module = pytest.importorskip("websockets.asyncio.server")
+    requests = []
+
+    async def handler(websocket) -> None:
+        requests.append((websocket.request.path, websocket.request.headers["x-api-key"]))
+        await websocket.send("0" + json.dumps({"sid": "s1", "pingInterval": 25000, "pingTimeout": 20000}))
+        assert await websocket.recv() == "40"
+        await websocket.send('40{"sid":"socket"}')
+        await websocket.send('42["on_asset_delete","asset1"]')
+        await websocket.wait_closed()
+
+    events = []
+    async with server_module.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        listener = EventListener(
+            f"http://127.0.0.1:{port}",
+            "key",
+            lambda name, payload: events.append((name, payload)),
+        )
+        task = asyncio.create_task(listener.run())
+        try:
+            await wait_for(lambda: events)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    assert requests == [("/api/socket.io/?EIO=4&transport=websocket", "key")]
+    assert events == [("on_asset_delete", "asset1")]
+    assert listener.url.startswith("ws://")
+    assert EventListener("https://immich.test/", "key", print).url.startswith("wss://immich.test/api/")
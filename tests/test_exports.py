@@ -0,0 +1,176 @@
+import json
+
+import httpx
+import pytest
+from starlette.requests import ClientDisconnect, Request
+
+from immich_mcp.admission import RateLimiter, download_limit
+from immich_mcp.exports import ArchiveExporter
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.main import app, download_archive
+from immich_mcp.pool import ClientPool
+from immich_mcp.server import shared_context
+
+
+class FakeDownloads:
+    """Splits downloads into one archive per asset and serves them, failing those listed in `failing`."""
+
+    def __init__(self):
+        self.archives = []
+        self.failing = set()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/api-keys/me":
+            if request.headers["x-api-key"] == "made-up-key":
+                return httpx.Response(401)
+            api_key = {"id": "api-key-1", "name": "Caller", "permissions": ["all"]}
+            return httpx.Response(200, json={**api_key, "createdAt": "2024-01-01", "updatedAt": "2024-01-01"})
+        asset_ids = json.loads(request.content)["assetIds"]
+        if request.url.path == "/api/download/info":
+            archives = [{"size": 5, "assetIds": [asset_id]} for asset_id in asset_ids]
+            return httpx.Response(200, json={"totalSize": 5 * len(asset_ids), "archives": archives})
+        self.archives.append(asset_ids)
+        if asset_ids[0] in self.failing:
+            return httpx.Response(500)
+        return httpx.Response(200, content=f"zip-{asset_ids[0]}".encode() * 100)
+
+
+@pytest.mark.asyncio
+async def test_export_writes_archives_in_chunks_and_resumes(tmp_path):
+    """Tests that archives are written to disk, and that a failed export resumes where it stopped."""
+    downloads = FakeDownloads()
+    downloads.failing = {"b"}
+    async with ImmichAPI(
+        "http://immich.test", "key", max_retries=0, transport=httpx.MockTransport(downloads)
+    ) as api:
+        exporter = ArchiveExporter(str(tmp_path), chunk_size=64)
+        status = exporter.start(api, "holidays", ["a", "b"])
+        assert status["state"] == "running"
+        await exporter._exports["holidays"].task
+
+        status = exporter.status("holidays")
+        assert status["state"] == "failed"
+        assert status["archivesDone"] == 1 and status["bytesWritten"] == 5
+        assert (tmp_path / "holidays" / "archive-0001.zip").read_bytes() == b"zip-a" * 100
+        assert not (tmp_path / "holidays" / "archive-0002.zip").exists()
+
+        # A new exporter, as after a restart, finds the export on disk and resumes it.
+        downloads.failing = set()
+        exporter = ArchiveExporter(str(tmp_path))
+        assert exporter.status("holidays")["state"] == "stopped"
+        exporter.start(api, "holidays", ["b", "a"])
+        await exporter._exports["holidays"].task
+
+    status = exporter.status("holidays")
+    assert status["state"] == "done"
+    assert status["archives"] == status["archivesDone"] == 2
+    assert status["totalBytes"] == status["bytesWritten"] == 10
+    assert downloads.archives == [["a"], ["b"], ["b"]]
+    assert (tmp_path / "holidays" / "archive-0002.zip").read_bytes() == b"zip-b" * 100
+    assert sorted(path.name for path in (tmp_path / "holidays").iterdir()) == [
+        "archive-0001.zip",
+        "archive-0002.zip",
+        "export.json",
+    ]
+
+
+def test_export_names_and_assets_are_checked(tmp_path):
+    """Tests that export names cannot leave the export directory, or be reused for other assets."""
+    exporter = ArchiveExporter(str(tmp_path))
+    (tmp_path / "taken").mkdir()
+    (tmp_path / "taken" / "export.json").write_text(
+        json.dumps({"assetIds": ["a"], "totalBytes": 5, "archives": []})
+    )
+
+    with pytest.raises(ValueError, match="Export names"):
+        exporter.start(None, "../etc", ["a"])
+    with pytest.raises(ValueError, match="other assets"):
+        exporter.start(None, "taken", ["b"])
+    with pytest.raises(ValueError, match="No export"):
+        exporter.status("missing")
+
+
+@pytest.mark.asyncio
+async def test_download_route_streams_the_archive(monkeypatch):
+    """Tests that the download route is off by default, needs the caller's key and streams the archive."""
+    downloads = FakeDownloads()
+    downloads.failing = {"bad"}
+    keys = []
+
+    def client_factory(api_key: str) -> ImmichAPI:
+        keys.append(api_key)
+        return ImmichAPI(
+            "http://immich.test", api_key, max_retries=0, transport=httpx.MockTransport(downloads)
+        )
+
+    client_pool = ClientPool(client_factory)
+    context = {"immich_client": None, "client_pool": client_pool, "rate_limiter": None}
+    monkeypatch.setattr(shared_context, "context", context)
+    headers = {"x-immich-api-key": "caller-key"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mcp") as client:
+        response = await client.post("/download/archive", json={"assetIds": ["a"]}, headers=headers)
+        assert response.status_code == 404
+
+        monkeypatch.setenv("IMMICH_MCP_ARCHIVE_DOWNLOADS", "true")
+        assert (await client.post("/download/archive", json={"assetIds": ["a"]})).status_code == 401
+        response = await client.post("/download/archive", json={"assetIds": ["a"]}, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        assert response.content == b"zip-a" * 100
+        assert keys == ["caller-key"]
+        response = await client.post(
+            "/download/archive", json={"assetIds": ["a"]}, headers={"x-immich-api-key": "made-up-key"}
+        )
+        assert response.status_code == 401
+        assert len(client_pool) == 1
+
+        response = await client.post("/download/archive", json={"assetIds": ["bad"]}, headers=headers)
+        assert response.status_code == 500
+        response = await client.post("/download/archive", json={"ids": ["a"]}, headers=headers)
+        assert response.status_code == 400
+
+        context["rate_limiter"] = RateLimiter(client_rate=1, client_burst=1, max_wait=0)
+        assert (
+            await client.post("/download/archive", json={"assetIds": ["a"]}, headers=headers)
+        ).status_code == 200
+        response = await client.post("/download/archive", json={"assetIds": ["a"]}, headers=headers)
+        assert response.status_code == 503
+        assert "retry-after" in response.headers
+    await client_pool.close()
+
+
+@pytest.mark.asyncio
+async def test_download_route_releases_its_client_when_the_body_is_never_read(monkeypatch):
+    """Tests that the download slot and pooled client are freed if the client leaves before the body."""
+    monkeypatch.setenv("IMMICH_MCP_ARCHIVE_DOWNLOADS", "true")
+    downloads = FakeDownloads()
+    client_pool = ClientPool(
+        lambda api_key: ImmichAPI(
+            "http://immich.test", api_key, max_retries=0, transport=httpx.MockTransport(downloads)
+        )
+    )
+    context = {"immich_client": None, "client_pool": client_pool, "rate_limiter": None}
+    monkeypatch.setattr(shared_context, "context", context)
+    scope = {
+        "type": "http",
+        "asgi": {"spec_version": "2.4"},
+        "method": "POST",
+        "path": "/download/archive",
+        "query_string": b"",
+        "headers": [(b"x-immich-api-key", b"caller-key"), (b"content-type", b"application/json")],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps({"assetIds": ["a"]}).encode(), "more_body": False}
+
+    async def send(message):
+        raise OSError("The client went away")
+
+    for _ in range(download_limit().limit + 1):
+        response = await download_archive(Request(scope, receive))
+        assert download_limit().active == 1
+        with pytest.raises(ClientDisconnect):
+            await response(scope, receive, send)
+        assert download_limit().active == 0
+        assert client_pool._entries["caller-key"].leases == 0
+    await client_pool.close()
@@ -0,0 +1,178 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from immich_mcp.immich_api import ImmichAPI
+
+
+@pytest.mark.asyncio
+async def test_get_assets_bulk_preserves_order_and_errors():
+    """Tests that bulk fetches keep input order and return per-item errors."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        asset_id = request.url.path.rsplit("/", 1)[-1]
+        if asset_id == "missing":
+            return httpx.Response(404)
+        await asyncio.sleep(0.01 if asset_id == "a" else 0)
+        asset = {"id": asset_id, "originalFileName": f"{asset_id}.jpg", "type": "IMAGE", "exifInfo": {}}
+        return httpx.Response(200, json=asset)
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        results = await api.get_assets_bulk(["a", "missing", "b"])
+
+    # Only the fields the server returns are kept.
+    assert results[0] == {"id": "a", "originalFileName": "a.jpg", "type": "IMAGE"}
+    assert isinstance(results[1], httpx.HTTPStatusError)
+    assert results[2]["id"] == "b"
+
+
+@pytest.mark.asyncio
+async def test_get_assets_bulk_bounds_concurrency():
+    """Tests that no more than the configured number of requests are in flight."""
+    active = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.005)
+        active -= 1
+        asset_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={"id": asset_id, "originalFileName": "a.jpg", "type": "IMAGE"})
+
+    async with ImmichAPI(
+        "http://immich.test", "key", bulk_concurrency=3, transport=httpx.MockTransport(handler)
+    ) as api:
+        results = await api.get_assets_bulk([f"asset{i}" for i in range(20)])
+
+    assert [result["id"] for result in results] == [f"asset{i}" for i in range(20)]
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_iter_search_metadata_fetches_pages_lazily():
+    """Tests that the search pager follows nextPage and only requests pages as they are consumed."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        page = body["page"]
+        assets = {"items": [{"id": f"asset{page}"}], "nextPage": str(page + 1) if page < 3 else None}
+        return httpx.Response(200, json={"assets": assets})
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        pages = api.iter_search_metadata({"type": "IMAGE"}, page_size=1)
+        first = await anext(pages)
+        assert first["items"] == [{"id": "asset1"}]
+        assert len(requests) == 1
+
+        remaining = [page["items"][0]["id"] async for page in pages]
+
+    assert remaining == ["asset2", "asset3"]
+    assert requests[0] == {"type": "IMAGE", "page": 1, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_timeouts_and_pool_limits_come_from_env(monkeypatch):
+    """Tests that per-phase timeouts default to IMMICH_HTTP_TIMEOUT and pool limits are configurable."""
+    monkeypatch.setenv("IMMICH_HTTP_TIMEOUT", "10")
+    monkeypatch.setenv("IMMICH_HTTP_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("IMMICH_HTTP_MAX_CONNECTIONS", "4")
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"])
+        return httpx.Response(200, json={"res": "pong"})
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        assert await api.ping_server()
+        assert api.pool_stats()["maxConnections"] == 4
+
+    assert timeouts == [{"connect": 1.5, "read": 10.0, "write": 10.0, "pool": 10.0}]
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_report_saturation():
+    """Tests that requests beyond the pool's size are reported as queued once it is saturated."""
+    release = asyncio.Event()
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while not reader.at_eof():
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            await release.wait()
+            body = b'{"res": "pong"}'
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    limits = httpx.Limits(max_connections=2)
+    async with server, ImmichAPI(f"http://127.0.0.1:{port}", "key", limits=limits) as api:
+        pings = [asyncio.create_task(api.ping_server()) for _ in range(5)]
+        while api.pool_stats()["queued"] < 3:
+            await asyncio.sleep(0.01)
+        stats = api.pool_stats()
+        assert (stats["active"], stats["inFlight"], stats["queued"]) == (2, 2, 3)
+        assert stats["saturation"] == 1.0
+        release.set()
+        assert all(await asyncio.gather(*pings))
+        stats = api.pool_stats()
+        assert (stats["active"], stats["idle"], stats["queued"], stats["saturation"]) == (0, 2, 0, 0.0)
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_survive_changed_pool_internals():
+    """Tests that pool stats read as empty, not fail, if httpcore's private pool looks different."""
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.AsyncHTTPTransport()) as api:
+        pool, api._http_transport._pool = api._http_transport._pool, SimpleNamespace(connections=[object()])
+        stats = api.pool_stats()
+        api._http_transport._pool = pool
+
+    assert (stats["active"], stats["idle"], stats["inFlight"], stats["queued"]) == (0, 0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_timeline_buckets_are_cached_and_columnar_buckets_decoded():
+    """Tests that month counts are fetched once per filter set, and per-field bucket arrays become assets."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, dict(request.url.params)))
+        if request.url.path == "/api/timeline/buckets":
+            return httpx.Response(200, json=[{"timeBucket": "2019-03-01", "count": 2}])
+        bucket = {
+            "id": ["a", "b"],
+            "isImage": [True, False],
+            "fileCreatedAt": ["2019-03-02T10:00:00.000Z", "2019-03-05T12:00:00.000Z"],
+            "isFavorite": [True, False],
+            "city": ["Oslo", None],
+        }
+        return httpx.Response(200, json=bucket)
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        filters = {"personId": "person1", "isFavorite": True}
+        assert await api.get_timeline_buckets(filters) == [{"timeBucket": "2019-03-01", "count": 2}]
+        await api.get_timeline_buckets(filters)
+        await api.get_timeline_buckets()
+        assets = await api.get_timeline_bucket("2019-03-01", filters)
+
+    assert assets == [
+        {"id": "a", "type": "IMAGE", "takenAt": "2019-03-02T10:00:00.000Z", "isFavorite": True},
+        {"id": "b", "type": "VIDEO", "takenAt": "2019-03-05T12:00:00.000Z", "isFavorite": False},
+    ]
+    assert requests == [
+        ("/api/timeline/buckets", {"personId": "person1", "isFavorite": "true", "size": "MONTH"}),
+        ("/api/timeline/buckets", {"size": "MONTH"}),
+        (
+            "/api/timeline/bucket",
+            {"personId": "person1", "isFavorite": "true", "size": "MONTH", "timeBucket": "2019-03-01"},
+        ),
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from immich_mcp.admission import OverloadedError
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.index import AssetIndex
+
+
+def make_asset(asset_id: str, updated_at: str, **overrides) -> dict:
+    asset = {
+        "id": asset_id,
+        "originalFileName": f"IMG_{asset_id}.jpg",
+        "type": "IMAGE",
+        "fileCreatedAt": "2019-03-15T10:00:00.000Z",
+        "updatedAt": updated_at,
+        "isTrashed": False,
+        "exifInfo": {"make": "Canon", "model": "EOS R5", "city": "Oslo", "country": "Norway"},
+    }
+    asset.update(overrides)
+    return asset
+
+
+class FakeSearch:
+    """Serves /search/metadata from a list of assets, honouring updatedAfter."""
+
+    def __init__(self, assets: list[dict]):
+        self.assets = assets
+        self.bodies = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        items = [a for a in self.assets if a["updatedAt"] > body.get("updatedAfter", "")]
+        return httpx.Response(200, json={"assets": {"items": items, "nextPage": None}})
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental(tmp_path):
+    """Tests that a second sync only asks Immich for assets updated since the first."""
+    search = FakeSearch(
+        [make_asset("1", "2024-01-01T00:00:00.000Z"), make_asset("2", "2024-01-02T00:00:00.000Z")]
+    )
+    index = AssetIndex(str(tmp_path / "index.db"))
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(search)) as api:
+        assert await index.sync(api) == 2
+        search.assets.append(make_asset("3", "2024-01-03T00:00:00.000Z"))
+        search.assets[0] = make_asset("1", "2024-01-04T00:00:00.000Z", isTrashed=True)
+        assert await index.sync(api) == 2
+
+    assert "updatedAfter" not in search.bodies[0]
+    assert search.bodies[1]["updatedAfter"] == "2024-01-02T00:00:00.000Z"
+    assert await index.count() == 2
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_loop_survives_unexpected_errors(tmp_path, capsys):
+    """Tests that an error the loop does not expect is logged with its traceback and the loop goes on."""
+    search = FakeSearch([make_asset("1", "2024-01-01T00:00:00.000Z")])
+    failures = [OverloadedError("Too many requests to Immich", retry_after=1.0)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if failures:
+            raise failures.pop()
+        return search(request)
+
+    index = AssetIndex(str(tmp_path / "index.db"))
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        task = asyncio.create_task(index.run_sync_loop(api, interval=0.01))
+        async with asyncio.timeout(5):
+            while await index.count() == 0 and not task.done():
+                await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+    index.close()
+
+    output = capsys.readouterr()
+    assert "Traceback" in output.err and "OverloadedError" in output.err
+
+
+@pytest.mark.asyncio
+async def test_index_queries(tmp_path):
+    """Tests the filename prefix, date range and camera queries."""
+    search = FakeSearch(
+        [
+            make_asset("1", "2024-01-01T00:00:00.000Z"),
+            make_asset("2", "2024-01-01T00:00:00.000Z", originalFileName="DSC_0001.jpg"),
+            make_asset(
+                "3",
+                "2024-01-01T00:00:00.000Z",
+                fileCreatedAt="2020-07-01T00:00:00.000Z",
+                exifInfo={"make": "Apple", "model": "iPhone 12"},
+            ),
+        ]
+    )
+    index = AssetIndex(str(tmp_path / "index.db"))
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(search)) as api:
+        await index.sync(api)
+
+    by_name = await index.find_by_filename_prefix("img_")
+    by_date = await index.find_by_date_range("2019-03-01", "2019-04-01")
+    by_camera = await index.find_by_camera("iphone 12")
+
+    assert [asset["id"] for asset in by_name] == ["1", "3"]
+    assert [asset["id"] for asset in by_date] == ["1", "2"]
+    assert by_camera[0]["id"] == "3"
+    assert by_camera[0]["takenAt"] == "2020-07-01T00:00:00.000Z"
+    assert await index.find_by_filename_prefix("IMG%") == []
+    index.close()
@@ -3,13 +3,14 @@ import os
 import threading
 from unittest.mock import AsyncMock, patch
 
+import httpx
 import pytest
 import pytest_asyncio
 import uvicorn
 from httpx import AsyncClient
 
 from immich_mcp.immich_api import ImmichAPI
-from immich_mcp.server import mcp
+from immich_mcp.server import SharedContext, mcp
 from tests.utils import initialize_session
 
 
@@ -127,3 +128,35 @@ def test_immich_api_raises_on_missing_env_vars():
     with patch.dict(os.environ, {}, clear=True):
         with pytest.raises(ValueError, match="Immich base URL must be provided"):
             ImmichAPI()
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"IMMICH_BASE_URL": "http://test.com", "IMMICH_API_KEY": "test-key"})
+async def test_sessions_share_one_immich_client():
+    """Tests that concurrent sessions share one client, which is closed with the last session."""
+    shared = SharedContext()
+
+    async with shared.acquire() as first:
+        async with shared.acquire() as second:
+            assert first["immich_client"] is second["immich_client"]
+        assert not first["immich_client"]._client.is_closed
+    assert first["immich_client"]._client.is_closed
+    assert shared.context is None
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"IMMICH_BASE_URL": "http://test.com", "IMMICH_MCP_CALLER_API_KEYS": "true"})
+async def test_caller_api_keys_without_server_key():
+    """Tests that with per-caller keys the server's own API key is optional."""
+    os.environ.pop("IMMICH_API_KEY", None)
+    api_key = {"id": "1", "name": "Caller", "createdAt": "", "updatedAt": "", "permissions": ["all"]}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=api_key))
+    shared = SharedContext(
+        caller_client_factory=lambda key: ImmichAPI("http://immich.test", key, transport=transport)
+    )
+
+    async with shared.acquire() as context:
+        assert context["immich_client"] is None
+        async with context["client_pool"].lease("caller-key") as immich_client:
+            assert immich_client.api_key == "caller-key"
+    assert immich_client._client.is_closed
@@ -0,0 +1,91 @@
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from immich_mcp.main import app
+from immich_mcp.metrics import (
+    MCP_REQUESTS,
+    UPSTREAM_LATENCY,
+    UPSTREAM_REQUESTS,
+    Counter,
+    Histogram,
+    MetricsTransport,
+    Registry,
+    endpoint_label,
+)
+from immich_mcp.server import mcp
+
+
+def test_registry_renders_prometheus_text():
+    """Tests the text exposition format of counters and histograms."""
+    registry = Registry()
+    counter = registry.register(Counter("calls_total", "Calls.", ("name",)))
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    counter.inc(name='a"b')
+    histogram.observe(0.05)
+    histogram.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        'calls_total{name="a\\"b"} 1',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 1',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 5.05",
+        "latency_seconds_count 2",
+    ]
+
+
+def test_endpoint_label_collapses_ids():
+    """Tests that asset and API key IDs do not create one label per ID."""
+    assert endpoint_label("/api/assets/58cb6484-a03a-4d29-8cca-249d5bfc1611/thumbnail") == (
+        "/api/assets/{id}/thumbnail"
+    )
+    assert endpoint_label("/api/users/me") == "/api/users/me"
+
+
+@pytest.mark.asyncio
+async def test_metrics_transport_records_upstream_requests():
+    """Tests that upstream requests are counted and timed once their body has been read."""
+    transport = MetricsTransport(httpx.MockTransport(lambda request: httpx.Response(404)))
+    labels = {"method": "GET", "endpoint": "/api/assets/{id}"}
+    before = UPSTREAM_REQUESTS.value(status="404", **labels)
+    observed = UPSTREAM_LATENCY.count(**labels)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://immich.test") as client:
+        await client.get("/api/assets/58cb6484-a03a-4d29-8cca-249d5bfc1611")
+
+    assert UPSTREAM_REQUESTS.value(status="404", **labels) == before + 1
+    assert UPSTREAM_LATENCY.count(**labels) == observed + 1
+
+
+@pytest.mark.asyncio
+async def test_resource_reads_are_instrumented(mocker: MockerFixture):
+    """Tests that reading a templated resource is counted under its URI template."""
+    mock_context = mocker.patch("immich_mcp.server.mcp.get_context")
+    mock_api_client = AsyncMock()
+    mock_api_client.get_asset.return_value = {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"}
+    mock_context.return_value.request_context.lifespan_context = {"immich_client": mock_api_client}
+    before = MCP_REQUESTS.value(kind="resource", name="asset://{asset_id}")
+
+    contents = await mcp.read_resource("asset://asset1")
+
+    assert '"asset1"' in contents[0].content
+    assert MCP_REQUESTS.value(kind="resource", name="asset://{asset_id}") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_is_scrapeable():
+    """Tests that the ASGI app serves the metrics next to the MCP endpoint."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE immich_mcp_request_duration_seconds histogram" in response.text
+    assert "# TYPE immich_pool_connections gauge" in response.text
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from immich_mcp import models
+from immich_mcp.models import Asset, Decoder, Partner, TimelineDecoder
+
+
+@pytest.fixture(params=["python", "msgspec"])
+def engine(request, monkeypatch):
+    """Runs a test with the projecting fallback decoder and, if msgspec is installed, the typed one."""
+    if request.param == "msgspec":
+        pytest.importorskip("msgspec")
+    else:
+        monkeypatch.setattr(models, "msgspec", None)
+    return request.param
+
+
+def test_decoder_keeps_only_the_models_fields(engine):
+    """Tests that decoded assets and lists of partners hold exactly their models' fields, if sent."""
+    asset = {
+        "id": "asset1",
+        "originalFileName": "IMG_0001.jpg",
+        "type": "IMAGE",
+        "exifInfo": {"make": "Canon", "model": "EOS R5"},
+        "people": [{"id": "person1", "faces": [{"boundingBoxX1": 10}]}],
+    }
+    partner = {"id": "user1", "email": "a@example.com", "name": "A", "inTimeline": True, "avatarColor": "red"}
+
+    assert Decoder(Asset).decode(json.dumps(asset).encode()) == {
+        "id": "asset1",
+        "originalFileName": "IMG_0001.jpg",
+        "type": "IMAGE",
+    }
+    assert Decoder(Asset).decode(json.dumps({**asset, "thumbhash": None}).encode()) == {
+        "id": "asset1",
+        "originalFileName": "IMG_0001.jpg",
+        "type": "IMAGE",
+        "thumbhash": None,
+    }
+    assert Decoder(Partner, many=True).decode(json.dumps([partner]).encode()) == [
+        {"id": "user1", "email": "a@example.com", "name": "A", "inTimeline": True}
+    ]
+
+
+def test_decoder_reports_bad_bodies_as_json_errors(engine):
+    """Tests that invalid JSON and missing fields raise the error the client handles."""
+    decoder = Decoder(Asset)
+    with pytest.raises(json.JSONDecodeError):
+        decoder.decode(b"<html>")
+    with pytest.raises(json.JSONDecodeError):
+        decoder.decode(b'{"id": "asset1"}')
+    with pytest.raises(json.JSONDecodeError):
+        Decoder(Asset, many=True).decode(b'{"id": "asset1"}')
+
+
+def test_timeline_decoder_accepts_lists_of_assets():
+    """Tests that timeline buckets sent as lists of assets, as before Immich 1.133, are decoded."""
+    bucket = [
+        {"id": "a", "type": "VIDEO", "localDateTime": "2019-03-02T10:00:00.000Z", "isFavorite": True},
+        {"id": "b", "type": "IMAGE", "fileCreatedAt": "2019-03-05T12:00:00.000Z"},
+    ]
+
+    assert TimelineDecoder().decode(json.dumps(bucket).encode()) == [
+        {"id": "a", "type": "VIDEO", "takenAt": "2019-03-02T10:00:00.000Z", "isFavorite": True},
+        {"id": "b", "type": "IMAGE", "takenAt": "2019-03-05T12:00:00.000Z", "isFavorite": False},
+    ]
@@ -0,0 +1,116 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from immich_mcp.pool import ClientPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_pool(**kwargs) -> ClientPool:
+    return ClientPool(lambda api_key: AsyncMock(api_key=api_key), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_client_pool_reuses_client_per_api_key():
+    """Tests that each API key gets its own client, which is reused across leases."""
+    pool = make_pool()
+
+    async with pool.lease("key-a") as first:
+        pass
+    async with pool.lease("key-a") as second:
+        pass
+    async with pool.lease("key-b") as other:
+        pass
+
+    assert first is second
+    assert other is not first
+    assert other.api_key == "key-b"
+    assert pool.stats()["created"] == 2
+
+
+@pytest.mark.asyncio
+async def test_client_pool_evicts_least_recently_used():
+    """Tests that the least recently used client is closed when the pool is full."""
+    pool = make_pool(max_clients=2)
+
+    async with pool.lease("key-a") as client_a:
+        pass
+    async with pool.lease("key-b") as client_b:
+        pass
+    async with pool.lease("key-a"):
+        pass
+    async with pool.lease("key-c"):
+        pass
+
+    client_b.close.assert_awaited_once()
+    client_a.close.assert_not_awaited()
+    assert len(pool) == 2
+
+
+@pytest.mark.asyncio
+async def test_client_pool_defers_closing_leased_client():
+    """Tests that a client evicted while in use is only closed once its lease ends."""
+    pool = make_pool(max_clients=1)
+
+    async with pool.lease("key-a") as client_a:
+        async with pool.lease("key-b"):
+            pass
+        client_a.close.assert_not_awaited()
+    client_a.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_client_pool_closes_idle_clients():
+    """Tests that clients unused for longer than the idle timeout are closed."""
+    clock = FakeClock()
+    pool = make_pool(idle_timeout=60, clock=clock)
+
+    async with pool.lease("key-a") as client_a:
+        pass
+    clock.now = 30
+    async with pool.lease("key-b") as client_b:
+        pass
+    clock.now = 70
+
+    assert await pool.close_idle() == 1
+    client_a.close.assert_awaited_once()
+    client_b.close.assert_not_awaited()
+    assert len(pool) == 1
+
+
+@pytest.mark.asyncio
+async def test_client_pool_rejects_keys_immich_does_not_accept():
+    """Tests that a key is checked once before it is pooled, and that a rejected key evicts nobody."""
+    checks = []
+
+    def client_factory(api_key):
+        async def get_my_api_key():
+            checks.append(api_key)
+            await asyncio.sleep(0)
+            return {} if api_key == "made-up" else {"id": api_key}
+
+        return AsyncMock(api_key=api_key, get_my_api_key=get_my_api_key)
+
+    pool = ClientPool(client_factory, max_clients=1)
+
+    async def lease(api_key):
+        async with pool.lease(api_key) as client:
+            return client
+
+    first, second = await asyncio.gather(lease("key-a"), lease("key-a"))
+    assert first is second
+    with pytest.raises(ValueError, match="did not accept"):
+        await lease("made-up")
+
+    assert await lease("key-a") is first
+    assert checks == ["key-a", "made-up"]
+    assert pool.stats()["clients"] == 1 and pool.stats()["rejected"] == 1
+    first.close.assert_not_awaited()
@@ -1,9 +1,22 @@
+import os
+from unittest.mock import patch
+
 from mcp.server.fastmcp import FastMCP
 
-from immich_mcp.server import mcp
+from immich_mcp.server import mcp, stateless_http_enabled
 
 
 def test_server_instance_exists():
     """Tests that the FastMCP server instance is created."""
     assert isinstance(mcp, FastMCP)
     assert mcp.name == "ImmichMCP"
+
+
+def test_stateless_http_defaults_to_worker_count():
+    """Tests that stateless mode is the default only when several workers are configured."""
+    with patch.dict(os.environ, {"IMMICH_MCP_WORKERS": "1"}):
+        assert stateless_http_enabled() is False
+    with patch.dict(os.environ, {"IMMICH_MCP_WORKERS": "4"}):
+        assert stateless_http_enabled() is True
+    with patch.dict(os.environ, {"IMMICH_MCP_WORKERS": "4", "IMMICH_MCP_STATELESS_HTTP": "false"}):
+        assert stateless_http_enabled() is False
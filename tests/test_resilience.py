@@ -0,0 +1,126 @@
+import httpx
+import pytest
+
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.resilience import CircuitBreaker, CircuitOpenError, RetryTransport
+
+
+class FakeClock:
+    """A manually advanced clock for the circuit breaker."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Upstream:
+    """A mock transport that replays a scripted sequence of responses or errors."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_client(upstream: Upstream, sleeps: list, **kwargs) -> tuple[httpx.AsyncClient, RetryTransport]:
+    async def sleep(delay: float):
+        sleeps.append(delay)
+
+    transport = RetryTransport(httpx.MockTransport(upstream), sleep=sleep, **kwargs)
+    return httpx.AsyncClient(transport=transport, base_url="http://immich.test"), transport
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_on_get():
+    """Tests that a GET is retried after a connection error and a 502."""
+    upstream = Upstream(httpx.ConnectError("refused"), httpx.Response(502), httpx.Response(200, json=[]))
+    sleeps = []
+    client, transport = make_client(upstream, sleeps)
+
+    async with client:
+        response = await client.get("/users")
+
+    assert response.status_code == 200
+    assert upstream.calls == 3
+    assert transport.retries == 2
+    assert all(0 <= delay <= 0.4 for delay in sleeps)
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_post():
+    """Tests that non-idempotent requests are sent only once."""
+    upstream = Upstream(httpx.Response(502))
+    client, _ = make_client(upstream, [])
+
+    async with client:
+        response = await client.post("/search/metadata", json={})
+
+    assert response.status_code == 502
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_honours_retry_after():
+    """Tests that Retry-After is used as the delay, and too long a delay is not waited for."""
+    upstream = Upstream(
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(503, headers={"Retry-After": "120"}),
+    )
+    sleeps = []
+    client, _ = make_client(upstream, sleeps)
+
+    async with client:
+        response = await client.get("/assets/1")
+
+    assert response.status_code == 503
+    assert sleeps == [2.0]
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_recovers():
+    """Tests that the breaker fails fast once open and closes after a successful trial request."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    upstream = Upstream(httpx.Response(503), httpx.Response(503), httpx.Response(200, json={}))
+    client, _ = make_client(upstream, [], max_retries=0, breaker=breaker)
+
+    async with client:
+        await client.get("/users")
+        await client.get("/users")
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await client.get("/users")
+        assert upstream.calls == 2
+
+        clock.now = 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        response = await client.get("/users")
+
+    assert response.status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_getters_raise_when_immich_is_unavailable():
+    """Tests that getters raise once retries are used up or the circuit is open, but not for a 404."""
+    upstream = Upstream(httpx.Response(404), httpx.Response(503), httpx.Response(503))
+    async with ImmichAPI(
+        "http://immich.test", "key", max_retries=0, transport=httpx.MockTransport(upstream)
+    ) as api:
+        api.breaker.failure_threshold = 2
+        assert await api.get_asset("a") == {}
+        with pytest.raises(httpx.HTTPStatusError):
+            await api.get_asset("b")
+        with pytest.raises(httpx.HTTPStatusError):
+            await api.get_albums()
+        with pytest.raises(CircuitOpenError):
+            await api.get_my_user()
+    assert upstream.calls == 3
@@ -1,18 +1,42 @@
-from unittest.mock import AsyncMock
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
 
+import httpx
 import pytest
 import pytest_asyncio
 from pytest_mock import MockerFixture
 
+from immich_mcp.exports import ArchiveExporter
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.pool import ClientPool
+from immich_mcp.resilience import CircuitOpenError
 from immich_mcp.server import (
+    add_assets_to_album,
+    album_assets,
+    export_assets,
+    export_status,
+    find_assets_by_camera,
+    find_near_duplicates,
     get_api_key,
     get_api_key_list,
+    get_api_keys_page_fields,
     get_asset,
+    get_assets,
     get_my_api_key,
     get_partners,
+    get_thumbnail,
     get_user,
     get_users_list,
+    get_users_page,
+    library_stats,
+    search_assets,
+    timeline,
+    with_caller_client,
+    with_upstream_errors,
 )
+from immich_mcp.stats import LibraryStats
+from immich_mcp.thumbnails import ThumbnailCache
+from tests.fake_immich_api import ImmichAPI as FakeImmichAPI
 
 
 @pytest_asyncio.fixture
@@ -107,6 +131,33 @@ async def test_get_asset_resource(mock_mcp_context):
     mock_api_client.get_asset.assert_awaited_once_with("asset1")
 
 
+@pytest.mark.asyncio
+async def test_get_assets_tool(mock_mcp_context):
+    """Tests that the bulk asset tool preserves order, reports per-item errors and caps its input."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    not_found = httpx.HTTPStatusError(
+        "not found", request=httpx.Request("GET", "http://test"), response=httpx.Response(404)
+    )
+    mock_api_client.get_assets_bulk.return_value = [
+        {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"},
+        not_found,
+        {"id": "asset3", "originalFileName": "c.mp4", "type": "VIDEO"},
+    ]
+
+    assets = await get_assets(ids=["asset1", "missing", "asset3"])
+
+    assert assets == [
+        {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"},
+        {"id": "missing", "error": "Asset not found"},
+        {"id": "asset3", "originalFileName": "c.mp4", "type": "VIDEO"},
+    ]
+    mock_api_client.get_assets_bulk.assert_awaited_once_with(["asset1", "missing", "asset3"])
+
+    with pytest.raises(ValueError, match="At most 500 assets"):
+        await get_assets(ids=[f"asset{i}" for i in range(501)])
+    mock_api_client.get_assets_bulk.assert_awaited_once()
+
+
 @pytest.mark.asyncio
 async def test_get_my_api_key_resource(mock_mcp_context):
     """Tests that the my_api_key resource correctly returns the current api key."""
@@ -183,3 +234,317 @@ async def test_get_user_resource_error(mock_mcp_context):
 
     assert "Failed to fetch user from Immich API" in str(excinfo.value)
     mock_api_client.get_my_user.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_search_assets_tool_returns_page_and_cursor(mock_mcp_context):
+    """Tests that searching returns one page and a cursor that resumes at the next page."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    requested = []
+
+    def iter_search_metadata(filters, page_size, page):
+        requested.append((filters, page_size, page))
+
+        async def pages():
+            yield {
+                "items": [{"id": f"asset{page}", "originalFileName": "a.jpg", "type": "IMAGE"}],
+                "nextPage": str(page + 1),
+            }
+
+        return pages()
+
+    mock_api_client.iter_search_metadata = MagicMock(side_effect=iter_search_metadata)
+
+    first = await search_assets(make="Canon", limit=1)
+    second = await search_assets(cursor=first["nextCursor"])
+
+    assert first["items"] == [{"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"}]
+    assert second["items"][0]["id"] == "asset2"
+    assert requested == [({"make": "Canon"}, 1, 1), ({"make": "Canon"}, 1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_search_assets_tool_rejects_invalid_cursor(mock_mcp_context):
+    """Tests that a malformed cursor is reported as an error."""
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        await search_assets(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_find_assets_by_camera_tool(mock_mcp_context):
+    """Tests that index-backed tools are answered from the local asset index."""
+    mock_index = AsyncMock()
+    mock_index.find_by_camera.return_value = [{"id": "asset1"}]
+    mock_mcp_context.return_value.request_context.lifespan_context["asset_index"] = mock_index
+
+    assets = await find_assets_by_camera(model="EOS R5")
+
+    assert assets == [{"id": "asset1"}]
+    mock_index.find_by_camera.assert_awaited_once_with("EOS R5", None, 100)
+
+
+@pytest.mark.asyncio
+async def test_find_assets_by_camera_tool_without_index(mock_mcp_context):
+    """Tests that index-backed tools report when the index is not enabled."""
+    with pytest.raises(ValueError, match="IMMICH_INDEX_PATH"):
+        await find_assets_by_camera(model="EOS R5")
+
+
+@pytest.mark.asyncio
+async def test_find_near_duplicates_tool(mock_mcp_context):
+    """Tests that near-duplicate pairs come from the duplicate index and the distance is checked."""
+    mock_index = AsyncMock()
+    mock_index.find_pairs.return_value = [{"assetIds": ["a", "b"], "distance": 2}]
+    mock_mcp_context.return_value.request_context.lifespan_context["duplicate_index"] = mock_index
+
+    pairs = await find_near_duplicates(max_distance=6, algorithm="dhash")
+
+    assert pairs == [{"assetIds": ["a", "b"], "distance": 2}]
+    mock_index.find_pairs.assert_awaited_once_with(6, "dhash", 100)
+    with pytest.raises(ValueError, match="max_distance"):
+        await find_near_duplicates(max_distance=65)
+
+
+@pytest.mark.asyncio
+async def test_library_stats_tool(mock_mcp_context):
+    """Tests that library statistics load the library's metadata on first use and group it."""
+    lifespan_context = mock_mcp_context.return_value.request_context.lifespan_context
+    lifespan_context["immich_client"] = FakeImmichAPI()
+    lifespan_context["library_stats"] = LibraryStats()
+
+    report = await library_stats(group_by=["type"], limit=0)
+
+    assert report == {"groups": [], "totalCount": 1, "totalBytes": 0, "truncated": True}
+    report = await library_stats(group_by=["type", "year"])
+    assert report["groups"] == [{"key": {"type": "IMAGE", "year": None}, "count": 1, "bytes": 0}]
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_tool_caches_on_disk(mock_mcp_context, tmp_path):
+    """Tests that a thumbnail is downloaded once and served from disk until the asset's thumbhash changes."""
+    lifespan_context = mock_mcp_context.return_value.request_context.lifespan_context
+    lifespan_context["thumbnail_cache"] = ThumbnailCache(str(tmp_path))
+    asset = {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE", "thumbhash": "hash1"}
+    lifespan_context["immich_client"].get_asset.return_value = asset
+    downloads = []
+
+    @asynccontextmanager
+    async def stream_thumbnail(asset_id, size):
+        downloads.append((asset_id, size))
+        yield httpx.Response(200, content=b"webp-bytes", headers={"content-type": "image/webp"})
+
+    lifespan_context["immich_client"].stream_thumbnail = stream_thumbnail
+
+    first = await get_thumbnail(asset_id="asset1")
+    second = await get_thumbnail(asset_id="asset1")
+
+    assert first == second
+    assert first.mimeType == "image/webp"
+    assert first.data == "d2VicC1ieXRlcw=="
+    assert downloads == [("asset1", "thumbnail")]
+
+    asset["thumbhash"] = "hash2"
+    await get_thumbnail(asset_id="asset1")
+    await get_thumbnail(asset_id="asset1")
+    asset["thumbhash"] = None
+    await get_thumbnail(asset_id="asset1")
+    assert downloads == [("asset1", "thumbnail")] * 3
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_tool_hit_makes_no_upstream_request(mock_mcp_context, tmp_path):
+    """Tests that a thumbnail served from the disk cache asks Immich for nothing, not even its thumbhash."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path.endswith("/thumbnail"):
+            return httpx.Response(200, content=b"webp-bytes", headers={"content-type": "image/webp"})
+        asset = {"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE", "thumbhash": "hash1"}
+        return httpx.Response(200, json=asset)
+
+    lifespan_context = mock_mcp_context.return_value.request_context.lifespan_context
+    lifespan_context["thumbnail_cache"] = ThumbnailCache(str(tmp_path))
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        lifespan_context["immich_client"] = api
+        first = await get_thumbnail(asset_id="asset1")
+        assert requests == ["/api/assets/asset1", "/api/assets/asset1/thumbnail"]
+        requests.clear()
+        for _ in range(3):
+            assert await get_thumbnail(asset_id="asset1") == first
+
+    assert requests == []
+
+
+@pytest.mark.asyncio
+async def test_export_tools(mock_mcp_context, tmp_path):
+    """Tests that an export runs in the background and its progress can be followed by name."""
+    lifespan_context = mock_mcp_context.return_value.request_context.lifespan_context
+    lifespan_context["immich_client"] = FakeImmichAPI()
+    exporter = lifespan_context["exporter"] = ArchiveExporter(str(tmp_path))
+
+    status = await export_assets(asset_ids=["asset1", "asset2"], name="trip")
+    assert status["state"] == "running"
+    await exporter._exports["trip"].task
+
+    status = await export_status(name="trip")
+    assert status["state"] == "done"
+    assert status["files"] == [str(tmp_path / "trip" / "archive-0001.zip")]
+    assert (tmp_path / "trip" / "archive-0001.zip").read_bytes() == b"fake-archive"
+    lifespan_context["exporter"] = None
+    with pytest.raises(ValueError, match="IMMICH_EXPORT_DIR"):
+        await export_status(name="trip")
+
+
+@pytest.mark.asyncio
+async def test_caller_api_key_uses_pooled_client(mock_mcp_context):
+    """Tests that a request carrying its own API key is served by that key's pooled client."""
+    request_context = mock_mcp_context.return_value.request_context
+    callers = {}
+
+    def caller_client(api_key):
+        client = callers[api_key] = AsyncMock()
+        client.get_my_user.return_value = {"id": api_key, "email": "caller@example.com", "name": "Caller"}
+        return client
+
+    request_context.lifespan_context["client_pool"] = ClientPool(caller_client)
+    request_context.request.headers = {"x-immich-api-key": "caller-key"}
+
+    user = await with_caller_client(get_user)()
+
+    assert user["id"] == "caller-key"
+    callers["caller-key"].get_my_user.assert_awaited_once()
+    request_context.lifespan_context["immich_client"].get_my_user.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_unavailable_immich_is_reported_as_retryable(mock_mcp_context):
+    """Tests that Immich being unavailable is reported as worth retrying, and other errors as they were."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    mock_api_client.get_my_user.side_effect = CircuitOpenError("Immich circuit breaker is open")
+    with pytest.raises(ValueError, match="temporarily unavailable .*circuit breaker.*try again later"):
+        await with_upstream_errors(get_user)()
+
+    request = httpx.Request("GET", "http://immich.test/api/assets/a")
+    mock_api_client.get_album_asset_ids.side_effect = httpx.HTTPStatusError(
+        "Bad gateway", request=request, response=httpx.Response(502, request=request)
+    )
+    with pytest.raises(ValueError, match="HTTP 502.*try again later"):
+        await with_upstream_errors(album_assets)(album_id="album1")
+
+    mock_api_client.get_my_user.side_effect = None
+    mock_api_client.get_my_user.return_value = {}
+    with pytest.raises(ValueError, match="Failed to fetch user"):
+        await with_upstream_errors(get_user)()
+
+
+@pytest.mark.asyncio
+async def test_caller_api_key_cannot_query_shared_index(mock_mcp_context):
+    """Tests that callers with their own API key cannot read the server account's asset index."""
+    request_context = mock_mcp_context.return_value.request_context
+    request_context.lifespan_context["asset_index"] = AsyncMock()
+    request_context.lifespan_context["client_pool"] = ClientPool(lambda api_key: AsyncMock())
+    request_context.request.headers = {"x-immich-api-key": "caller-key"}
+
+    with pytest.raises(ValueError, match="own Immich account"):
+        await with_caller_client(find_assets_by_camera)(model="EOS R5")
+
+
+@pytest.mark.asyncio
+async def test_get_users_page_resource(mock_mcp_context, monkeypatch):
+    """Tests that the paged users resource slices the list and reports the next page."""
+    monkeypatch.setenv("IMMICH_MCP_PAGE_SIZE", "2")
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    mock_api_client.get_users_list.return_value = [
+        {"id": f"user{i}", "email": f"user{i}@example.com", "name": f"User {i}"} for i in range(5)
+    ]
+
+    first = await get_users_page(page=1)
+    last = await get_users_page(page=3)
+
+    assert first["items"] == [
+        {"id": "user0", "email": "user0@example.com", "name": "User 0"},
+        {"id": "user1", "email": "user1@example.com", "name": "User 1"},
+    ]
+    assert first["nextPage"] == 2
+    assert first["total"] == 5
+    assert [user["id"] for user in last["items"]] == ["user4"]
+    assert last["nextPage"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_api_keys_page_resource_projects_fields(mock_mcp_context):
+    """Tests that only the requested fields are returned, and unknown fields are rejected."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    mock_api_client.get_api_key_list.return_value = [
+        {
+            "id": "key1",
+            "name": "Key One",
+            "createdAt": "2025-01-01T00:00:00.000Z",
+            "updatedAt": "2025-01-01T00:00:00.000Z",
+            "permissions": ["all"],
+        }
+    ]
+
+    page = await get_api_keys_page_fields(page=1, fields="id,name")
+
+    assert page["items"] == [{"id": "key1", "name": "Key One"}]
+    with pytest.raises(ValueError, match="Unknown fields secret"):
+        await get_api_keys_page_fields(page=1, fields="id,secret")
+
+
+@pytest.mark.asyncio
+async def test_timeline_tool_lists_months_and_pages_through_one(mock_mcp_context):
+    """Tests that the timeline lists month counts, and only fetches a month's assets when asked for it."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    mock_api_client.get_timeline_buckets.return_value = [
+        {"timeBucket": "2019-04-01T00:00:00.000Z", "count": 1},
+        {"timeBucket": "2019-03-01T00:00:00.000Z", "count": 3},
+    ]
+    mock_api_client.get_timeline_bucket.return_value = [
+        {"id": f"asset{i}", "type": "IMAGE", "takenAt": None, "isFavorite": True} for i in range(3)
+    ]
+
+    months = await timeline(is_favorite=True)
+    first = await timeline(month="2019-03", is_favorite=True, limit=2)
+    last = await timeline(month="2019-03", is_favorite=True, limit=2, offset=first["nextOffset"])
+    empty = await timeline(month="2020-01")
+
+    assert months == {
+        "months": [{"month": "2019-04", "count": 1}, {"month": "2019-03", "count": 3}],
+        "assets": [],
+        "nextOffset": None,
+    }
+    assert first["months"] == [{"month": "2019-03", "count": 3}]
+    assert [asset["id"] for asset in first["assets"]] == ["asset0", "asset1"]
+    assert [asset["id"] for asset in last["assets"]] == ["asset2"] and last["nextOffset"] is None
+    assert empty == {"months": [{"month": "2020-01", "count": 0}], "assets": [], "nextOffset": None}
+    mock_api_client.get_timeline_buckets.assert_awaited_with({})
+    mock_api_client.get_timeline_bucket.assert_awaited_with("2019-03-01T00:00:00.000Z", {"isFavorite": True})
+    assert mock_api_client.get_timeline_bucket.await_count == 2
+    with pytest.raises(ValueError, match="YYYY-MM"):
+        await timeline(month="March 2019")
+
+
+@pytest.mark.asyncio
+async def test_album_tools_page_membership_and_summarize_updates(mock_mcp_context):
+    """Tests that album membership is paged and bulk updates report unchanged and failed assets."""
+    mock_api_client = mock_mcp_context.return_value.request_context.lifespan_context["immich_client"]
+    mock_api_client.get_album_asset_ids.return_value = [f"asset{i}" for i in range(5)]
+    mock_api_client.add_assets_to_album.return_value = [
+        {"id": "asset1", "success": False, "error": "duplicate"},
+        {"id": "asset7", "success": True},
+        {"id": "asset8", "success": False, "error": "no_permission"},
+    ]
+
+    page = await album_assets(album_id="album1", limit=2, offset=2)
+    update = await add_assets_to_album(album_id="album1", asset_ids=["asset1", "asset7", "asset8"])
+
+    assert page == {"albumId": "album1", "assetIds": ["asset2", "asset3"], "total": 5, "nextOffset": 4}
+    assert update == {
+        "albumId": "album1",
+        "updated": 1,
+        "unchanged": 1,
+        "errors": [{"id": "asset8", "error": "No permission to change this asset's albums"}],
+    }
+    mock_api_client.add_assets_to_album.assert_awaited_once_with("album1", ["asset1", "asset7", "asset8"])
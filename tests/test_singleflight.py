@@ -0,0 +1,101 @@
+import asyncio
+
+import httpx
+import pytest
+
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    """Tests that concurrent callers with the same key share one call."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert calls == 1
+    assert flight.coalesced == 9
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_cancelled_caller():
+    """Tests that cancelling one caller does not cancel the call shared with others."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", fetch))
+    second = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_caller_after_last_waiter_leaves_starts_a_new_call():
+    """Tests that a caller arriving while an abandoned call is being cancelled does not join it."""
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    first = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    # The abandoned task has been asked to cancel, but has not finished yet.
+    assert await flight.do("key", fetch) == 2
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_all_callers():
+    """Tests that every caller sees the shared call's exception."""
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_immich_api_coalesces_identical_gets():
+    """Tests that concurrent reads of the same asset cost Immich one request."""
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"id": "asset1", "originalFileName": "a.jpg", "type": "IMAGE"})
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        assets = await asyncio.gather(*(api.get_asset("asset1") for _ in range(20)))
+
+    assert all(asset["id"] == "asset1" for asset in assets)
+    assert calls == 1
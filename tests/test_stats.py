@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from immich_mcp import stats as stats_module
+from immich_mcp.deadlines import deadline
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.stats import LibraryStats
+
+
+def make_asset(asset_id: str, taken: str, model: str | None = "EOS R5", **overrides) -> dict:
+    asset = {
+        "id": asset_id,
+        "type": "IMAGE",
+        "localDateTime": taken,
+        "updatedAt": "2024-01-01T00:00:00.000Z",
+        "isTrashed": False,
+        "exifInfo": {"make": "Canon", "model": model, "country": "Norway", "fileSizeInByte": 1000},
+    }
+    asset.update(overrides)
+    return asset
+
+
+class FakeSearch:
+    """Serves /search/metadata from a list of assets, honouring updatedAfter."""
+
+    def __init__(self, assets: list[dict]):
+        self.assets = assets
+        self.bodies = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        items = [a for a in self.assets if a["updatedAt"] > body.get("updatedAfter", "")]
+        return httpx.Response(200, json={"assets": {"items": items, "nextPage": None}})
+
+
+@pytest.fixture(params=["python", "numpy"])
+def engine(request, monkeypatch):
+    """Runs a test with the plain Python aggregations and, if NumPy is installed, the vectorized ones."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(stats_module, "numpy", None)
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_group_by_year_and_model(engine):
+    """Tests counts and sizes grouped by two fields, with type and date filters."""
+    search = FakeSearch(
+        [
+            make_asset("1", "2022-05-01T10:00:00.000Z"),
+            make_asset("2", "2022-07-01T10:00:00.000Z"),
+            make_asset("3", "2023-01-01T10:00:00.000Z", model="iPhone 12"),
+            make_asset("4", "2023-02-01T10:00:00.000Z", type="VIDEO", exifInfo={"fileSizeInByte": 5000}),
+            make_asset("5", None, model=None),
+        ]
+    )
+    stats = LibraryStats()
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(search)) as api:
+        assert await stats.sync(api) == 5
+
+    assert stats.aggregate(["year", "model"]) == [
+        ((2022, "EOS R5"), 2, 2000),
+        ((2023, "iPhone 12"), 1, 1000),
+        ((2023, None), 1, 5000),
+        ((None, None), 1, 1000),
+    ]
+    assert stats.aggregate(["month", "type"], type="VIDEO") == [(("2023-02", "VIDEO"), 1, 5000)]
+    assert stats.aggregate([], taken_after="2022-06-01", taken_before="2023-01-15") == [((), 2, 2000)]
+    assert stats.aggregate(["type"], type="AUDIO") == []
+    with pytest.raises(ValueError, match="Unknown fields"):
+        stats.aggregate(["lens"])
+    with pytest.raises(ValueError, match="Invalid date"):
+        stats.aggregate(["year"], taken_after="last week")
+
+
+@pytest.mark.asyncio
+async def test_date_filters_keep_dates_before_1970(engine):
+    """Tests that open-ended date ranges count assets taken before 1970 and leave out undated ones."""
+    search = FakeSearch(
+        [
+            make_asset("1", "1965-03-01T10:00:00.000Z"),
+            make_asset("2", "1969-12-31T10:00:00.000Z"),
+            make_asset("3", "1975-06-01T10:00:00.000Z"),
+            make_asset("4", None),
+        ]
+    )
+    stats = LibraryStats()
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(search)) as api:
+        await stats.sync(api)
+
+    assert stats.aggregate(["year"], taken_before="1970-01-01") == [((1965,), 1, 1000), ((1969,), 1, 1000)]
+    assert stats.aggregate(["year"], taken_after="1968-01-01") == [((1969,), 1, 1000), ((1975,), 1, 1000)]
+    assert stats.aggregate([], taken_before="2000-01-01") == [((), 3, 3000)]
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental_and_compacts(engine):
+    """Tests that later syncs only pull updated assets, apply changes and drop trashed assets."""
+    search = FakeSearch([make_asset(str(i), "2022-05-01T10:00:00.000Z") for i in range(4)])
+    stats = LibraryStats()
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(search)) as api:
+        await stats.sync(api)
+        later = "2024-02-01T00:00:00.000Z"
+        search.assets[0] = make_asset("0", "2021-01-01T00:00:00.000Z", updatedAt=later)
+        for i in (1, 2, 3):
+            search.assets[i] = make_asset(str(i), "2022-05-01T10:00:00.000Z", updatedAt=later, isTrashed=True)
+        search.assets.append(make_asset("4", "2023-05-01T10:00:00.000Z", updatedAt=later))
+        assert await stats.sync(api) == 5
+
+    assert search.bodies[1]["updatedAfter"] == "2024-01-01T00:00:00.000Z"
+    assert stats.aggregate(["year"]) == [((2021,), 1, 1000), ((2023,), 1, 1000)]
+    # Three of five rows were tombstones, so the columns were compacted.
+    assert len(stats) == 2 and len(stats.live) == 2
+
+
+@pytest.mark.asyncio
+async def test_first_load_continues_after_the_deadline():
+    """Tests that a caller whose deadline passes during the first load gets an error, and the load goes on."""
+    release = asyncio.Event()
+
+    class SlowClient:
+        async def iter_search_metadata(self, filters, page_size):
+            await release.wait()
+            yield {"items": [make_asset("1", "2022-05-01T10:00:00.000Z")], "nextPage": None}
+
+    stats = LibraryStats()
+    with deadline(0.6), pytest.raises(ValueError, match="still loading"):
+        await stats.refresh(SlowClient())
+    release.set()
+    await stats.refresh(SlowClient())
+    assert len(stats) == 1
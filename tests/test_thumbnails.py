@@ -0,0 +1,70 @@
+import pytest
+
+from immich_mcp.thumbnails import ThumbnailCache
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_store_and_open_round_trip(tmp_path):
+    """Tests that a streamed image is served back from a memory map."""
+    cache = ThumbnailCache(str(tmp_path))
+
+    await cache.store("asset1/thumbnail", chunks(b"abc", b"def"), "image/webp")
+    mapped, mime_type = cache.open("asset1/thumbnail")
+
+    with mapped:
+        assert mapped[:] == b"abcdef"
+    assert mime_type == "image/webp"
+    assert cache.open("asset2/thumbnail") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_images_are_stored_once(tmp_path):
+    """Tests that keys with the same content share one object on disk."""
+    cache = ThumbnailCache(str(tmp_path))
+
+    first = await cache.store("asset1/thumbnail", chunks(b"same"), "image/webp")
+    second = await cache.store("asset2/thumbnail", chunks(b"same"), "image/webp")
+
+    assert first == second
+    assert cache.stats() | {"hits": 0} == {
+        "entries": 2,
+        "objects": 1,
+        "bytes": 4,
+        "maxBytes": cache.max_bytes,
+        "hits": 0,
+        "misses": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_by_total_bytes(tmp_path):
+    """Tests that the cache stays within its byte budget by evicting the least recently used key."""
+    cache = ThumbnailCache(str(tmp_path), max_bytes=8)
+
+    await cache.store("a", chunks(b"aaaa"), "image/jpeg")
+    await cache.store("b", chunks(b"bbbb"), "image/jpeg")
+    cache.open("a")[0].close()
+    await cache.store("c", chunks(b"cccc"), "image/jpeg")
+
+    assert cache.open("b") is None
+    assert cache.total_bytes == 8
+    assert len([path for path in (tmp_path / "objects").rglob("*") if path.is_file()]) == 2
+
+
+@pytest.mark.asyncio
+async def test_reloads_from_disk(tmp_path):
+    """Tests that a new cache over the same directory starts warm."""
+    await ThumbnailCache(str(tmp_path)).store("asset1/preview", chunks(b"jpeg"), "image/jpeg")
+
+    mapped, mime_type = ThumbnailCache(str(tmp_path)).open("asset1/preview")
+
+    with mapped:
+        assert mapped[:] == b"jpeg"
+    assert mime_type == "image/jpeg"
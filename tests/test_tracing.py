@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from immich_mcp.immich_api import ImmichAPI
+from immich_mcp.server import with_trace
+from immich_mcp.tracing import (
+    TRACER,
+    BatchSpanProcessor,
+    InMemorySpanExporter,
+    OTLPSpanExporter,
+    SimpleSpanProcessor,
+    SpanContext,
+    SpanExporter,
+    SpanKind,
+    StatusCode,
+)
+
+ASSET = {"id": "asset1", "originalFileName": "IMG_0001.jpg", "type": "IMAGE"}
+
+
+@pytest.fixture
+def exporter():
+    """Records every span in memory for the duration of a test."""
+    exporter = InMemorySpanExporter()
+    TRACER.configure(SimpleSpanProcessor(exporter))
+    yield exporter
+    TRACER.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_client_spans_are_children_of_method_spans(exporter):
+    """Tests that an ImmichAPI call traces the method and its upstream request, and propagates the trace."""
+    traceparents = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        traceparents.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json=ASSET)
+
+    async with ImmichAPI("http://immich.test", "key", transport=httpx.MockTransport(handler)) as api:
+        await api.get_asset("asset1")
+
+    request_span, method_span = exporter.spans
+    assert method_span.name == "ImmichAPI.get_asset"
+    assert request_span.name == "GET /api/assets/asset1"
+    assert request_span.kind == SpanKind.CLIENT
+    assert request_span.parent_id == method_span.context.span_id
+    assert request_span.context.trace_id == method_span.context.trace_id
+    assert request_span.attributes["http.response.status_code"] == 200
+    assert traceparents == [request_span.context.traceparent()]
+
+
+@pytest.mark.asyncio
+async def test_request_phases_are_broken_out(exporter):
+    """Tests that a request over a real connection gets child spans for each phase."""
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.readuntil(b"\r\n\r\n")
+        body = json.dumps(ASSET).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n")
+        writer.write(b"content-length: %d\r\n\r\n%s" % (len(body), body))
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server, ImmichAPI(f"http://127.0.0.1:{port}", "key") as api:
+        assert (await api.get_asset("asset1"))["id"] == "asset1"
+
+    request_span = next(span for span in exporter.spans if span.kind == SpanKind.CLIENT)
+    phases = {span.name: span for span in exporter.spans if span.parent_id == request_span.context.span_id}
+    assert set(phases) == {"pool", "connect", "send", "wait", "read"}
+    assert phases["connect"].end_time <= phases["send"].start_time <= phases["wait"].start_time
+    assert request_span.start_time <= phases["pool"].start_time
+    assert phases["read"].end_time <= request_span.end_time
+
+
+@pytest.mark.asyncio
+async def test_sampling_follows_the_rate_and_the_parent(exporter):
+    """Tests that unsampled traces record nothing, and that a remote parent's decision is followed."""
+    TRACER.sample_rate = 0.0
+    with TRACER.start_as_current_span("dropped") as span:
+        with TRACER.start_as_current_span("child") as child:
+            assert not span.is_recording() and not child.is_recording()
+            assert child.context.trace_id == span.context.trace_id
+    assert exporter.spans == []
+
+    parent = SpanContext.from_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    with TRACER.start_as_current_span("continued", parent=parent):
+        pass
+    (span,) = exporter.spans
+    assert span.context.trace_id == 0x0AF7651916CD43DD8448EB211C80319C
+    assert span.parent_id == 0xB7AD6B7169203331
+    assert SpanContext.from_traceparent("00-00000000000000000000000000000000-b7ad6b7169203331-01") is None
+
+
+@pytest.mark.asyncio
+async def test_handler_span_continues_the_callers_trace(exporter, mocker: MockerFixture):
+    """Tests that MCP handlers run in a server span that records their errors."""
+    mock_context = mocker.patch("immich_mcp.server.mcp.get_context")
+    mock_context.return_value.request_context.request.headers = {
+        "traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    }
+
+    async def get_assets(ids: list[str]) -> list:
+        raise ValueError("Immich is down")
+
+    with pytest.raises(ValueError):
+        await with_trace("tool", "get_assets", get_assets)(ids=["asset1"])
+
+    (span,) = exporter.spans
+    assert span.name == "tools/call get_assets"
+    assert span.kind == SpanKind.SERVER
+    assert span.context.trace_id == 0x0AF7651916CD43DD8448EB211C80319C
+    assert span.status == StatusCode.ERROR
+    assert span.events[0][0] == "exception"
+
+
+def test_otlp_exporter_posts_batches_on_shutdown():
+    """Tests that the batch processor sends waiting spans in OTLP JSON when it shuts down."""
+    bodies = []
+
+    def collector(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    exporter = OTLPSpanExporter("http://collector.test/v1/traces", transport=httpx.MockTransport(collector))
+    TRACER.configure(BatchSpanProcessor(exporter, interval=60))
+    try:
+        with TRACER.start_as_current_span("outer", attributes={"count": 3, "ok": True}):
+            with TRACER.start_as_current_span("inner"):
+                pass
+    finally:
+        TRACER.shutdown()
+
+    (body,) = bodies
+    resource_spans = body["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "immich-mcp"}}
+    ]
+    inner, outer = resource_spans["scopeSpans"][0]["spans"]
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert "parentSpanId" not in outer
+    assert len(outer["traceId"]) == 32
+    assert outer["attributes"] == [
+        {"key": "count", "value": {"intValue": "3"}},
+        {"key": "ok", "value": {"boolValue": True}},
+    ]
+
+
+def test_span_exporters_must_implement_export():
+    """Tests that an exporter without `export` is rejected when it is created, not when spans end."""
+
+    class Incomplete(SpanExporter):
+        pass
+
+    with pytest.raises(TypeError, match="export"):
+        Incomplete()